@@ -0,0 +1,56 @@
+"""Count menus queries made by concurrent reads of an invalidated response.
+
+Runs the application in-process against configured Postgres and Redis:
+    python -m benchmarks.cache_stampede [--rounds N] [--concurrency N]
+Every round updates a menu (invalidating `get_menus`) and then sends
+`--concurrency` simultaneous `GET /menus` requests."""
+import argparse
+import asyncio
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
+
+from config import DATABASE_ASYNC
+from database import async_engine, engine
+from main import app
+
+URL = "http://test/api/v1"
+queries = 0
+
+
+def count_queries():
+    def before_cursor_execute(conn, cursor, statement, *args):
+        global queries
+        if "FROM menus" in statement:
+            queries += 1
+
+    event.listen(async_engine.sync_engine if DATABASE_ASYNC else engine,
+                 "before_cursor_execute", before_cursor_execute)
+
+
+async def run_stampede(rounds: int, concurrency: int):
+    global queries
+    async with AsyncClient(transport=ASGITransport(app=app)) as client:
+        response = await client.post(f"{URL}/menus",
+                                     json={"title": "Menu",
+                                           "description": "Menu"})
+        menu_path = f"{URL}/menus/{response.json()['id']}"
+        for number in range(rounds):
+            await client.patch(menu_path, json={"title": f"Menu {number}",
+                                                "description": "Menu"})
+            queries = 0
+            responses = await asyncio.gather(*[
+                client.get(f"{URL}/menus") for _ in range(concurrency)])
+            statuses = {response.status_code for response in responses}
+            print(f"round {number}: {concurrency} requests, "
+                  f"statuses {sorted(statuses)}, {queries} DB queries")
+        await client.delete(menu_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=100)
+    arguments = parser.parse_args()
+    count_queries()
+    asyncio.run(run_stampede(arguments.rounds, arguments.concurrency))
@@ -0,0 +1,123 @@
+"""Measure CPU time per `get_dishes` request for large pages of dishes.
+
+Runs the application in-process against configured Postgres, with the
+response cache disabled, so every request selects and renders its page:
+    RESPONSE_CACHER_DISABLE=1 python -m benchmarks.get_dishes_cpu
+        [--limits N ...] [--requests N] [--output FILE] [--compare FILE]
+A submenu of `PAGE_LIMIT_MAX` dishes is seeded by one INSERT ... SELECT
+and deleted after the run. CPU time is `time.process_time` of the whole
+process (the client, the application and the database driver, but not
+Postgres) divided by `--requests` sequential requests of pages of
+`--limits` dishes."""
+import argparse
+import asyncio
+import json
+import time
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+
+from config import PAGE_LIMIT_MAX
+from database import engine
+from main import app
+from menus.utils.response_cacher import RESPONSE_CACHER_DISABLE
+
+URL = "http://test/api/v1"
+SEED_MENU_TITLE = "CPU benchmark"
+LIMITS = [100, PAGE_LIMIT_MAX]
+WARMUP_REQUESTS = 10
+
+SEED_SQL = text("""
+WITH menu AS (
+    INSERT INTO menus (id, title, description)
+    VALUES (gen_random_uuid(), :title, :title)
+    RETURNING id
+), submenu AS (
+    INSERT INTO submenus (id, title, description, menu_id)
+    SELECT gen_random_uuid(), :title, :title, menu.id FROM menu
+    RETURNING id, menu_id
+), dishes AS (
+    INSERT INTO dishes (id, title, description, price, submenu_id)
+    SELECT gen_random_uuid(), 'Dish ' || n, 'Dish description ' || n,
+           round((1 + random() * 99)::numeric, 2), submenu.id
+    FROM submenu, generate_series(1, :dishes) AS n
+)
+SELECT menu_id, id FROM submenu
+""")
+
+
+def seed() -> str:
+    """Return path of the seeded submenu's dishes."""
+    with engine.begin() as connection:
+        menu_id, submenu_id = connection.execute(
+            SEED_SQL, {"title": SEED_MENU_TITLE,
+                       "dishes": PAGE_LIMIT_MAX}).one()
+    return f"{URL}/menus/{menu_id}/submenus/{submenu_id}/dishes"
+
+
+def delete_seed():
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM menus WHERE title = :title"),
+                           {"title": SEED_MENU_TITLE})
+
+
+async def run_requests(path: str, limits: list[int],
+                       requests: int) -> dict[str, dict[str, float]]:
+    results = dict()
+    async with AsyncClient(transport=ASGITransport(app=app)) as client:
+        for limit in limits:
+            for _ in range(WARMUP_REQUESTS):
+                await client.get(path, params={"limit": limit})
+            started = time.perf_counter()
+            cpu_started = time.process_time()
+            for _ in range(requests):
+                response = await client.get(path, params={"limit": limit})
+                response.raise_for_status()
+            results[str(limit)] = {
+                "cpu_ms": round((time.process_time() - cpu_started)
+                                / requests * 1000, 3),
+                "wall_ms": round((time.perf_counter() - started)
+                                 / requests * 1000, 3)}
+    return results
+
+
+def print_results(results: dict, base: dict | None):
+    print(f"{'limit':>6}{'CPU, ms':>10}{'wall, ms':>10}"
+          + (f"{'base CPU':>10}{'change':>8}" if base is not None else ""))
+    for limit, result in results.items():
+        line = (f"{limit:>6}{result['cpu_ms']:>10.2f}"
+                f"{result['wall_ms']:>10.2f}")
+        base_result = None if base is None else base.get(limit)
+        if base_result:
+            change = ((result["cpu_ms"] - base_result["cpu_ms"])
+                      / base_result["cpu_ms"] * 100)
+            line += f"{base_result['cpu_ms']:>10.2f}{change:>+7.0f}%"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limits", type=int, nargs="+", default=LIMITS,
+                        help="dishes of the requested pages")
+    parser.add_argument("--requests", type=int, default=200,
+                        help="measured requests of every page")
+    parser.add_argument("--output", help="save the results as JSON")
+    parser.add_argument("--compare", help="saved results to compare with")
+    arguments = parser.parse_args()
+    if not RESPONSE_CACHER_DISABLE:
+        parser.error("the response cache must be disabled "
+                     "(RESPONSE_CACHER_DISABLE=1)")
+    base_results = None
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            base_results = json.load(file)
+    dishes_path = seed()
+    try:
+        cpu_results = asyncio.run(run_requests(dishes_path, arguments.limits,
+                                               arguments.requests))
+    finally:
+        delete_seed()
+    print_results(cpu_results, base_results)
+    if arguments.output:
+        with open(arguments.output, "w") as file:
+            json.dump(cpu_results, file, indent=2)
@@ -0,0 +1,163 @@
+"""Measure CPU time of cache hits and row mapping for pages of dishes.
+
+Runs in-process without Postgres and Redis (Redis is replaced by a dict):
+    python -m benchmarks.hot_paths [--sizes N ...] [--output FILE]
+                                   [--compare FILE]
+Every case is timed for pages of `--sizes` dishes (1, 100 and 10000 by
+default), as `timeit` does: the best of `--repeat` runs of as many calls as
+take at least 0.2 s. Cases are the steps of `get_dishes` response:
+- `row_mapping` - `get_page` validating rows like the repository ones;
+- `render` - `render_response` serializing the page;
+- `raw_row_mapping` and `raw_render` - the same for `get_raw_page`;
+- `cache_add` - `ResponseCacher.add` of the rendered response;
+- `cache_get` - `ResponseCacher.get` of it from Redis;
+- `cache_get_local` - `ResponseCacher.get` of it from local cache.
+`--output` saves microseconds per call as JSON, `--compare` prints changes
+against a saved report; `benchmarks/hot_paths_baseline.json` is the
+recorded baseline."""
+import argparse
+import asyncio
+import json
+import platform
+import time
+import uuid
+from decimal import Decimal
+
+from sqlalchemy.engine.result import IteratorResult, SimpleResultMetaData
+
+from menus.schemas import DishReadSchema
+from menus.utils.local_cache import LocalCache
+from menus.utils.pagination import get_page, get_raw_page
+from menus.utils.response_cacher import ResponseCacher, render_response
+
+SIZES = [1, 100, 10_000]
+MIN_SECONDS = 0.2
+# columns selected by `DishRepository.get_all`
+DISH_COLUMNS = ["menu_id", "id", "title", "description", "price"]
+
+
+class InProcessRedis:
+    """Stand-in of `StrictRedis` for `ResponseCacher.add` and `get`.
+    Scripts only set their first key to their first argument and return 1,
+    so tag sets, locks and expiration are not kept."""
+
+    def __init__(self):
+        self.values: dict[str, bytes] = dict()
+
+    def register_script(self, script: str):
+        async def run(keys: list, args: list, client=None):
+            self.values[keys[0]] = args[0]
+            return 1
+        return run
+
+    async def get(self, key: str) -> bytes | None:
+        return self.values.get(key)
+
+
+def get_rows(size: int) -> list:
+    """Return rows of `size` dishes and the next page's one."""
+    menu_id = uuid.uuid4()
+    return IteratorResult(
+        SimpleResultMetaData(DISH_COLUMNS),
+        iter([(menu_id, uuid.uuid4(), f"Dish {number}",
+               f"Dish description {number}", Decimal("12.50"))
+              for number in range(size + 1)])).all()
+
+
+async def measure(call, repeat: int) -> float:
+    """Return the best microseconds per `await call()` of `repeat` runs."""
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            await call()
+        seconds = time.perf_counter() - started
+        if seconds >= MIN_SECONDS:
+            break
+        number *= 10 if seconds < MIN_SECONDS / 10 else 2
+    best = seconds
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            await call()
+        best = min(best, time.perf_counter() - started)
+    return best / number * 1_000_000
+
+
+async def run_cases(sizes: list[int], repeat: int) -> dict[str, float]:
+    redis_cacher = ResponseCacher(InProcessRedis())
+    local_cacher = ResponseCacher(InProcessRedis(),
+                                  LocalCache(len(sizes), MIN_SECONDS * 100))
+    results = dict()
+    for size in sizes:
+        rows = get_rows(size)
+        page = get_page(rows, DishReadSchema, size)
+        raw_page = get_raw_page(rows, DishReadSchema, size)
+        response = render_response(page)
+        kwargs = {"menu_id": rows[0].menu_id, "submenu_id": uuid.uuid4(),
+                  "limit": size}
+        await redis_cacher.add("get_dishes", response, **kwargs)
+        await local_cacher.add("get_dishes", response, **kwargs)
+
+        async def row_mapping():
+            get_page(rows, DishReadSchema, size)
+
+        async def render():
+            render_response(page)
+
+        async def raw_row_mapping():
+            get_raw_page(rows, DishReadSchema, size)
+
+        async def raw_render():
+            render_response(raw_page)
+
+        async def cache_add():
+            await redis_cacher.add("get_dishes", response, **kwargs)
+
+        async def cache_get():
+            await redis_cacher.get("get_dishes", **kwargs)
+
+        async def cache_get_local():
+            await local_cacher.get("get_dishes", **kwargs)
+
+        for case in (row_mapping, render, raw_row_mapping, raw_render,
+                     cache_add, cache_get, cache_get_local):
+            name = f"{case.__name__}[{size}]"
+            results[name] = round(await measure(case, repeat), 2)
+    return results
+
+
+def print_report(report: dict, base: dict | None):
+    print(f"Python {report['python']}, {report['machine']}")
+    print(f"{'case':<24}{'us per call':>14}"
+          + (f"{'base':>14}{'change':>8}" if base is not None else ""))
+    for name, value in report["results"].items():
+        line = f"{name:<24}{value:>14.2f}"
+        base_value = (None if base is None
+                      else base["results"].get(name))
+        if base_value:
+            line += (f"{base_value:>14.2f}"
+                     f"{(value - base_value) / base_value * 100:>+7.0f}%")
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES,
+                        help="dishes of the page")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="save the report as JSON")
+    parser.add_argument("--compare", help="saved report to compare with")
+    arguments = parser.parse_args()
+    base_report = None
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            base_report = json.load(file)
+    hot_paths_report = {
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}",
+        "results": asyncio.run(run_cases(arguments.sizes, arguments.repeat))}
+    print_report(hot_paths_report, base_report)
+    if arguments.output:
+        with open(arguments.output, "w") as file:
+            json.dump(hot_paths_report, file, indent=2)
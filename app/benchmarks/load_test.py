@@ -0,0 +1,378 @@
+"""Measure throughput and latency of a mixed read/write workload.
+
+Runs against the docker-compose stack (or the application in-process with
+`--in-process`, against configured Postgres and Redis):
+    python -m benchmarks.load_test [--url URL] [--duration S]
+                                   [--concurrency N] [--output FILE]
+                                   [--compare FILE]
+Seeds menus with submenus and dishes through the API, then `--concurrency`
+clients send requests of the Postman scenario for `--warmup` and
+`--duration` seconds (only the latter are measured): reads of menus,
+submenus, dishes, menu trees and dish search, and with `--write-ratio`
+probability writes (a dish created and deleted, updates of dishes,
+submenus and menus, and the whole Postman flow on a new menu).
+Reports requests, errors, RPS and p50/p95/p99 latency per endpoint.
+`--output` saves the report as JSON and `--compare` prints changes of RPS
+and p95 against a saved report, e.g. of the previous commit.
+The response cache of the stack is disabled by `RESPONSE_CACHER_DISABLE=1`
+in its environment, which this script cannot change: `--cache-label off`
+only records it in the report. In-process the label is taken from
+the environment."""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from httpx import ASGITransport, AsyncClient, HTTPError, Limits, Response
+
+URL = "http://127.0.0.1:8000/api/v1"
+IN_PROCESS_URL = "http://test/api/v1"
+SEED_MENU_TITLE = "Load test"
+# words of the seeded titles and descriptions, and a misspelled word
+SEARCH_QUERIES = ["dish", "submenu", "dish 1", "load test", "dsih"]
+
+
+class LoadTest:
+    """Clients sending requests to the seeded catalog.
+    Latencies (ms) and errors (no response or 4xx/5xx response) are recorded
+    per endpoint while `recording` is set."""
+
+    def __init__(self, client: AsyncClient, url: str, write_ratio: float):
+        self.client = client
+        self.url = url
+        self.write_ratio = write_ratio
+        self.menu_ids: list[str] = list()
+        # (menu_id, submenu_id, dish_ids) of seeded submenus
+        self.submenus: list[tuple[str, str, list[str]]] = list()
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.recording = False
+
+    async def request(self, endpoint: str, method: str, path: str,
+                      **kwargs) -> Response | None:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, f"{self.url}{path}",
+                                                 **kwargs)
+        except HTTPError:
+            response = None
+        if self.recording:
+            self.latencies[endpoint].append(
+                (time.perf_counter() - started) * 1000)
+            if response is None or response.is_error:
+                self.errors[endpoint] += 1
+        return response
+
+    async def seed(self, menus: int, submenus: int, dishes: int):
+        for menu_number in range(menus):
+            response = await self.client.post(
+                f"{self.url}/menus",
+                json=get_body(f"{SEED_MENU_TITLE} {menu_number}"))
+            response.raise_for_status()
+            menu_id = response.json()["id"]
+            self.menu_ids.append(menu_id)
+            for submenu_number in range(submenus):
+                response = await self.client.post(
+                    f"{self.url}/menus/{menu_id}/submenus",
+                    json=get_body(f"Submenu {submenu_number}"))
+                response.raise_for_status()
+                submenu_id = response.json()["id"]
+                response = await self.client.post(
+                    f"{self.url}/menus/{menu_id}/submenus/{submenu_id}"
+                    f"/dishes/bulk",
+                    json=[get_dish_body(f"Dish {number}")
+                          for number in range(dishes)])
+                response.raise_for_status()
+                self.submenus.append((menu_id, submenu_id,
+                                      [dish["id"]
+                                       for dish in response.json()]))
+
+    async def delete_seed(self):
+        for menu_id in self.menu_ids:
+            await self.client.delete(f"{self.url}/menus/{menu_id}")
+
+    async def get_menus(self):
+        await self.request("get_menus", "GET", "/menus")
+
+    async def get_menu(self):
+        await self.request("get_menu", "GET",
+                           f"/menus/{random.choice(self.menu_ids)}")
+
+    async def get_menu_tree(self):
+        await self.request("get_menu_tree", "GET",
+                           f"/menus/{random.choice(self.menu_ids)}/tree")
+
+    async def get_submenus(self):
+        await self.request("get_submenus", "GET",
+                           f"/menus/{random.choice(self.menu_ids)}/submenus")
+
+    async def get_submenu(self):
+        menu_id, submenu_id, _ = random.choice(self.submenus)
+        await self.request("get_submenu", "GET",
+                           f"/menus/{menu_id}/submenus/{submenu_id}")
+
+    async def get_dishes(self):
+        menu_id, submenu_id, _ = random.choice(self.submenus)
+        await self.request("get_dishes", "GET",
+                           f"/menus/{menu_id}/submenus/{submenu_id}/dishes")
+
+    async def get_dish(self):
+        menu_id, submenu_id, dish_ids = random.choice(self.submenus)
+        await self.request("get_dish", "GET",
+                           f"/menus/{menu_id}/submenus/{submenu_id}"
+                           f"/dishes/{random.choice(dish_ids)}")
+
+    async def search_dishes(self):
+        await self.request("search_dishes", "GET", "/search/dishes",
+                           params={"q": random.choice(SEARCH_QUERIES)})
+
+    async def create_dish(self):
+        """Create a dish and delete it, leaving the catalog as it was."""
+        menu_id, submenu_id, _ = random.choice(self.submenus)
+        dishes_path = f"/menus/{menu_id}/submenus/{submenu_id}/dishes"
+        response = await self.request("create_dish", "POST", dishes_path,
+                                      json=get_dish_body("New dish"))
+        if response is not None and not response.is_error:
+            await self.request("delete_dish", "DELETE",
+                               f"{dishes_path}/{response.json()['id']}")
+
+    async def update_dish(self):
+        menu_id, submenu_id, dish_ids = random.choice(self.submenus)
+        dish_id = random.choice(dish_ids)
+        await self.request("update_dish", "PATCH",
+                           f"/menus/{menu_id}/submenus/{submenu_id}"
+                           f"/dishes/{dish_id}",
+                           json=get_dish_body(
+                               f"Dish {dish_ids.index(dish_id)}"))
+
+    async def update_submenu(self):
+        menu_id, submenu_id, _ = random.choice(self.submenus)
+        await self.request("update_submenu", "PATCH",
+                           f"/menus/{menu_id}/submenus/{submenu_id}",
+                           json=get_body("Submenu"))
+
+    async def update_menu(self):
+        menu_id = random.choice(self.menu_ids)
+        await self.request(
+            "update_menu", "PATCH", f"/menus/{menu_id}",
+            json=get_body(f"{SEED_MENU_TITLE} {self.menu_ids.index(menu_id)}"))
+
+    async def run_postman_flow(self):
+        """Requests of `tests/test_04_postman_script.py` on a new menu."""
+        response = await self.request("create_menu", "POST", "/menus",
+                                      json=get_body("Postman menu"))
+        if response is None or response.is_error:
+            return
+        menu_path = f"/menus/{response.json()['id']}"
+        response = await self.request("create_submenu", "POST",
+                                      f"{menu_path}/submenus",
+                                      json=get_body("Postman submenu"))
+        if response is not None and not response.is_error:
+            submenu_path = f"{menu_path}/submenus/{response.json()['id']}"
+            for number in range(2):
+                await self.request("create_dish", "POST",
+                                   f"{submenu_path}/dishes",
+                                   json=get_dish_body(
+                                       f"Postman dish {number}"))
+            await self.request("get_menu", "GET", menu_path)
+            await self.request("get_submenu", "GET", submenu_path)
+            await self.request("delete_submenu", "DELETE", submenu_path)
+            await self.request("get_submenus", "GET", f"{menu_path}/submenus")
+        await self.request("delete_menu", "DELETE", menu_path)
+        await self.request("get_menus", "GET", "/menus")
+
+    async def run_clients(self, concurrency: int, seconds: float):
+        """Run clients until `seconds` pass; every client finishes its last
+        operation, so dishes and menus created by it are deleted."""
+        deadline = time.perf_counter() + seconds
+
+        async def run_client():
+            while time.perf_counter() < deadline:
+                operations = (WRITES if random.random() < self.write_ratio
+                              else READS)
+                operation, = random.choices(list(operations),
+                                            list(operations.values()))
+                await operation(self)
+
+        await asyncio.gather(*[run_client() for _ in range(concurrency)])
+
+    async def run(self, concurrency: int, warmup: float,
+                  duration: float) -> float:
+        """Run clients for `warmup` and then for `duration` seconds.
+        Return seconds for which requests were recorded."""
+        await self.run_clients(concurrency, warmup)
+        self.recording = True
+        started = time.perf_counter()
+        await self.run_clients(concurrency, duration)
+        self.recording = False
+        return time.perf_counter() - started
+
+
+# operations and their weights
+READS = {LoadTest.get_menus: 1,
+         LoadTest.get_menu: 2,
+         LoadTest.get_menu_tree: 1,
+         LoadTest.get_submenus: 2,
+         LoadTest.get_submenu: 2,
+         LoadTest.get_dishes: 3,
+         LoadTest.get_dish: 3,
+         LoadTest.search_dishes: 1}
+WRITES = {LoadTest.create_dish: 3,
+          LoadTest.update_dish: 3,
+          LoadTest.update_submenu: 1,
+          LoadTest.update_menu: 1,
+          LoadTest.run_postman_flow: 1}
+
+
+def get_body(title: str) -> dict[str, str]:
+    return {"title": title, "description": f"{title} description"}
+
+
+def get_dish_body(title: str) -> dict[str, str]:
+    return get_body(title) | {"price": f"{random.uniform(1, 100):.2f}"}
+
+
+def get_stats(latencies: list[float], errors: int,
+              seconds: float) -> dict[str, int | float | None]:
+    """Latency percentiles are None (null in JSON) if no requests were
+    recorded."""
+    percentiles = dict.fromkeys(("p50", "p95", "p99"))
+    if len(latencies) > 1:
+        quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        percentiles = {"p50": round(quantiles[49], 2),
+                       "p95": round(quantiles[94], 2),
+                       "p99": round(quantiles[98], 2)}
+    elif latencies:
+        percentiles = dict.fromkeys(percentiles, round(latencies[0], 2))
+    return {"requests": len(latencies),
+            "errors": errors,
+            "rps": round(len(latencies) / seconds, 1)} | percentiles
+
+
+def get_commit() -> str | None:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def get_client(in_process: bool, url: str, concurrency: int
+               ) -> tuple[AsyncClient, str, str | None]:
+    """Return client, API URL and cache label (`None` if unknown)."""
+    options = {"limits": Limits(max_connections=concurrency), "timeout": 30}
+    if not in_process:
+        return AsyncClient(**options), url.rstrip("/"), None
+    from main import app
+    from menus.utils.response_cacher import RESPONSE_CACHER_DISABLE
+    return (AsyncClient(transport=ASGITransport(app=app), **options),
+            IN_PROCESS_URL, "off" if RESPONSE_CACHER_DISABLE else "on")
+
+
+async def run_load_test(arguments) -> dict:
+    started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    client, url, cache = get_client(arguments.in_process, arguments.url,
+                                    arguments.concurrency)
+    async with client:
+        load_test = LoadTest(client, url, arguments.write_ratio)
+        try:
+            await load_test.seed(arguments.menus, arguments.submenus,
+                                 arguments.dishes)
+            seconds = await load_test.run(arguments.concurrency,
+                                          arguments.warmup, arguments.duration)
+        finally:
+            await load_test.delete_seed()
+    latencies = load_test.latencies
+    errors = load_test.errors
+    return {
+        "commit": get_commit(),
+        "started_at": started_at,
+        "url": url,
+        "cache": cache or arguments.cache_label,
+        "options": {option: getattr(arguments, option)
+                    for option in ("concurrency", "warmup", "duration",
+                                   "write_ratio", "menus", "submenus",
+                                   "dishes")},
+        "endpoints": {endpoint: get_stats(latencies[endpoint],
+                                          errors[endpoint], seconds)
+                      for endpoint in sorted(latencies)},
+        "total": get_stats([latency for endpoint in latencies.values()
+                            for latency in endpoint],
+                           sum(errors.values()), seconds)}
+
+
+def get_change(value: float | None, base: float | None) -> str:
+    if not base or value is None:
+        return ""
+    return f"{(value - base) / base * 100:+.0f}%"
+
+
+def format_latency(value: float | None) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+
+def print_report(report: dict, base: dict | None):
+    print(f"commit {report['commit']}, cache {report['cache']}, "
+          f"{report['options']['concurrency']} clients, "
+          f"{report['options']['duration']} s")
+    if base is not None:
+        print(f"compared with commit {base['commit']}, "
+              f"cache {base['cache']}, "
+              f"{base['options']['concurrency']} clients, "
+              f"{base['options']['duration']} s")
+    print(f"{'endpoint':<16}{'requests':>9}{'errors':>7}{'rps':>9}"
+          f"{'p50, ms':>9}{'p95, ms':>9}{'p99, ms':>9}"
+          + (f"{'rps':>7}{'p95':>7}" if base is not None else ""))
+    rows = report["endpoints"] | {"total": report["total"]}
+    for endpoint, stats in rows.items():
+        line = (f"{endpoint:<16}{stats['requests']:>9}{stats['errors']:>7}"
+                f"{stats['rps']:>9.1f}{format_latency(stats['p50']):>9}"
+                f"{format_latency(stats['p95']):>9}"
+                f"{format_latency(stats['p99']):>9}")
+        base_stats = (None if base is None
+                      else (base["endpoints"] | {"total": base["total"]}
+                            ).get(endpoint))
+        if base_stats is not None:
+            line += (f"{get_change(stats['rps'], base_stats['rps']):>7}"
+                     f"{get_change(stats['p95'], base_stats['p95']):>7}")
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=URL, help="API URL of the stack")
+    parser.add_argument("--in-process", action="store_true",
+                        help="run the application in-process")
+    parser.add_argument("--cache-label", choices=("on", "off"), default="on",
+                        help="state of the stack's response cache recorded "
+                             "in the report (it is not changed)")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--warmup", type=float, default=5,
+                        help="seconds before measuring")
+    parser.add_argument("--duration", type=float, default=30,
+                        help="seconds of measuring")
+    parser.add_argument("--write-ratio", type=float, default=0.1,
+                        help="share of write operations")
+    parser.add_argument("--menus", type=int, default=10)
+    parser.add_argument("--submenus", type=int, default=5,
+                        help="submenus of every menu")
+    parser.add_argument("--dishes", type=int, default=20,
+                        help="dishes of every submenu")
+    parser.add_argument("--output", help="save the report as JSON")
+    parser.add_argument("--compare", help="saved report to compare with")
+    arguments = parser.parse_args()
+    base_report = None
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            base_report = json.load(file)
+    load_report = asyncio.run(run_load_test(arguments))
+    print_report(load_report, base_report)
+    if arguments.output:
+        with open(arguments.output, "w") as file:
+            json.dump(load_report, file, indent=2, allow_nan=False)
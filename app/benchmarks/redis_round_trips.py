@@ -0,0 +1,68 @@
+"""Count Redis round trips made by every request of a CRUD scenario.
+
+Runs the application in-process against configured Postgres and Redis:
+    python -m benchmarks.redis_round_trips
+Every packed command sent to Redis is one round trip (a pipeline or a
+script call is sent as one packet); the first request also includes
+connection setup."""
+import asyncio
+
+from httpx import ASGITransport, AsyncClient
+from redis.asyncio.connection import AbstractConnection
+
+from main import app
+
+URL = "http://test/api/v1"
+round_trips = 0
+
+
+def count_round_trips():
+    send_packed_command = AbstractConnection.send_packed_command
+
+    async def wrapper(self, *args, **kwargs):
+        global round_trips
+        round_trips += 1
+        return await send_packed_command(self, *args, **kwargs)
+
+    AbstractConnection.send_packed_command = wrapper
+
+
+async def request(client: AsyncClient, method: str, path: str,
+                  json: dict | None = None) -> dict | None:
+    global round_trips
+    round_trips = 0
+    response = await client.request(method, URL + path, json=json)
+    response.raise_for_status()
+    print(f"{round_trips:>3}  {method:<6} {path}")
+    return response.json()
+
+
+async def run_scenario():
+    async with AsyncClient(transport=ASGITransport(app=app)) as client:
+        menu = await request(client, "POST", "/menus",
+                             {"title": "Menu", "description": "Menu"})
+        menu_path = f"/menus/{menu['id']}"
+        submenu = await request(client, "POST", f"{menu_path}/submenus",
+                                {"title": "Submenu",
+                                 "description": "Submenu"})
+        submenu_path = f"{menu_path}/submenus/{submenu['id']}"
+        dish = await request(client, "POST", f"{submenu_path}/dishes",
+                             {"title": "Dish", "description": "Dish",
+                              "price": "12.50"})
+        dish_path = f"{submenu_path}/dishes/{dish['id']}"
+        for path in ("/menus", menu_path, f"{menu_path}/tree",
+                     f"{menu_path}/submenus", submenu_path,
+                     f"{submenu_path}/dishes", dish_path):
+            await request(client, "GET", path)  # cache miss
+            await request(client, "GET", path)  # cache hit
+        await request(client, "PATCH", dish_path,
+                      {"title": "Dish", "description": "Dish",
+                       "price": "13.50"})
+        await request(client, "DELETE", dish_path)
+        await request(client, "DELETE", submenu_path)
+        await request(client, "DELETE", menu_path)
+
+
+if __name__ == "__main__":
+    count_round_trips()
+    asyncio.run(run_scenario())
@@ -0,0 +1,149 @@
+"""Measure dish search latency on a seeded catalog of a million dishes.
+
+Runs the search against configured Postgres (the schema must be migrated):
+    python -m benchmarks.search_dishes [--dishes N] [--keep] [--reuse]
+Dishes' titles and descriptions are random combinations of a vocabulary of
+English and Russian words, so every word is found in thousands of them.
+The seed is made by one INSERT ... SELECT from `generate_series` and is
+deleted after the run unless `--keep` is given; `--reuse` skips seeding if
+the seed is already there."""
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import text
+
+from database import engine, session_scope
+from menus.repositories import DishRepository
+
+SEED_MENU_TITLE = "Search benchmark"
+SUBMENUS = 1000
+
+ADJECTIVES = ["fresh", "spicy", "grilled", "smoked", "baked", "fried",
+              "sweet", "sour", "creamy", "crispy", "домашний", "жареный",
+              "печеный", "острый", "сливочный"]
+INGREDIENTS = ["tomato", "chicken", "beef", "pork", "salmon", "tuna",
+               "mushroom", "cheese", "potato", "onion", "garlic", "basil",
+               "lemon", "apple", "cherry", "shrimp", "lamb", "duck",
+               "spinach", "pumpkin", "грибной", "куриный", "рыбный",
+               "сырный", "томатный", "мясной", "овощной", "ягодный"]
+DISHES = ["soup", "salad", "steak", "pie", "pasta", "risotto", "burger",
+          "sandwich", "pancakes", "stew", "curry", "pizza", "omelette",
+          "dumplings", "tart", "борщ", "суп", "салат", "пирог", "плов",
+          "блины", "пельмени", "котлета", "жаркое", "рагу"]
+
+# words of the vocabulary, misspelled words (replaced by similar ones),
+# phrases, `or` and `-word` queries of websearch syntax, and words not found
+QUERIES = ["soup", "salmon", "pasta", "борщ", "пельмени", "tomato soup",
+           "spicy chicken curry", "grilled salmon", "mushroom risotto",
+           "сырный суп", "домашние пельмени", "tomatto soop", "chiken curry",
+           "борш", '"creamy mushroom"', "pizza or pie", "soup -chicken",
+           "beef stew", "lemon tart", "lasagna"]
+
+SEED_SQL = text("""
+WITH menu AS (
+    INSERT INTO menus (id, title, description)
+    VALUES (gen_random_uuid(), :title, :title)
+    RETURNING id
+), submenus AS (
+    INSERT INTO submenus (id, title, description, menu_id)
+    SELECT gen_random_uuid(), 'Submenu ' || n, 'Submenu ' || n, menu.id
+    FROM menu, generate_series(1, :submenus) AS n
+    RETURNING id
+), numbered AS (
+    SELECT id, row_number() OVER () AS position FROM submenus
+)
+INSERT INTO dishes (id, title, description, price, submenu_id)
+SELECT gen_random_uuid(),
+       initcap((:adjectives)[1 + floor(
+                   random() * cardinality(:adjectives))::int]
+               || ' ' || (:ingredients)[1 + floor(
+                   random() * cardinality(:ingredients))::int]
+               || ' ' || (:words)[1 + floor(
+                   random() * cardinality(:words))::int]),
+       'With ' || (:ingredients)[1 + floor(
+                      random() * cardinality(:ingredients))::int]
+       || ' and ' || (:ingredients)[1 + floor(
+                         random() * cardinality(:ingredients))::int],
+       round((1 + random() * 99)::numeric, 2),
+       numbered.id
+FROM generate_series(1, :dishes) AS n
+JOIN numbered ON numbered.position = 1 + n % :submenus
+""")
+
+
+def seed(dishes: int, reuse: bool):
+    with engine.begin() as connection:
+        if reuse and connection.execute(
+                text("SELECT 1 FROM menus WHERE title = :title"),
+                {"title": SEED_MENU_TITLE}).first():
+            print("seed reused")
+            return
+        started = time.perf_counter()
+        connection.execute(SEED_SQL, {"title": SEED_MENU_TITLE,
+                                      "submenus": SUBMENUS,
+                                      "dishes": dishes,
+                                      "adjectives": ADJECTIVES,
+                                      "ingredients": INGREDIENTS,
+                                      "words": DISHES})
+    with engine.connect() as connection:
+        connection.execution_options(isolation_level="AUTOCOMMIT").execute(
+            text("VACUUM ANALYZE dishes"))
+    print(f"seeded {dishes} dishes in {time.perf_counter() - started:.1f}s")
+
+
+def delete_seed():
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM menus WHERE title = :title"),
+                           {"title": SEED_MENU_TITLE})
+
+
+async def search(q: str, pages: int) -> list[float]:
+    """Return latencies (ms) of the first `pages` pages of search."""
+    latencies = list()
+    after = None
+    for _ in range(pages):
+        async with session_scope() as session:
+            started = time.perf_counter()
+            page = await DishRepository(session).search(q, after=after)
+            latencies.append((time.perf_counter() - started) * 1000)
+        after = page.next_cursor
+        if after is None:
+            break
+    return latencies
+
+
+async def run_queries(rounds: int, pages: int):
+    latencies = list()
+    print(f"{'query':<24}{'p50, ms':>10}{'max, ms':>10}")
+    for q in QUERIES:
+        query_latencies = list()
+        for _ in range(rounds):
+            query_latencies.extend(await search(q, pages))
+        latencies.extend(query_latencies)
+        print(f"{q:<24}{statistics.median(query_latencies):>10.1f}"
+              f"{max(query_latencies):>10.1f}")
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f"all {len(latencies)} searches: p50 {quantiles[49]:.1f} ms, "
+          f"p95 {quantiles[94]:.1f} ms, p99 {quantiles[98]:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dishes", type=int, default=1_000_000)
+    parser.add_argument("--rounds", type=int, default=5,
+                        help="searches of every query")
+    parser.add_argument("--pages", type=int, default=3,
+                        help="pages read by every search")
+    parser.add_argument("--keep", action="store_true",
+                        help="keep the seed after the run")
+    parser.add_argument("--reuse", action="store_true",
+                        help="use the kept seed if it exists")
+    arguments = parser.parse_args()
+    seed(arguments.dishes, arguments.reuse)
+    try:
+        asyncio.run(run_queries(arguments.rounds, arguments.pages))
+    finally:
+        if not arguments.keep:
+            delete_seed()
@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import sys
+
+from database import Session, session_scope
+from menus.utils.counters import check_counters
+from menus.utils.export import export_catalog
+from menus.utils.response_cacher import MEMORY_REPORT_KINDS, response_cacher
+from menus.utils.warmup import (RESPONSE_CACHER_WARMUP_BATCH_SIZE,
+                                RESPONSE_CACHER_WARMUP_CONCURRENCY, warm_up)
+
+
+def run_check_counters(args) -> int:
+    with Session() as session:
+        drift = check_counters(session, fix=args.fix)
+    for table, rows in drift.items():
+        for row in rows:
+            actual = {key[len("actual_"):]: value
+                      for key, value in row.items()
+                      if key.startswith("actual_")}
+            stored = {key: row[key] for key in actual}
+            print(f"{table} {row['id']}: stored {stored}, actual {actual}")
+    drifted = sum(len(rows) for rows in drift.values())
+    status = "fixed" if args.fix else "found"
+    print(f"Counters drift: {drifted} row(s) {status}.")
+    return 1 if drifted and not args.fix else 0
+
+
+async def write_export(output) -> None:
+    async with session_scope() as session:
+        async for chunk in export_catalog(session):
+            output.write(chunk)
+
+
+def run_export(args) -> int:
+    if args.output == "-":
+        asyncio.run(write_export(sys.stdout.buffer))
+        return 0
+    with open(args.output, "wb") as output:
+        asyncio.run(write_export(output))
+    return 0
+
+
+def run_cache_report(args) -> int:
+    report = asyncio.run(response_cacher.get_memory_report())
+    print(f"{'endpoint':<24}"
+          + "".join(f"{kind + ' keys':>12}{kind + ' bytes':>14}"
+                    for kind in MEMORY_REPORT_KINDS))
+    totals = {kind: [0, 0] for kind in MEMORY_REPORT_KINDS}
+    for endpoint_name, kinds in report.items():
+        line = f"{endpoint_name:<24}"
+        for kind in MEMORY_REPORT_KINDS:
+            keys, usage = kinds.get(kind, [0, 0])
+            totals[kind][0] += keys
+            totals[kind][1] += usage
+            line += f"{keys:>12}{usage:>14}"
+        print(line)
+    print(f"{'total':<24}"
+          + "".join(f"{keys:>12}{usage:>14}"
+                    for keys, usage in totals.values()))
+    return 0
+
+
+def run_warm_up(args) -> int:
+    added = asyncio.run(warm_up(args.batch_size, args.concurrency))
+    print(f"Cache warm-up: {added} response(s) added.")
+    return 0
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Menus management commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+    counters = commands.add_parser(
+        "check-counters",
+        help="recompute submenus_count/dishes_count and report drift")
+    counters.add_argument("--fix", action="store_true",
+                          help="overwrite drifted counters")
+    counters.set_defaults(handler=run_check_counters)
+    export = commands.add_parser(
+        "export", help="stream whole catalog as NDJSON")
+    export.add_argument("-o", "--output", default="-",
+                        help="output file (default: stdout)")
+    export.set_defaults(handler=run_export)
+    cache_report = commands.add_parser(
+        "cache-report",
+        help="report number of response cache keys and memory per endpoint")
+    cache_report.set_defaults(handler=run_cache_report)
+    warm_up_command = commands.add_parser(
+        "warm-up",
+        help="add menus, submenus and dishes responses to the cache")
+    warm_up_command.add_argument(
+        "--batch-size", type=int, default=RESPONSE_CACHER_WARMUP_BATCH_SIZE,
+        help="menus per batch (default: %(default)s)")
+    warm_up_command.add_argument(
+        "--concurrency", type=int,
+        default=RESPONSE_CACHER_WARMUP_CONCURRENCY,
+        help="batches warmed up at once (default: %(default)s)")
+    warm_up_command.set_defaults(handler=run_warm_up)
+    return parser
+
+
+if __name__ == "__main__":
+    arguments = get_parser().parse_args()
+    sys.exit(arguments.handler(arguments))
@@ -10,6 +10,17 @@ POSTGRES_DB = os.getenv("POSTGRES_DB")
 POSTGRES_USER = os.getenv("POSTGRES_USER")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
 
+# POSTGRES_REPLICA_HOST / POSTGRES_REPLICA_PORT - optional read replica of
+# the database (same database name, user and password) used by GET endpoints
+POSTGRES_REPLICA_HOST = os.getenv("POSTGRES_REPLICA_HOST")
+POSTGRES_REPLICA_PORT = os.getenv("POSTGRES_REPLICA_PORT",
+                                  default=POSTGRES_PORT)
+
+# DATABASE_PRIMARY_PIN - seconds for which GET requests of a client are
+# sent to the primary database after its write, so it reads its writes
+# from the lagging replica (`0` - disabled)
+DATABASE_PRIMARY_PIN = int(os.getenv("DATABASE_PRIMARY_PIN", default=5))
+
 POSTGRES_HOST_TEST = os.getenv("POSTGRES_HOST_TEST")
 POSTGRES_PORT_TEST = os.getenv("POSTGRES_PORT_TEST")
 POSTGRES_DB_TEST = os.getenv("POSTGRES_DB_TEST")
@@ -19,3 +30,44 @@ POSTGRES_PASSWORD_TEST = os.getenv("POSTGRES_PASSWORD_TEST")
 REDIS_HOST = os.getenv("REDIS_HOST")
 REDIS_PORT = os.getenv("REDIS_PORT")
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD")
+
+# DATABASE_ASYNC - environment variable, may be `1` for the asyncpg request
+# path (AsyncSession) or `0` for psycopg2 sessions run in the threadpool
+DATABASE_ASYNC = int(os.getenv("DATABASE_ASYNC", default=1))
+
+# DATABASE_POOL_SIZE / DATABASE_MAX_OVERFLOW - connections kept in the pool
+# of every engine and connections opened over them under load
+# DATABASE_POOL_TIMEOUT - seconds for which a request waits for a connection
+# DATABASE_POOL_RECYCLE - seconds after which a connection is reopened
+# (`-1` - never)
+# DATABASE_POOL_PRE_PING - may be `1` for checking connections on checkout
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", default=5))
+DATABASE_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", default=10))
+DATABASE_POOL_TIMEOUT = float(os.getenv("DATABASE_POOL_TIMEOUT", default=30))
+DATABASE_POOL_RECYCLE = int(os.getenv("DATABASE_POOL_RECYCLE", default=-1))
+DATABASE_POOL_PRE_PING = int(os.getenv("DATABASE_POOL_PRE_PING", default=0))
+
+# DATABASE_NULL_POOL - may be `1` for opening a connection per session
+# instead of pooling them (e.g. when PgBouncer pools them)
+# DATABASE_PGBOUNCER - may be `1` for PgBouncer in transaction pooling mode:
+# asyncpg does not cache server-side prepared statements
+DATABASE_NULL_POOL = int(os.getenv("DATABASE_NULL_POOL", default=0))
+DATABASE_PGBOUNCER = int(os.getenv("DATABASE_PGBOUNCER", default=0))
+
+# THREADPOOL_SIZE - threads running sync handlers and sync database calls
+# (`DATABASE_ASYNC=0`), anyio's default is 40
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", default=40))
+
+# PAGE_LIMIT_DEFAULT / PAGE_LIMIT_MAX - default and maximum `limit` for list
+# endpoints (keyset pagination)
+PAGE_LIMIT_DEFAULT = int(os.getenv("PAGE_LIMIT_DEFAULT", default=100))
+PAGE_LIMIT_MAX = int(os.getenv("PAGE_LIMIT_MAX", default=1000))
+
+# SEARCH_RANK_LIMIT - number of dishes matching a search (with the least
+# ids) which are ranked and paginated; other matches are not returned, so
+# common words are not ranked for every dish having them
+SEARCH_RANK_LIMIT = int(os.getenv("SEARCH_RANK_LIMIT", default=1000))
+
+# QUERY_COUNT_WARNING - number of SQL queries per request over which
+# a warning is logged (number of queries is sent in `X-Query-Count` header)
+QUERY_COUNT_WARNING = int(os.getenv("QUERY_COUNT_WARNING", default=10))
@@ -1,31 +1,265 @@
-from redis import StrictRedis
-from sqlalchemy import create_engine
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+from redis.asyncio import StrictRedis
+from sqlalchemy import create_engine, orm
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import NullPool
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from config import (POSTGRES_DB, POSTGRES_HOST, POSTGRES_PASSWORD,
-                    POSTGRES_PORT, POSTGRES_USER, REDIS_HOST, REDIS_PASSWORD,
-                    REDIS_PORT)
+from config import (DATABASE_ASYNC, DATABASE_MAX_OVERFLOW, DATABASE_NULL_POOL,
+                    DATABASE_PGBOUNCER, DATABASE_POOL_PRE_PING,
+                    DATABASE_POOL_RECYCLE, DATABASE_POOL_SIZE,
+                    DATABASE_POOL_TIMEOUT, DATABASE_PRIMARY_PIN, POSTGRES_DB,
+                    POSTGRES_HOST, POSTGRES_PASSWORD, POSTGRES_PORT,
+                    POSTGRES_REPLICA_HOST, POSTGRES_REPLICA_PORT,
+                    POSTGRES_USER, REDIS_HOST, REDIS_PASSWORD, REDIS_PORT)
 
 DATABASE_URL = (f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}"
                 f"@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}")
+ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://",
+                                          "postgresql+asyncpg://", 1)
+REPLICA_DATABASE_URL = (
+    f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}"
+    f"@{POSTGRES_REPLICA_HOST}:{POSTGRES_REPLICA_PORT}/{POSTGRES_DB}"
+    if POSTGRES_REPLICA_HOST else None)
+
+# cookie set by responses to writes: while it is sent, GET requests of
+# the client read from the primary database
+PRIMARY_PIN_COOKIE = "db_primary"
+# set while a response is rendered for the cache shortly after any write:
+# replica sessions read from the primary database meanwhile
+read_primary: ContextVar[bool] = ContextVar("read_primary", default=False)
+
+logger = logging.getLogger(__name__)
 
 Base = declarative_base()
 
-engine = create_engine(DATABASE_URL)
-Session = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+def get_pool_options() -> dict:
+    """Pool options of both engines (see `DATABASE_POOL_*` settings)."""
+    options = {"pool_recycle": DATABASE_POOL_RECYCLE,
+               "pool_pre_ping": bool(DATABASE_POOL_PRE_PING)}
+    if DATABASE_NULL_POOL:
+        return options | {"poolclass": NullPool}
+    return options | {"pool_size": DATABASE_POOL_SIZE,
+                      "max_overflow": DATABASE_MAX_OVERFLOW,
+                      "pool_timeout": DATABASE_POOL_TIMEOUT}
+
+
+def get_async_connect_args() -> dict:
+    """asyncpg connection arguments. PgBouncer in transaction pooling mode
+    may run statements of one connection on different server connections,
+    so prepared statements are not cached and have unique names."""
+    if not DATABASE_PGBOUNCER:
+        return {}
+    return {"statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func":
+                lambda: f"__asyncpg_{uuid.uuid4()}__"}
+
+
+def check_pool_size(threads: int):
+    """Warn if sync database calls run in `threads` threads
+    (`DATABASE_ASYNC=0`) may wait for a connection of the pool."""
+    if DATABASE_NULL_POOL or DATABASE_MAX_OVERFLOW < 0:
+        return
+    connections = DATABASE_POOL_SIZE + DATABASE_MAX_OVERFLOW
+    if connections < threads:
+        logger.warning(
+            "Threadpool runs up to %d database calls at once, but the "
+            "database pool has up to %d connections (DATABASE_POOL_SIZE "
+            "and DATABASE_MAX_OVERFLOW), so requests wait for connections.",
+            threads, connections)
+
+
+engine = create_engine(DATABASE_URL, **get_pool_options())
+Session = sessionmaker(bind=engine, autocommit=False, autoflush=False,
+                       expire_on_commit=False)
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL,
+                                   connect_args=get_async_connect_args(),
+                                   **get_pool_options())
+AsyncSession = async_sessionmaker(bind=async_engine, autoflush=False,
+                                  expire_on_commit=False)
+
+
+class ReplicaRoutingSession(orm.Session):
+    """Session of the replica database, which reads from the primary one
+    (`info["primary"]` engine) while `read_primary` is set."""
+
+    def get_bind(self, *args, **kwargs):
+        if read_primary.get():
+            return self.info["primary"]
+        return super().get_bind(*args, **kwargs)
+
+
+# replica engines and sessions are the primary ones if replica is not set
+replica_engine = engine
+ReplicaSession = Session
+replica_async_engine = async_engine
+AsyncReplicaSession = AsyncSession
+if REPLICA_DATABASE_URL:
+    replica_engine = create_engine(REPLICA_DATABASE_URL, **get_pool_options())
+    ReplicaSession = sessionmaker(bind=replica_engine,
+                                  class_=ReplicaRoutingSession,
+                                  info={"primary": engine}, autocommit=False,
+                                  autoflush=False, expire_on_commit=False)
+    replica_async_engine = create_async_engine(
+        REPLICA_DATABASE_URL.replace("postgresql://",
+                                     "postgresql+asyncpg://", 1),
+        connect_args=get_async_connect_args(),
+        **get_pool_options())
+    AsyncReplicaSession = async_sessionmaker(
+        bind=replica_async_engine,
+        sync_session_class=ReplicaRoutingSession,
+        info={"primary": async_engine.sync_engine}, autoflush=False,
+        expire_on_commit=False)
 
 redis_cache = StrictRedis(
     host=REDIS_HOST,
     port=REDIS_PORT,
     password=REDIS_PASSWORD,
-    charset="utf-8",
-    decode_responses=True
+    encoding="utf-8",
+    decode_responses=False
 )
 
 
-def get_session():
-    db = Session()
+class ThreadedSession:
+    """AsyncSession-like wrapper around a sync session.
+    Every database call is run in the threadpool, which keeps the psycopg2
+    request path available when `DATABASE_ASYNC` is `0`."""
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def execute(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute,
+                                       statement, *args, **kwargs)
+
+    async def scalar(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar,
+                                       statement, *args, **kwargs)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get,
+                                       entity, ident, **kwargs)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+    async def stream(self, statement, *args, **kwargs):
+        result = await run_in_threadpool(
+            self.sync_session.execute,
+            statement.execution_options(stream_results=True),
+            *args, **kwargs)
+        return ThreadedResult(result)
+
+
+class ThreadedResult:
+    """AsyncResult-like wrapper around a server-side cursor result."""
+
+    def __init__(self, result):
+        self.sync_result = result
+
+    async def partitions(self, size: int | None = None):
+        partitions = self.sync_result.partitions(size)
+        while partition := await run_in_threadpool(next, partitions, None):
+            yield partition
+
+
+async def open_session(async_session_factory, session_factory):
+    if DATABASE_ASYNC:
+        async with async_session_factory() as db:
+            yield db
+        return
+    db = ThreadedSession(session_factory())
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
+
+
+async def get_session():
+    async for db in open_session(AsyncSession, Session):
+        yield db
+
+
+async def get_read_session(request: Request):
+    """Dependency for read-only endpoints: session of the replica database
+    (if it is set), or of the primary one for clients pinned to it after
+    their writes (see `PrimaryPinMiddleware`). Replica session reads from
+    the primary database while `read_primary` is set, so responses cached
+    after any write are not rendered from the lagging replica (see
+    `ResponseCacher.get_or_add`)."""
+    if PRIMARY_PIN_COOKIE in request.cookies:
+        factories = (AsyncSession, Session)
+    else:
+        factories = (AsyncReplicaSession, ReplicaSession)
+    async for db in open_session(*factories):
+        yield db
+
+
+session_scope = asynccontextmanager(get_session)
+
+
+def get_session_scope():
+    """Dependency for responses which use the database after the endpoint
+    returned (e.g. `StreamingResponse`), as `get_session` is closed by then.
+    Returns async context manager factory for new sessions."""
+    return session_scope
+
+
+class PrimaryPinMiddleware:
+    """Set `PRIMARY_PIN_COOKIE` expiring after `DATABASE_PRIMARY_PIN`
+    seconds on successful responses to writes (methods other than GET,
+    HEAD and OPTIONS), so the client reads its writes (and refills the
+    cache with them) from the primary database until the replica catches
+    up."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (scope["type"] != "http"
+                or scope["method"] in ("GET", "HEAD", "OPTIONS")):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_pin(message: Message):
+            if (message["type"] == "http.response.start"
+                    and message["status"] < 400):
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"set-cookie",
+                     f"{PRIMARY_PIN_COOKIE}=1; Max-Age={DATABASE_PRIMARY_PIN}"
+                     "; Path=/; HttpOnly; SameSite=Lax".encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_pin)
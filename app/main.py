@@ -1,10 +1,51 @@
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 
+from config import DATABASE_ASYNC, DATABASE_PRIMARY_PIN, THREADPOOL_SIZE
+from database import (REPLICA_DATABASE_URL, PrimaryPinMiddleware, async_engine,
+                      check_pool_size, engine, replica_async_engine,
+                      replica_engine)
 from menus.router import router as router_menus
+from menus.utils.etag import ETagMiddleware
+from menus.utils.response_cacher import response_cacher
+from menus.utils.warmup import warming_up
+from metrics import MetricsMiddleware, get_metrics, instrument_engine
+from query_counter import QueryCounterMiddleware, count_queries
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    if not DATABASE_ASYNC:
+        check_pool_size(THREADPOOL_SIZE)
+    async with response_cacher.listening(), warming_up():
+        yield
+
 
 app = FastAPI(title="Menu Management",
               docs_url='/api/docs',
               redoc_url='/api/redoc',
-              openapi_url='/api/openapi.json')
+              openapi_url='/api/openapi.json',
+              default_response_class=ORJSONResponse,
+              lifespan=lifespan)
 
+app.add_middleware(ETagMiddleware)
+app.add_middleware(QueryCounterMiddleware)
+app.add_middleware(MetricsMiddleware)
+if REPLICA_DATABASE_URL and DATABASE_PRIMARY_PIN:
+    app.add_middleware(PrimaryPinMiddleware)
 app.include_router(router_menus)
+app.add_route("/metrics", get_metrics, include_in_schema=False)
+
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+count_queries(engine)
+count_queries(async_engine.sync_engine)
+if REPLICA_DATABASE_URL:
+    instrument_engine(replica_engine, "replica_sync")
+    instrument_engine(replica_async_engine.sync_engine, "replica_async")
+    count_queries(replica_engine)
+    count_queries(replica_async_engine.sync_engine)
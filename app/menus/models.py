@@ -1,19 +1,30 @@
 import uuid
 
-from sqlalchemy import UUID, Column, ForeignKey, String
+from sqlalchemy import (DDL, UUID, Column, Computed, ForeignKey, Index,
+                        Integer, Numeric, String, event, literal_column)
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import relationship
 
 from database import Base
 from menus.utils.extended_base import ExtendedBase
 
+# The `simple` text search configuration does not stem or drop stop words,
+# so dishes' titles in any language are matched word by word
+SEARCH_CONFIG = literal_column("'simple'::regconfig")
+
 
 class Menu(ExtendedBase, Base):
     __tablename__ = "menus"
     id = Column(UUID, primary_key=True, default=uuid.uuid4)
     title = Column(String, nullable=False)
     description = Column(String, nullable=False)
+    submenus_count = Column(Integer, nullable=False,
+                            default=0, server_default="0")
+    dishes_count = Column(Integer, nullable=False,
+                          default=0, server_default="0")
     submenus = relationship("Submenu", back_populates="menu",
-                            cascade="all, delete-orphan")
+                            cascade="all, delete-orphan",
+                            passive_deletes=True)
 
 
 class Submenu(ExtendedBase, Base):
@@ -21,10 +32,14 @@ class Submenu(ExtendedBase, Base):
     id = Column(UUID, primary_key=True, default=uuid.uuid4)
     title = Column(String, nullable=False)
     description = Column(String, nullable=False)
-    menu_id = Column(UUID, ForeignKey("menus.id"))
+    dishes_count = Column(Integer, nullable=False,
+                          default=0, server_default="0")
+    menu_id = Column(UUID, ForeignKey("menus.id", ondelete="CASCADE"),
+                     index=True)
     menu = relationship("Menu", back_populates="submenus")
     dishes = relationship("Dish", back_populates="submenu",
-                          cascade="all, delete-orphan")
+                          cascade="all, delete-orphan",
+                          passive_deletes=True)
 
 
 class Dish(ExtendedBase, Base):
@@ -32,6 +47,142 @@ class Dish(ExtendedBase, Base):
     id = Column(UUID, primary_key=True, default=uuid.uuid4)
     title = Column(String, nullable=False)
     description = Column(String, nullable=False)
-    price = Column(String, nullable=False)
-    submenu_id = Column(UUID, ForeignKey("submenus.id"))
+    price = Column(Numeric(10, 2), nullable=False)
+    submenu_id = Column(UUID, ForeignKey("submenus.id", ondelete="CASCADE"))
+    # words of title (weighted higher) and description maintained by
+    # Postgres, so search ranks dishes without parsing them again
+    search_vector = Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('simple'::regconfig, title), 'A') || "
+        "setweight(to_tsvector('simple'::regconfig, description), 'B')",
+        persisted=True))
     submenu = relationship("Submenu", back_populates="dishes")
+    # submenu's dishes filtered and keyset-paginated by price (and id),
+    # also used by foreign key lookups instead of index on submenu_id
+    __table_args__ = (
+        Index("ix_dishes_submenu_id_price", "submenu_id", "price", "id"),
+        Index("ix_dishes_search_vector", "search_vector",
+              postgresql_using="gin"),
+    )
+
+
+class SearchWord(ExtendedBase, Base):
+    """Word of any dish's `search_vector`. Misspelled words of search
+    queries are replaced by similar words (trigram index of `pg_trgm`),
+    which is much faster than comparing the query with every dish."""
+    __tablename__ = "search_words"
+    word = Column(String, primary_key=True)
+    __table_args__ = (
+        Index("ix_search_words_word_trgm", "word", postgresql_using="gin",
+              postgresql_ops={"word": "gin_trgm_ops"}),
+    )
+
+
+# `pg_trgm` extension is required by `ix_search_words_word_trgm`
+PG_TRGM_DDL = DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+# `submenus_count` and `dishes_count` are maintained by statement-level
+# triggers in the same transaction as the insert or delete of submenus or
+# dishes, so multi-row statements update every counter once. The same DDL is
+# applied by the migration `8e2f6a1d4c7b_statement_counters`.
+SUBMENUS_COUNTERS_DDL = DDL("""
+CREATE OR REPLACE FUNCTION submenus_counters() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE menus
+        SET submenus_count = menus.submenus_count + changed.submenus_count,
+            dishes_count = menus.dishes_count + changed.dishes_count
+        FROM (SELECT menu_id, count(*) AS submenus_count,
+                     sum(dishes_count) AS dishes_count
+              FROM new_submenus GROUP BY menu_id) AS changed
+        WHERE menus.id = changed.menu_id;
+    ELSE
+        UPDATE menus
+        SET submenus_count = menus.submenus_count - changed.submenus_count,
+            dishes_count = menus.dishes_count - changed.dishes_count
+        FROM (SELECT menu_id, count(*) AS submenus_count,
+                     sum(dishes_count) AS dishes_count
+              FROM old_submenus GROUP BY menu_id) AS changed
+        WHERE menus.id = changed.menu_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER submenus_counters_insert AFTER INSERT ON submenus
+REFERENCING NEW TABLE AS new_submenus
+FOR EACH STATEMENT EXECUTE FUNCTION submenus_counters();
+CREATE TRIGGER submenus_counters_delete AFTER DELETE ON submenus
+REFERENCING OLD TABLE AS old_submenus
+FOR EACH STATEMENT EXECUTE FUNCTION submenus_counters();
+""")
+
+DISHES_COUNTERS_DDL = DDL("""
+CREATE OR REPLACE FUNCTION dishes_counters() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE submenus
+        SET dishes_count = submenus.dishes_count + changed.dishes_count
+        FROM (SELECT submenu_id, count(*) AS dishes_count
+              FROM new_dishes GROUP BY submenu_id) AS changed
+        WHERE submenus.id = changed.submenu_id;
+        UPDATE menus
+        SET dishes_count = menus.dishes_count + changed.dishes_count
+        FROM (SELECT submenus.menu_id, count(*) AS dishes_count
+              FROM new_dishes
+              JOIN submenus ON submenus.id = new_dishes.submenu_id
+              GROUP BY submenus.menu_id) AS changed
+        WHERE menus.id = changed.menu_id;
+    ELSE
+        UPDATE submenus
+        SET dishes_count = submenus.dishes_count - changed.dishes_count
+        FROM (SELECT submenu_id, count(*) AS dishes_count
+              FROM old_dishes GROUP BY submenu_id) AS changed
+        WHERE submenus.id = changed.submenu_id;
+        UPDATE menus
+        SET dishes_count = menus.dishes_count - changed.dishes_count
+        FROM (SELECT submenus.menu_id, count(*) AS dishes_count
+              FROM old_dishes
+              JOIN submenus ON submenus.id = old_dishes.submenu_id
+              GROUP BY submenus.menu_id) AS changed
+        WHERE menus.id = changed.menu_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER dishes_counters_insert AFTER INSERT ON dishes
+REFERENCING NEW TABLE AS new_dishes
+FOR EACH STATEMENT EXECUTE FUNCTION dishes_counters();
+CREATE TRIGGER dishes_counters_delete AFTER DELETE ON dishes
+REFERENCING OLD TABLE AS old_dishes
+FOR EACH STATEMENT EXECUTE FUNCTION dishes_counters();
+""")
+
+# words of inserted and updated dishes are added to `search_words` by
+# statement-level triggers as well, words of deleted dishes are kept.
+# The same DDL is applied by the migration `3f9c2b7e1a64_dish_search`.
+SEARCH_WORDS_DDL = DDL("""
+CREATE OR REPLACE FUNCTION search_words() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO search_words (word)
+    SELECT DISTINCT unnest(tsvector_to_array(search_vector)) AS word
+    FROM new_dishes
+    ORDER BY word
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER search_words_insert AFTER INSERT ON dishes
+REFERENCING NEW TABLE AS new_dishes
+FOR EACH STATEMENT EXECUTE FUNCTION search_words();
+CREATE TRIGGER search_words_update AFTER UPDATE ON dishes
+REFERENCING NEW TABLE AS new_dishes
+FOR EACH STATEMENT EXECUTE FUNCTION search_words();
+""")
+
+event.listen(Submenu.__table__, "after_create",
+             SUBMENUS_COUNTERS_DDL.execute_if(dialect="postgresql"))
+event.listen(Dish.__table__, "after_create",
+             DISHES_COUNTERS_DDL.execute_if(dialect="postgresql"))
+event.listen(Dish.__table__, "after_create",
+             SEARCH_WORDS_DDL.execute_if(dialect="postgresql"))
+event.listen(Base.metadata, "before_create",
+             PG_TRGM_DDL.execute_if(dialect="postgresql"))
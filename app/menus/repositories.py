@@ -1,112 +1,197 @@
+import uuid
+from decimal import Decimal
 from uuid import UUID
 
 from fastapi import Depends
-from sqlalchemy import func
+from sqlalchemy import (Double, Row, and_, cast, delete, func, insert,
+                        literal_column, select, tuple_, update)
 from starlette import status
 from starlette.responses import JSONResponse
 
-from database import Session, get_session
-from menus.models import Dish, Menu, Submenu
-from menus.schemas import DishReadSchema, MenuReadSchema, SubmenuReadSchema
+from config import PAGE_LIMIT_DEFAULT, SEARCH_RANK_LIMIT
+from database import AsyncSession, get_session
+from menus.models import SEARCH_CONFIG, Dish, Menu, SearchWord, Submenu
+from menus.schemas import (DishReadSchema, DishSearchSchema, MenuReadSchema,
+                           MenuTreeSchema, SubmenuReadSchema)
+from menus.utils.pagination import (MissingPage, Page, get_after_key, get_page,
+                                    get_raw_page, paginate, paginate_outerjoin)
+
+# rows per multi-row INSERT, keeps bind parameters under the Postgres limit
+BULK_INSERT_BATCH_SIZE = 1000
 
 
 class MenuRepository:
-    def __init__(self, session: Session = Depends(get_session)):
+    def __init__(self, session: AsyncSession = Depends(get_session)):
         self.session = session
         self.model = Menu
         self.schema = MenuReadSchema
-        self.query = (session.query(
-            Menu.id,
-            Menu.title,
-            Menu.description,
-            func.count(func.distinct(Submenu.id)).label("submenus_count"),
-            func.count(func.distinct(Dish.id)).label("dishes_count"))
-            .outerjoin(Submenu, Submenu.menu_id == Menu.id)
-            .outerjoin(Dish, Dish.submenu_id == Submenu.id)
-            .group_by(Menu.id))
+        self.query = select(Menu.id,
+                            Menu.title,
+                            Menu.description,
+                            Menu.submenus_count,
+                            Menu.dishes_count)
 
-    def get_all(self) -> list[MenuReadSchema]:
-        return [self.schema.model_validate(menu._asdict())
-                for menu in self.query.all()]
+    async def get_all(self, limit: int = PAGE_LIMIT_DEFAULT,
+                      after: str | None = None) -> Page | JSONResponse:
+        after_key = get_after_key(after)
+        if isinstance(after_key, JSONResponse):
+            return after_key  # response with http code 400
+        menus = await self.session.execute(
+            paginate(self.query, self.model.id, limit, after_key))
+        return get_raw_page(menus, self.schema, limit)
 
-    def create(self, input_data: dict) -> MenuReadSchema:
+    async def create(self, input_data: dict) -> MenuReadSchema:
         new_menu = self.model(**input_data)
         self.session.add(new_menu)
-        self.session.commit()
+        await self.session.commit()
         return self.schema.model_validate(new_menu.as_dict())
 
-    def get_model_obj(self, menu_id: UUID) -> Menu | JSONResponse:
-        menu = (self.session.query(self.model)
-                .filter(self.model.id == menu_id).first())
+    async def get_model_obj(self, menu_id: UUID) -> Menu | JSONResponse:
+        menu = await self.session.get(self.model, menu_id)
         return menu or JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
             content={"detail": f"{self.model.__name__.lower()} not found"})
 
-    def get(self, menu_id: UUID) -> MenuReadSchema | JSONResponse:
-        menu = self.query.filter(self.model.id == menu_id).first()
+    async def get(self, menu_id: UUID) -> MenuReadSchema | JSONResponse:
+        menu = (await self.session.execute(
+            self.query.where(self.model.id == menu_id))).first()
         if not menu:
             return (JSONResponse(
                     status_code=status.HTTP_404_NOT_FOUND,
                     content={"detail": f"{self.model.__name__.lower()} "
-                                       f"not found"}))
+                                       "not found"}))
         return self.schema.model_validate(menu._asdict())
 
-    def update(self, menu_id: UUID,
-               input_data: dict) -> MenuReadSchema | JSONResponse:
-        menu = self.get_model_obj(menu_id)
-        if isinstance(menu, JSONResponse):
-            return menu  # response with http code 404
-        menu.update(**input_data)
-        self.session.add(menu)
-        self.session.commit()
-        response_query = self.query.filter(self.model.id == menu_id).first()
-        return self.schema.model_validate(response_query._asdict())
-
-    def delete(self, menu_id: UUID) -> JSONResponse:
-        menu = self.get_model_obj(menu_id)
-        if isinstance(menu, JSONResponse):
-            return menu  # response with http code 404
-        self.session.delete(menu)
-        self.session.commit()
+    async def get_tree(self, menu_id: UUID) -> MenuTreeSchema | JSONResponse:
+        """Load menu with all submenus and dishes by one joined select."""
+        rows = (await self.session.execute(
+            select(Menu.id,
+                   Menu.title,
+                   Menu.description,
+                   Menu.submenus_count,
+                   Menu.dishes_count,
+                   Submenu.id.label("submenu_id"),
+                   Submenu.title.label("submenu_title"),
+                   Submenu.description.label("submenu_description"),
+                   Submenu.dishes_count.label("submenu_dishes_count"),
+                   Dish.id.label("dish_id"),
+                   Dish.title.label("dish_title"),
+                   Dish.description.label("dish_description"),
+                   Dish.price.label("dish_price"))
+            .outerjoin(Submenu, Submenu.menu_id == Menu.id)
+            .outerjoin(Dish, Dish.submenu_id == Submenu.id)
+            .where(Menu.id == menu_id)
+            .order_by(Submenu.id, Dish.id))).all()
+        if not rows:
+            return (JSONResponse(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    content={"detail": f"{self.model.__name__.lower()} "
+                                       "not found"}))
+        menu = rows[0]
+        submenus = dict()
+        for row in rows:
+            if row.submenu_id is None:
+                continue
+            if row.submenu_id not in submenus:
+                submenus[row.submenu_id] = {
+                    "id": row.submenu_id,
+                    "title": row.submenu_title,
+                    "description": row.submenu_description,
+                    "dishes_count": row.submenu_dishes_count,
+                    "dishes": []
+                }
+            if row.dish_id is not None:
+                submenus[row.submenu_id]["dishes"].append({
+                    "id": row.dish_id,
+                    "title": row.dish_title,
+                    "description": row.dish_description,
+                    "price": row.dish_price
+                })
+        return MenuTreeSchema.model_validate({
+            "id": menu.id,
+            "title": menu.title,
+            "description": menu.description,
+            "submenus_count": menu.submenus_count,
+            "dishes_count": menu.dishes_count,
+            "submenus": list(submenus.values())
+        })
+
+    async def update(self, menu_id: UUID,
+                     input_data: dict) -> MenuReadSchema | JSONResponse:
+        menu = (await self.session.execute(
+            update(self.model)
+            .where(self.model.id == menu_id)
+            .values(**input_data)
+            .returning(*self.query.selected_columns))).first()
+        if not menu:
+            return (JSONResponse(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    content={"detail": f"{self.model.__name__.lower()} "
+                                       "not found"}))
+        await self.session.commit()
+        return self.schema.model_validate(menu._asdict())
+
+    async def delete(self, menu_id: UUID) -> JSONResponse:
+        """Delete menu by one statement, its submenus and dishes are
+        deleted by the database (ON DELETE CASCADE)."""
+        menu = (await self.session.execute(
+            delete(self.model)
+            .where(self.model.id == menu_id)
+            .returning(self.model.id))).first()
+        if not menu:
+            return (JSONResponse(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    content={"detail": f"{self.model.__name__.lower()} "
+                                       "not found"}))
+        await self.session.commit()
         return JSONResponse(content={"status": True,
                                      "message": "The menu has been deleted"})
 
 
 class SubmenuRepository:
-    def __init__(self, session: Session = Depends(get_session)):
+    def __init__(self, session: AsyncSession = Depends(get_session)):
         self.session = session
         self.model = Submenu
         self.schema = SubmenuReadSchema
-        self.query = (session.query(
-            Submenu.id,
-            Submenu.title,
-            Submenu.description,
-            func.count(func.distinct(Dish.id)).label("dishes_count"))
-            .outerjoin(Dish, Dish.submenu_id == Submenu.id)
-            .group_by(Submenu.id))
+        self.query = select(Submenu.id,
+                            Submenu.title,
+                            Submenu.description,
+                            Submenu.dishes_count)
 
-    def get_all(self, menu_id: UUID) -> list[SubmenuReadSchema] | JSONResponse:
-        menu = MenuRepository(self.session).get_model_obj(menu_id)
-        if isinstance(menu, JSONResponse):
-            return menu  # response with http code 404
-        submenus = self.query.filter(Submenu.menu_id == menu_id).all()
-        return [self.schema.model_validate(submenu._asdict())
-                for submenu in submenus]
+    async def get_all(self, menu_id: UUID,
+                      limit: int = PAGE_LIMIT_DEFAULT,
+                      after: str | None = None) -> Page | JSONResponse:
+        """Select menu's submenus page and check menu by one query."""
+        after_key = get_after_key(after)
+        if isinstance(after_key, JSONResponse):
+            return after_key  # response with http code 400
+        submenus = (await self.session.execute(
+            paginate_outerjoin(
+                select(Menu.id.label("parent_id"),
+                       *self.query.selected_columns)
+                .where(Menu.id == menu_id),
+                self.model, Submenu.menu_id == Menu.id,
+                self.model.id, limit, after_key))).all()
+        if not submenus:
+            return JSONResponse(status_code=status.HTTP_404_NOT_FOUND,
+                                content={"detail": "menu not found"})
+        if submenus[0].id is None:
+            return Page()
+        return get_raw_page(submenus, self.schema, limit)
 
-    def create(self, menu_id,
-               input_data: dict) -> SubmenuReadSchema | JSONResponse:
-        menu = MenuRepository(self.session).get_model_obj(menu_id)
+    async def create(self, menu_id,
+                     input_data: dict) -> SubmenuReadSchema | JSONResponse:
+        menu = await MenuRepository(self.session).get_model_obj(menu_id)
         if isinstance(menu, JSONResponse):
             return menu  # response with http code 404
-        new_submenu = self.model(**input_data)
-        menu.submenus.append(new_submenu)
-        self.session.commit()
+        new_submenu = self.model(**input_data, menu_id=menu.id)
+        self.session.add(new_submenu)
+        await self.session.commit()
         return self.schema.model_validate(new_submenu.as_dict())
 
-    def get_model_obj(self, menu_id: UUID,
-                      submenu_id: UUID) -> Submenu | JSONResponse:
-        submenu = (self.session.query(self.model)
-                   .filter(self.model.id == submenu_id).first())
+    async def get_model_obj(self, menu_id: UUID,
+                            submenu_id: UUID) -> Submenu | JSONResponse:
+        submenu = await self.session.get(self.model, submenu_id)
         if not submenu:
             return (JSONResponse(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -119,115 +204,285 @@ class SubmenuRepository:
             )
         return submenu
 
-    def get(self, menu_id: UUID,
-            submenu_id: UUID) -> SubmenuReadSchema | JSONResponse:
-        submenu = self.get_model_obj(menu_id, submenu_id)
-        if isinstance(submenu, JSONResponse):
-            return submenu  # response with http code 404 or 400
-        response_query = self.query.filter(self.model.id == submenu_id).first()
-        return self.schema.model_validate(response_query._asdict())
+    async def get_row(self, menu_id: UUID,
+                      submenu_id: UUID) -> Row | JSONResponse:
+        """Select submenu's response row with its menu id by one query."""
+        submenu = (await self.session.execute(
+            self.query.add_columns(self.model.menu_id)
+            .where(self.model.id == submenu_id))).first()
+        if not submenu:
+            return (JSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"detail": f"{self.model.__name__.lower()} "
+                                   "not found"}))
+        if submenu.menu_id != menu_id:
+            return JSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={"detail": "menu id incorrect"}
+            )
+        return submenu
 
-    def update(self, menu_id: UUID,
-               submenu_id: UUID,
-               input_data: dict) -> SubmenuReadSchema | JSONResponse:
-        submenu = self.get_model_obj(menu_id, submenu_id)
-        if isinstance(submenu, JSONResponse):
-            return submenu  # response with http code 404 or 400
-        submenu.update(**input_data)
-        self.session.add(submenu)
-        self.session.commit()
-        response_query = self.query.filter(self.model.id == submenu_id).first()
-        return self.schema.model_validate(response_query._asdict())
-
-    def delete(self, menu_id: UUID, submenu_id: UUID) -> JSONResponse:
-        submenu = self.get_model_obj(menu_id, submenu_id)
+    async def get(self, menu_id: UUID,
+                  submenu_id: UUID) -> SubmenuReadSchema | JSONResponse:
+        submenu = await self.get_row(menu_id, submenu_id)
         if isinstance(submenu, JSONResponse):
             return submenu  # response with http code 404 or 400
-        self.session.delete(submenu)
-        self.session.commit()
+        return self.schema.model_validate(submenu._asdict())
+
+    async def update(self, menu_id: UUID,
+                     submenu_id: UUID,
+                     input_data: dict) -> SubmenuReadSchema | JSONResponse:
+        submenu = (await self.session.execute(
+            update(self.model)
+            .where(self.model.id == submenu_id,
+                   self.model.menu_id == menu_id)
+            .values(**input_data)
+            .returning(*self.query.selected_columns))).first()
+        if not submenu:
+            # ids are not changed by requests, so the row is not found
+            # by get_row as well: response with http code 404 or 400
+            return await self.get_row(menu_id, submenu_id)
+        await self.session.commit()
+        return self.schema.model_validate(submenu._asdict())
+
+    async def delete(self, menu_id: UUID, submenu_id: UUID) -> JSONResponse:
+        """Delete submenu by one statement, its dishes are deleted by
+        the database (ON DELETE CASCADE)."""
+        submenu = (await self.session.execute(
+            delete(self.model)
+            .where(self.model.id == submenu_id,
+                   self.model.menu_id == menu_id)
+            .returning(self.model.id))).first()
+        if not submenu:
+            # response with http code 404 or 400 (see `update`)
+            return await self.get_row(menu_id, submenu_id)
+        await self.session.commit()
         return JSONResponse(
             content={"status": True, "message": "The submenu has been deleted"}
         )
 
 
 class DishRepository:
-    def __init__(self, session: Session = Depends(get_session)):
+    def __init__(self, session: AsyncSession = Depends(get_session)):
         self.session = session
         self.model = Dish
         self.schema = DishReadSchema
-        self.query = (session.query(Dish.id,
-                                    Dish.title,
-                                    Dish.description,
-                                    Dish.price))
-
-    def get_all(self, menu_id: UUID,
-                submenu_id: UUID) -> list[DishReadSchema] | JSONResponse:
-        submenu = (SubmenuRepository(self.session)
-                   .get_model_obj(menu_id, submenu_id))
-        if isinstance(submenu, JSONResponse):
-            # return submenu  # response with http code 404 or 400
-            return list()  # this is illogical, but necessary for postman tests
-        dishes = self.query.filter(Dish.submenu_id == submenu_id).all()
-        return [self.schema.model_validate(dish._asdict())
-                for dish in dishes]
-
-    def create(self, menu_id,
-               submenu_id: UUID,
-               input_data: dict) -> DishReadSchema | JSONResponse:
-        submenu = (SubmenuRepository(self.session)
-                   .get_model_obj(menu_id, submenu_id))
+        self.query = select(Dish.id,
+                            Dish.title,
+                            Dish.description,
+                            Dish.price)
+
+    async def get_all(self, menu_id: UUID,
+                      submenu_id: UUID,
+                      limit: int = PAGE_LIMIT_DEFAULT,
+                      after: str | None = None,
+                      min_price: Decimal | None = None,
+                      max_price: Decimal | None = None,
+                      order_by: str | None = None) -> Page | JSONResponse:
+        """Select submenu's dishes page and check submenu by one query.
+        Dishes are filtered by price range and sorted by id, or by price
+        (and id) if `order_by` is `price`. `MissingPage` is returned if
+        the submenu is not found in the menu."""
+        sort_column = self.model.price if order_by == "price" else None
+        after_key = get_after_key(after,
+                                  None if sort_column is None else Decimal)
+        if isinstance(after_key, JSONResponse):
+            return after_key  # response with http code 400
+        onclause = [Dish.submenu_id == Submenu.id]
+        if min_price is not None:
+            onclause.append(Dish.price >= min_price)
+        if max_price is not None:
+            onclause.append(Dish.price <= max_price)
+        dishes = (await self.session.execute(
+            paginate_outerjoin(
+                select(Submenu.menu_id, *self.query.selected_columns)
+                .where(Submenu.id == submenu_id),
+                self.model, and_(*onclause),
+                self.model.id, limit, after_key, sort_column))).all()
+        if not dishes or dishes[0].menu_id != menu_id:
+            # return response with http code 404 or 400
+            # this is illogical, but necessary for postman tests
+            return MissingPage()
+        if dishes[0].id is None:
+            return Page()
+        return get_raw_page(dishes, self.schema, limit,
+                            None if sort_column is None else "price")
+
+    async def search(self, q: str,
+                     limit: int = PAGE_LIMIT_DEFAULT,
+                     after: str | None = None) -> Page | JSONResponse:
+        """Select page of dishes of all menus having words of `q` in title
+        or description (`websearch_to_tsquery` syntax), most relevant first
+        of `SEARCH_RANK_LIMIT` found ones (see `get_search_query`).
+        If no dish has them, every word of `q` is replaced by any of
+        similar `search_words`, so misspelled words are found as well."""
+        after_key = get_after_key(after, float)
+        if isinstance(after_key, JSONResponse):
+            return after_key  # response with http code 400
+        dishes = (await self.session.execute(self.get_search_query(
+            func.websearch_to_tsquery(SEARCH_CONFIG, q),
+            limit, after_key))).all()
+        if not dishes:
+            dishes = (await self.session.execute(self.get_search_query(
+                self.get_similar_tsquery(q), limit, after_key))).all()
+        return get_page(dishes, DishSearchSchema, limit, "rank")
+
+    def get_search_query(self, tsquery, limit: int,
+                         after_key: tuple | None = None):
+        """Return query of dishes page matching `tsquery` sorted by rank
+        and id. Only `SEARCH_RANK_LIMIT` matches with the least ids are
+        ranked, so the query does not rank and sort every dish having
+        a common word, and every page is read from the same matches.
+        Rank is double precision, so the cursor's rank is compared
+        exactly."""
+        matches = (select(*self.query.selected_columns,
+                          self.model.submenu_id, self.model.search_vector)
+                   .where(self.model.search_vector.bool_op("@@")(tsquery))
+                   .order_by(self.model.id)
+                   .limit(SEARCH_RANK_LIMIT)
+                   .subquery())
+        rank = cast(func.ts_rank(matches.c.search_vector, tsquery), Double)
+        query = (select(matches.c.id,
+                        matches.c.title,
+                        matches.c.description,
+                        matches.c.price,
+                        Submenu.menu_id,
+                        matches.c.submenu_id,
+                        rank.label("rank"))
+                 .join(Submenu, Submenu.id == matches.c.submenu_id))
+        if after_key is not None:
+            query = query.where(tuple_(rank, matches.c.id)
+                                < tuple_(*after_key))
+        return (query.order_by(rank.desc(), matches.c.id.desc())
+                .limit(limit + 1))
+
+    @staticmethod
+    def get_similar_tsquery(q: str):
+        """Return tsquery of `q`'s words replaced by similar words:
+        `(a1 | a2) & (b1 | b2)`, words without similar ones are skipped."""
+        q_vector = func.to_tsvector(SEARCH_CONFIG, q)
+        q_words = (func.unnest(func.tsvector_to_array(q_vector))
+                   .table_valued("word").render_derived())
+        similar_words = (
+            select(func.string_agg(func.quote_literal(SearchWord.word),
+                                   literal_column("' | '"))
+                   .label("words"))
+            .select_from(q_words)
+            .join(SearchWord, SearchWord.word.bool_op("%")(q_words.c.word))
+            .group_by(q_words.c.word)
+            .subquery())
+        return select(func.to_tsquery(
+            SEARCH_CONFIG,
+            func.string_agg("(" + similar_words.c.words + ")",
+                            literal_column("' & '")))).scalar_subquery()
+
+    @staticmethod
+    def get_values(input_data: dict) -> dict:
+        """Return dish's column values with price as `Decimal` of its
+        NUMERIC(10, 2) column, not as the input string, so created and
+        updated dishes are written and returned alike (`"7.50"` for input
+        `"007.50"`)."""
+        return input_data | {"price": Decimal(input_data["price"])}
+
+    async def create(self, menu_id,
+                     submenu_id: UUID,
+                     input_data: dict) -> DishReadSchema | JSONResponse:
+        submenu = await (SubmenuRepository(self.session)
+                         .get_model_obj(menu_id, submenu_id))
         if isinstance(submenu, JSONResponse):
             return submenu  # response with http code 404 or 400
-        new_dish = self.model(**input_data)
-        submenu.dishes.append(new_dish)
-        self.session.commit()
+        new_dish = self.model(**self.get_values(input_data),
+                              submenu_id=submenu.id)
+        self.session.add(new_dish)
+        await self.session.commit()
         return self.schema.model_validate(new_dish.as_dict())
 
-    def get_model_obj(self, menu_id: UUID,
-                      submenu_id: UUID, dish_id: UUID) -> Dish | JSONResponse:
-        dish = (self.session.query(self.model)
-                .filter(self.model.id == dish_id).first())
-        if not dish:
+    async def create_many(self, menu_id: UUID,
+                          submenu_id: UUID,
+                          input_data: list[dict]
+                          ) -> list[DishReadSchema] | JSONResponse:
+        """Insert all dishes by multi-row inserts in one transaction."""
+        submenu = await (SubmenuRepository(self.session)
+                         .get_model_obj(menu_id, submenu_id))
+        if isinstance(submenu, JSONResponse):
+            return submenu  # response with http code 404 or 400
+        new_dishes = [self.get_values(item) | {"id": uuid.uuid4(),
+                                               "submenu_id": submenu.id}
+                      for item in input_data]
+        for start in range(0, len(new_dishes), BULK_INSERT_BATCH_SIZE):
+            await self.session.execute(
+                insert(self.model).values(
+                    new_dishes[start:start + BULK_INSERT_BATCH_SIZE]))
+        await self.session.commit()
+        return [self.schema.model_validate(new_dish)
+                for new_dish in new_dishes]
+
+    async def get_row(self, menu_id: UUID,
+                      submenu_id: UUID,
+                      dish_id: UUID) -> Row | JSONResponse:
+        """Select dish's response row with its submenu and menu ids
+        by one query."""
+        dish = (await self.session.execute(
+            self.query.add_columns(self.model.submenu_id, Submenu.menu_id)
+            .outerjoin(Submenu, Submenu.id == Dish.submenu_id)
+            .where(self.model.id == dish_id))).first()
+        return self.check_parents(dish, menu_id, submenu_id) or dish
+
+    def check_parents(self, row: Row | None, menu_id: UUID,
+                      submenu_id: UUID) -> JSONResponse | None:
+        if not row:
             return (JSONResponse(
                 status_code=status.HTTP_404_NOT_FOUND,
                 content={"detail": f"{self.model.__name__.lower()} "
                                    "not found"}))
-        if ((dish.submenu_id != submenu_id)
-                or (dish.submenu.menu_id != menu_id)):
+        if ((row.submenu_id != submenu_id)
+                or (row.menu_id != menu_id)):
             return JSONResponse(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 content={"detail": "menu or submenu id incorrect"}
             )
-        return dish
+        return None
 
-    def get(self, menu_id: UUID,
-            submenu_id: UUID, dish_id: UUID) -> DishReadSchema | JSONResponse:
-        dish = self.get_model_obj(menu_id, submenu_id, dish_id)
+    async def get(self, menu_id: UUID,
+                  submenu_id: UUID,
+                  dish_id: UUID) -> DishReadSchema | JSONResponse:
+        dish = await self.get_row(menu_id, submenu_id, dish_id)
         if isinstance(dish, JSONResponse):
             return dish  # response with http code 404 or 400
-        response_query = self.query.filter(self.model.id == dish_id).first()
-        return self.schema.model_validate(response_query._asdict())
-
-    def update(self, menu_id: UUID,
-               submenu_id: UUID,
-               dish_id: UUID,
-               input_data: dict) -> DishReadSchema | JSONResponse:
-        dish = self.get_model_obj(menu_id, submenu_id, dish_id)
-        if isinstance(dish, JSONResponse):
-            return dish  # response with http code 404 or 400
-        dish.update(**input_data)
-        self.session.add(dish)
-        self.session.commit()
-        response_query = self.query.filter(self.model.id == dish_id).first()
-        return self.schema.model_validate(response_query._asdict())
-
-    def delete(self, menu_id: UUID,
-               submenu_id: UUID, dish_id: UUID) -> JSONResponse:
-        dish = self.get_model_obj(menu_id, submenu_id, dish_id)
-        if isinstance(dish, JSONResponse):
-            return dish  # response with http code 404 or 400
-        self.session.delete(dish)
-        self.session.commit()
+        return self.schema.model_validate(dish._asdict())
+
+    async def update(self, menu_id: UUID,
+                     submenu_id: UUID,
+                     dish_id: UUID,
+                     input_data: dict) -> DishReadSchema | JSONResponse:
+        dish = (await self.session.execute(
+            update(self.model)
+            .where(self.model.id == dish_id,
+                   self.model.submenu_id == submenu_id,
+                   Submenu.id == self.model.submenu_id,
+                   Submenu.menu_id == menu_id)
+            .values(**self.get_values(input_data))
+            .returning(*self.query.selected_columns))).first()
+        if not dish:
+            # ids are not changed by requests, so the row is not found
+            # by get_row as well: response with http code 404 or 400
+            return await self.get_row(menu_id, submenu_id, dish_id)
+        await self.session.commit()
+        return self.schema.model_validate(dish._asdict())
+
+    async def delete(self, menu_id: UUID,
+                     submenu_id: UUID, dish_id: UUID) -> JSONResponse:
+        dish = (await self.session.execute(
+            delete(self.model)
+            .where(self.model.id == dish_id,
+                   self.model.submenu_id == submenu_id,
+                   Submenu.id == self.model.submenu_id,
+                   Submenu.menu_id == menu_id)
+            .returning(self.model.id))).first()
+        if not dish:
+            # response with http code 404 or 400 (see `update`)
+            return await self.get_row(menu_id, submenu_id, dish_id)
+        await self.session.commit()
         return JSONResponse(
             content={"status": True, "message": "The dish has been deleted"}
         )
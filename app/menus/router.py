@@ -1,181 +1,300 @@
+from decimal import Decimal
+from typing import Literal
 from uuid import UUID
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request
 from starlette import status
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, StreamingResponse
 
-from database import Session, get_session
+from config import PAGE_LIMIT_DEFAULT, PAGE_LIMIT_MAX
+from database import (AsyncSession, get_read_session, get_session,
+                      get_session_scope)
 from menus.repositories import (DishRepository, MenuRepository,
                                 SubmenuRepository)
-from menus.schemas import (DishReadSchema, DishWriteSchema, MenuReadSchema,
-                           MenuWriteSchema, SubmenuReadSchema,
-                           SubmenuWriteSchema)
-from menus.utils.response_cacher import cache_add, cache_delete
+from menus.schemas import (DishReadSchema, DishSearchSchema, DishWriteSchema,
+                           MenuReadSchema, MenuTreeSchema, MenuWriteSchema,
+                           SubmenuReadSchema, SubmenuWriteSchema)
+from menus.utils.bulk import get_bulk_openapi, read_bulk_body, validate_bulk
+from menus.utils.export import EXPORT_MEDIA_TYPE, export_catalog
+from menus.utils.response_cacher import (cache_add, cache_delete,
+                                         response_cacher)
 
 router = APIRouter(prefix="/api/v1")
 
 
 @router.get("/menus", status_code=status.HTTP_200_OK, tags=["Menus"])
 @cache_add
-def get_menus(session: Session = Depends(get_session)) -> list[MenuReadSchema]:
-    return MenuRepository(session).get_all()
+async def get_menus(limit: int = Query(PAGE_LIMIT_DEFAULT,
+                                       ge=1, le=PAGE_LIMIT_MAX),
+                    after: str | None = None,
+                    session: AsyncSession = Depends(get_read_session)
+                    ) -> list[MenuReadSchema]:
+    return await MenuRepository(session).get_all(limit, after)
 
 
 @router.post("/menus", status_code=status.HTTP_201_CREATED, tags=["Menus"])
 @cache_delete({"get_menus": []})
-def create_menu(menu_input: MenuWriteSchema,
-                session: Session = Depends(get_session)) -> MenuReadSchema:
-    return MenuRepository(session).create(menu_input.model_dump())
+async def create_menu(menu_input: MenuWriteSchema,
+                      session: AsyncSession = Depends(get_session)
+                      ) -> MenuReadSchema:
+    return await MenuRepository(session).create(menu_input.model_dump())
 
 
 @router.get("/menus/{menu_id}",
             status_code=status.HTTP_200_OK, tags=["Menus"])
 @cache_add
-def get_menu(menu_id: UUID,
-             session: Session = Depends(get_session)) -> MenuReadSchema:
-    return MenuRepository(session).get(menu_id)
+async def get_menu(menu_id: UUID,
+                   session: AsyncSession = Depends(get_read_session)
+                   ) -> MenuReadSchema:
+    return await MenuRepository(session).get(menu_id)
+
+
+@router.get("/menus/{menu_id}/tree",
+            status_code=status.HTTP_200_OK, tags=["Menus"])
+@cache_add
+async def get_menu_tree(menu_id: UUID,
+                        session: AsyncSession = Depends(get_read_session)
+                        ) -> MenuTreeSchema:
+    return await MenuRepository(session).get_tree(menu_id)
 
 
 @router.patch("/menus/{menu_id}",
               status_code=status.HTTP_200_OK, tags=["Menus"])
 @cache_delete({"get_menus": [],
-               "get_menu": ["menu_id"]})
-def update_menu(menu_id: UUID, menu_input: MenuWriteSchema,
-                session: Session = Depends(get_session)) -> MenuReadSchema:
-    return MenuRepository(session).update(menu_id, menu_input.model_dump())
+               "get_menu": ["menu_id"],
+               "get_menu_tree": ["menu_id"]})
+async def update_menu(menu_id: UUID, menu_input: MenuWriteSchema,
+                      session: AsyncSession = Depends(get_session)
+                      ) -> MenuReadSchema:
+    return await MenuRepository(session).update(menu_id,
+                                                menu_input.model_dump())
 
 
 @router.delete("/menus/{menu_id}",
                status_code=status.HTTP_200_OK, tags=["Menus"])
 @cache_delete({"get_menus": [],
                "get_menu": ["menu_id"],
-               "get_submenus": ["menu_id"],
+               "get_menu_tree": ["menu_id"],
+               "get_submenus+": ["menu_id"],
                "get_submenu+": ["menu_id"],
                "get_dishes+": ["menu_id"],
+               "search_dishes": [],
                "get_dish+": ["menu_id"]})
-def delete_menu(menu_id: UUID,
-                session: Session = Depends(get_session)) -> JSONResponse:
-    return MenuRepository(session).delete(menu_id)
+async def delete_menu(menu_id: UUID,
+                      session: AsyncSession = Depends(get_session)
+                      ) -> JSONResponse:
+    return await MenuRepository(session).delete(menu_id)
 
 
 @router.get("/menus/{menu_id}/submenus",
             status_code=status.HTTP_200_OK, tags=["Submenus"])
 @cache_add
-def get_submenus(menu_id: UUID,
-                 session: Session = Depends(get_session)
-                 ) -> list[SubmenuReadSchema]:
-    return SubmenuRepository(session).get_all(menu_id)
+async def get_submenus(menu_id: UUID,
+                       limit: int = Query(PAGE_LIMIT_DEFAULT,
+                                          ge=1, le=PAGE_LIMIT_MAX),
+                       after: str | None = None,
+                       session: AsyncSession = Depends(get_read_session)
+                       ) -> list[SubmenuReadSchema]:
+    return await SubmenuRepository(session).get_all(menu_id, limit, after)
 
 
 @router.post("/menus/{menu_id}/submenus",
              status_code=status.HTTP_201_CREATED, tags=["Submenus"])
 @cache_delete({"get_menus": [],
                "get_menu": ["menu_id"],
-               "get_submenus": ["menu_id"]})
-def create_submenu(menu_id: UUID,
-                   submenu_input: SubmenuWriteSchema,
-                   session: Session = Depends(get_session)
-                   ) -> SubmenuReadSchema:
-    return SubmenuRepository(session).create(menu_id,
-                                             submenu_input.model_dump())
+               "get_menu_tree": ["menu_id"],
+               "get_submenus+": ["menu_id"]})
+async def create_submenu(menu_id: UUID,
+                         submenu_input: SubmenuWriteSchema,
+                         session: AsyncSession = Depends(get_session)
+                         ) -> SubmenuReadSchema:
+    return await SubmenuRepository(session).create(menu_id,
+                                                   submenu_input.model_dump())
 
 
 @router.get("/menus/{menu_id}/submenus/{submenu_id}",
             status_code=status.HTTP_200_OK, tags=["Submenus"])
 @cache_add
-def get_submenu(menu_id: UUID,
-                submenu_id: UUID,
-                session: Session = Depends(get_session)
-                ) -> SubmenuReadSchema:
-    return SubmenuRepository(session).get(menu_id, submenu_id)
+async def get_submenu(menu_id: UUID,
+                      submenu_id: UUID,
+                      session: AsyncSession = Depends(get_read_session)
+                      ) -> SubmenuReadSchema:
+    return await SubmenuRepository(session).get(menu_id, submenu_id)
 
 
 @router.patch("/menus/{menu_id}/submenus/{submenu_id}",
               status_code=status.HTTP_200_OK, tags=["Submenus"])
-@cache_delete({"get_submenus": ["menu_id"],
+@cache_delete({"get_menu_tree": ["menu_id"],
+               "get_submenus+": ["menu_id"],
                "get_submenu": ["menu_id", "submenu_id"]})
-def update_submenu(menu_id: UUID,
-                   submenu_id: UUID,
-                   submenu_input: SubmenuWriteSchema,
-                   session: Session = Depends(get_session)
-                   ) -> SubmenuReadSchema:
-    return SubmenuRepository(session).update(menu_id,
-                                             submenu_id,
-                                             submenu_input.model_dump())
+async def update_submenu(menu_id: UUID,
+                         submenu_id: UUID,
+                         submenu_input: SubmenuWriteSchema,
+                         session: AsyncSession = Depends(get_session)
+                         ) -> SubmenuReadSchema:
+    return await SubmenuRepository(session).update(menu_id,
+                                                   submenu_id,
+                                                   submenu_input.model_dump())
 
 
 @router.delete("/menus/{menu_id}/submenus/{submenu_id}",
                status_code=status.HTTP_200_OK, tags=["Submenus"])
 @cache_delete({"get_menus": [],
                "get_menu": ["menu_id"],
-               "get_submenus": ["menu_id"],
+               "get_menu_tree": ["menu_id"],
+               "get_submenus+": ["menu_id"],
                "get_submenu": ["menu_id", "submenu_id"],
-               "get_dishes": ["menu_id", "submenu_id"],
+               "get_dishes+": ["menu_id", "submenu_id"],
+               "search_dishes": [],
                "get_dish+": ["menu_id", "submenu_id"]})
-def delete_submenu(menu_id: UUID,
-                   submenu_id: UUID,
-                   session: Session = Depends(get_session)) -> JSONResponse:
-    return SubmenuRepository(session).delete(menu_id, submenu_id)
+async def delete_submenu(menu_id: UUID,
+                         submenu_id: UUID,
+                         session: AsyncSession = Depends(get_session)
+                         ) -> JSONResponse:
+    return await SubmenuRepository(session).delete(menu_id, submenu_id)
 
 
 @router.get("/menus/{menu_id}/submenus/{submenu_id}/dishes",
             status_code=status.HTTP_200_OK, tags=["Dishes"])
 @cache_add
-def get_dishes(menu_id: UUID,
-               submenu_id: UUID,
-               session: Session = Depends(get_session)
-               ) -> list[DishReadSchema]:
-    return DishRepository(session).get_all(menu_id, submenu_id)
+async def get_dishes(menu_id: UUID,
+                     submenu_id: UUID,
+                     limit: int = Query(PAGE_LIMIT_DEFAULT,
+                                        ge=1, le=PAGE_LIMIT_MAX),
+                     after: str | None = None,
+                     min_price: Decimal | None = Query(None, ge=0),
+                     max_price: Decimal | None = Query(None, ge=0),
+                     order_by: Literal["price"] | None = None,
+                     session: AsyncSession = Depends(get_read_session)
+                     ) -> list[DishReadSchema]:
+    """Dishes sorted by id, or by price if `order_by` is `price`,
+    optionally filtered by price range."""
+    return await DishRepository(session).get_all(menu_id, submenu_id,
+                                                 limit, after,
+                                                 min_price, max_price,
+                                                 order_by)
 
 
 @router.post("/menus/{menu_id}/submenus/{submenu_id}/dishes",
              status_code=status.HTTP_201_CREATED, tags=["Dishes"])
 @cache_delete({"get_menus": [],
                "get_menu": ["menu_id"],
-               "get_submenus": ["menu_id"],
+               "get_menu_tree": ["menu_id"],
+               "get_submenus+": ["menu_id"],
+               "get_submenu": ["menu_id", "submenu_id"],
+               "get_dishes+": ["menu_id", "submenu_id"],
+               "search_dishes": []})
+async def create_dish(menu_id: UUID,
+                      submenu_id: UUID,
+                      dish_input: DishWriteSchema,
+                      session: AsyncSession = Depends(get_session)
+                      ) -> DishReadSchema:
+    return await DishRepository(session).create(menu_id, submenu_id,
+                                                dish_input.model_dump())
+
+
+async def get_dishes_input(request: Request) -> list[DishWriteSchema]:
+    return validate_bulk(DishWriteSchema, await read_bulk_body(request))
+
+
+@router.post("/menus/{menu_id}/submenus/{submenu_id}/dishes/bulk",
+             status_code=status.HTTP_201_CREATED, tags=["Dishes"],
+             openapi_extra=get_bulk_openapi(DishWriteSchema))
+@cache_delete({"get_menus": [],
+               "get_menu": ["menu_id"],
+               "get_menu_tree": ["menu_id"],
+               "get_submenus+": ["menu_id"],
                "get_submenu": ["menu_id", "submenu_id"],
-               "get_dishes": ["menu_id", "submenu_id"]})
-def create_dish(menu_id: UUID,
-                submenu_id: UUID,
-                dish_input: DishWriteSchema,
-                session: Session = Depends(get_session)) -> DishReadSchema:
-    return DishRepository(session).create(menu_id, submenu_id,
-                                          dish_input.model_dump())
+               "get_dishes+": ["menu_id", "submenu_id"],
+               "search_dishes": []})
+async def create_dishes(menu_id: UUID,
+                        submenu_id: UUID,
+                        dishes_input: list[DishWriteSchema] = Depends(
+                            get_dishes_input),
+                        session: AsyncSession = Depends(get_session)
+                        ) -> list[DishReadSchema]:
+    """Create dishes from JSON array or NDJSON
+    (`Content-Type: application/x-ndjson`) body."""
+    return await DishRepository(session).create_many(
+        menu_id, submenu_id,
+        [dish_input.model_dump() for dish_input in dishes_input])
 
 
 @router.get("/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}",
             status_code=status.HTTP_200_OK, tags=["Dishes"])
 @cache_add
-def get_dish(menu_id: UUID,
-             submenu_id: UUID,
-             dish_id: UUID,
-             session: Session = Depends(get_session)) -> DishReadSchema:
-    return DishRepository(session).get(menu_id, submenu_id, dish_id)
+async def get_dish(menu_id: UUID,
+                   submenu_id: UUID,
+                   dish_id: UUID,
+                   session: AsyncSession = Depends(get_read_session)
+                   ) -> DishReadSchema:
+    return await DishRepository(session).get(menu_id, submenu_id, dish_id)
 
 
 @router.patch("/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}",
               status_code=status.HTTP_200_OK, tags=["Dishes"])
-@cache_delete({"get_dishes": ["menu_id", "submenu_id"],
+@cache_delete({"get_menu_tree": ["menu_id"],
+               "get_dishes+": ["menu_id", "submenu_id"],
+               "search_dishes": [],
                "get_dish": ["menu_id", "submenu_id", "dish_id"]})
-def update_dish(menu_id: UUID,
-                submenu_id: UUID,
-                dish_id: UUID,
-                dish_input: DishWriteSchema,
-                session: Session = Depends(get_session)) -> DishReadSchema:
-    return DishRepository(session).update(menu_id, submenu_id,
-                                          dish_id, dish_input.model_dump())
+async def update_dish(menu_id: UUID,
+                      submenu_id: UUID,
+                      dish_id: UUID,
+                      dish_input: DishWriteSchema,
+                      session: AsyncSession = Depends(get_session)
+                      ) -> DishReadSchema:
+    return await DishRepository(session).update(menu_id, submenu_id,
+                                                dish_id,
+                                                dish_input.model_dump())
 
 
 @router.delete("/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}",
                status_code=status.HTTP_200_OK, tags=["Dishes"])
 @cache_delete({"get_menus": [],
                "get_menu": ["menu_id"],
-               "get_submenus": ["menu_id"],
+               "get_menu_tree": ["menu_id"],
+               "get_submenus+": ["menu_id"],
                "get_submenu": ["menu_id", "submenu_id"],
-               "get_dishes": ["menu_id", "submenu_id"],
+               "get_dishes+": ["menu_id", "submenu_id"],
+               "search_dishes": [],
                "get_dish": ["menu_id", "submenu_id", "dish_id"]})
-def delete_dish(menu_id: UUID,
-                submenu_id: UUID,
-                dish_id: UUID,
-                session: Session = Depends(get_session)) -> JSONResponse:
-    return DishRepository(session).delete(menu_id, submenu_id, dish_id)
+async def delete_dish(menu_id: UUID,
+                      submenu_id: UUID,
+                      dish_id: UUID,
+                      session: AsyncSession = Depends(get_session)
+                      ) -> JSONResponse:
+    return await DishRepository(session).delete(menu_id, submenu_id, dish_id)
+
+
+@router.get("/search/dishes", status_code=status.HTTP_200_OK, tags=["Search"])
+@cache_add
+async def search_dishes(q: str = Query(min_length=1, max_length=250),
+                        limit: int = Query(PAGE_LIMIT_DEFAULT,
+                                           ge=1, le=PAGE_LIMIT_MAX),
+                        after: str | None = None,
+                        session: AsyncSession = Depends(get_read_session)
+                        ) -> list[DishSearchSchema]:
+    """Dishes of all menus found by words of title or description
+    (`"exact phrase"`, `or` and `-word` are supported) or by similar title,
+    most relevant first. Only `SEARCH_RANK_LIMIT` (1000 by default) found
+    dishes with the least ids are ranked and returned, so add words to `q`
+    to narrow the search down."""
+    return await DishRepository(session).search(q, limit, after)
+
+
+@router.get("/export", status_code=status.HTTP_200_OK, tags=["Export"],
+            response_class=StreamingResponse)
+async def export(session_scope=Depends(get_session_scope)
+                 ) -> StreamingResponse:
+    """Stream whole catalog as NDJSON: menus, then submenus, then dishes."""
+    async def content():
+        async with session_scope() as session:
+            async for chunk in export_catalog(session):
+                yield chunk
+    return StreamingResponse(content(), media_type=EXPORT_MEDIA_TYPE)
+
+
+@router.get("/cache/stats", status_code=status.HTTP_200_OK, tags=["Cache"])
+async def get_cache_stats() -> dict[str, dict[str, int]]:
+    """Response cache hits and misses of this worker per tier."""
+    return response_cacher.get_stats()
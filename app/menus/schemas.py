@@ -1,7 +1,21 @@
-from pydantic import BaseModel, Field
+from decimal import Decimal
+from typing import Annotated
+
+from pydantic import BaseModel, BeforeValidator, Field
 from pydantic.types import UUID4
 
 
+def format_price(price):
+    """Price from NUMERIC(10, 2) column as `"12.50"` string."""
+    if isinstance(price, Decimal):
+        return f"{price:.2f}"
+    return price
+
+
+# prices are stored as NUMERIC(10, 2), but sent as strings with 2 decimals
+PriceRead = Annotated[str, BeforeValidator(format_price)]
+
+
 class MenuReadSchema(BaseModel):
     id: UUID4 | None
     title: str
@@ -31,10 +45,25 @@ class DishReadSchema(BaseModel):
     id: UUID4 | None
     title: str
     description: str
-    price: str
+    price: PriceRead
 
 
 class DishWriteSchema(BaseModel):
     title: str = Field(max_length=250)
     description: str = Field(max_length=250)
-    price: str = Field(max_length=250, pattern=r"^\d+\.\d{2}$")
+    # no more than NUMERIC(10, 2) digits
+    price: str = Field(max_length=250, pattern=r"^\d{1,8}\.\d{2}$")
+
+
+class DishSearchSchema(DishReadSchema):
+    menu_id: UUID4
+    submenu_id: UUID4
+    rank: float
+
+
+class SubmenuTreeSchema(SubmenuReadSchema):
+    dishes: list[DishReadSchema] = []
+
+
+class MenuTreeSchema(MenuReadSchema):
+    submenus: list[SubmenuTreeSchema] = []
@@ -0,0 +1,75 @@
+import json
+from functools import lru_cache
+
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def get_json_invalid_error(position: int,
+                           error: ValueError) -> RequestValidationError:
+    """Error of body which is not JSON (`json.JSONDecodeError`) or is not
+    UTF-8 (`UnicodeDecodeError`)."""
+    message = (error.reason if isinstance(error, UnicodeDecodeError)
+               else getattr(error, "msg", str(error)))
+    return RequestValidationError([{"type": "json_invalid",
+                                    "loc": ("body", position),
+                                    "msg": "JSON decode error",
+                                    "input": {},
+                                    "ctx": {"error": message}}])
+
+
+def get_error_position(error: ValueError) -> int:
+    if isinstance(error, UnicodeDecodeError):
+        return error.start
+    return getattr(error, "pos", 0)
+
+
+async def read_bulk_body(request: Request) -> list:
+    """Read JSON array or NDJSON (one JSON object per line) request body.
+    Position of NDJSON decode error is the line number."""
+    body = await request.body()
+    if not request.headers.get("content-type",
+                               "").startswith(NDJSON_MEDIA_TYPE):
+        try:
+            return json.loads(body)
+        except ValueError as error:
+            raise get_json_invalid_error(get_error_position(error),
+                                         error) from error
+    items = list()
+    for number, line in enumerate(body.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError as error:
+            raise get_json_invalid_error(number, error) from error
+    return items
+
+
+def get_bulk_openapi(schema) -> dict:
+    """OpenAPI request body of `read_bulk_body` with items of `schema`,
+    which must be a component (request body of another endpoint)."""
+    item = {"$ref": f"#/components/schemas/{schema.__name__}"}
+    return {"requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": {"type": "array",
+                                                    "items": item}},
+                    NDJSON_MEDIA_TYPE: {"schema": item}}}}
+
+
+@lru_cache
+def get_list_adapter(schema) -> TypeAdapter:
+    return TypeAdapter(list[schema])
+
+
+def validate_bulk(schema, items) -> list:
+    """Validate all items in one batch, errors have FastAPI's body format."""
+    try:
+        return get_list_adapter(schema).validate_python(items)
+    except ValidationError as error:
+        raise RequestValidationError(
+            [error_dict | {"loc": ("body", *error_dict["loc"])}
+             for error_dict in error.errors()]) from error
@@ -0,0 +1,60 @@
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session
+
+from menus.models import Dish, Menu, Submenu
+
+
+def get_menus_drift_query():
+    actual = (select(
+        Menu.id,
+        func.count(func.distinct(Submenu.id)).label("submenus_count"),
+        func.count(Dish.id).label("dishes_count"))
+        .outerjoin(Submenu, Submenu.menu_id == Menu.id)
+        .outerjoin(Dish, Dish.submenu_id == Submenu.id)
+        .group_by(Menu.id)
+        .subquery())
+    return (select(Menu.id,
+                   Menu.submenus_count,
+                   Menu.dishes_count,
+                   actual.c.submenus_count.label("actual_submenus_count"),
+                   actual.c.dishes_count.label("actual_dishes_count"))
+            .join(actual, actual.c.id == Menu.id)
+            .where(or_(Menu.submenus_count != actual.c.submenus_count,
+                       Menu.dishes_count != actual.c.dishes_count)))
+
+
+def get_submenus_drift_query():
+    actual = (select(Submenu.id,
+                     func.count(Dish.id).label("dishes_count"))
+              .outerjoin(Dish, Dish.submenu_id == Submenu.id)
+              .group_by(Submenu.id)
+              .subquery())
+    return (select(Submenu.id,
+                   Submenu.dishes_count,
+                   actual.c.dishes_count.label("actual_dishes_count"))
+            .join(actual, actual.c.id == Submenu.id)
+            .where(Submenu.dishes_count != actual.c.dishes_count))
+
+
+def check_counters(session: Session, fix: bool = False) -> dict[str, list]:
+    """Recompute `submenus_count` and `dishes_count` from the child tables
+    and return rows whose stored counters drifted.
+    With `fix` the stored counters are overwritten by the actual values."""
+    drift = {
+        "menus": [row._asdict() for row in
+                  session.execute(get_menus_drift_query())],
+        "submenus": [row._asdict() for row in
+                     session.execute(get_submenus_drift_query())]
+    }
+    if fix:
+        for row in drift["menus"]:
+            session.execute(
+                update(Menu).where(Menu.id == row["id"])
+                .values(submenus_count=row["actual_submenus_count"],
+                        dishes_count=row["actual_dishes_count"]))
+        for row in drift["submenus"]:
+            session.execute(
+                update(Submenu).where(Submenu.id == row["id"])
+                .values(dishes_count=row["actual_dishes_count"]))
+        session.commit()
+    return drift
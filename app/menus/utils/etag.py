@@ -0,0 +1,59 @@
+from hashlib import blake2b
+
+from starlette import status
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+ETAG_HEADER = "etag"
+
+
+def get_etag(body: bytes) -> str:
+    """Strong ETag of response body."""
+    return '"' + blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """Weak comparison of ETag with `If-None-Match` header value."""
+    tags = {tag.strip().removeprefix("W/")
+            for tag in if_none_match.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+class ETagMiddleware:
+    """Replace GET and HEAD responses having ETag matching request's
+    `If-None-Match` with `304 Not Modified` without body.
+    ETag is set by `render_response`, so cached responses are compared
+    without rendering or reading anything else."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (scope["type"] != "http"
+                or scope["method"] not in ("GET", "HEAD")):
+            await self.app(scope, receive, send)
+            return
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        if if_none_match is None:
+            await self.app(scope, receive, send)
+            return
+        not_modified = False
+
+        async def send_not_modified(message: Message):
+            nonlocal not_modified
+            if message["type"] == "http.response.start":
+                etag = Headers(raw=message["headers"]).get(ETAG_HEADER)
+                if (message["status"] == status.HTTP_200_OK
+                        and etag is not None
+                        and etag_matches(etag, if_none_match)):
+                    not_modified = True
+                    message = {"type": "http.response.start",
+                               "status": status.HTTP_304_NOT_MODIFIED,
+                               "headers": [(b"etag", etag.encode())]}
+            elif not_modified:
+                if message.get("more_body", False):
+                    return
+                message = {"type": "http.response.body", "body": b""}
+            await send(message)
+
+        await self.app(scope, receive, send_not_modified)
@@ -0,0 +1,39 @@
+from typing import AsyncIterator
+
+import orjson
+from sqlalchemy import select, text
+
+from menus.models import Dish, Menu, Submenu
+
+EXPORT_MEDIA_TYPE = "application/x-ndjson"
+# rows fetched from the server-side cursor at once
+EXPORT_BATCH_SIZE = 1000
+# first statement of the export's transaction: its selects see one snapshot
+SNAPSHOT_SQL = text(
+    "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+
+
+async def export_catalog(session) -> AsyncIterator[bytes]:
+    """Yield all menus, then submenus, then dishes as NDJSON lines.
+    Every line has `type` key with value `menu`, `submenu` or `dish`,
+    generated columns (dish's `search_vector`) are not exported.
+    Rows are streamed from server-side cursors, one batch at a time.
+    All selects run in one REPEATABLE READ transaction, so the export is
+    a consistent snapshot even if the catalog is written meanwhile (every
+    submenu's menu and every dish's submenu are exported, and only them).
+    `session` must not have started its transaction."""
+    await session.execute(SNAPSHOT_SQL)
+    for model, item_type in ((Menu, "menu"),
+                             (Submenu, "submenu"),
+                             (Dish, "dish")):
+        result = await session.stream(
+            select(*[column for column in model.__table__.columns
+                     if column.computed is None])
+            .order_by(model.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for partition in result.partitions():
+            yield b"".join(
+                orjson.dumps({"type": item_type} | row._asdict(),
+                             default=str)  # asyncpg's UUID
+                + b"\n"
+                for row in partition)
@@ -0,0 +1,56 @@
+import time
+from collections import OrderedDict
+from typing import Any
+
+
+def key_matches(key: str, tag: str) -> bool:
+    """Check if cache key `cache:<endpoint_name>:<ids>[?<params>]` is listed
+    in tag set `tag:<endpoint_name>[:<ids prefix>]` of `ResponseCacher`."""
+    prefix = "cache" + tag[len("tag"):]
+    return (key == prefix
+            or key.startswith(prefix + ":")
+            or key.startswith(prefix + "?"))
+
+
+class LocalCache:
+    """Bounded in-process LRU cache with entries expiring after `ttl`
+    seconds. Keys are `ResponseCacher` keys, so they may be deleted by
+    `ResponseCacher` tags as well."""
+
+    def __init__(self, size: int, ttl: float):
+        self.size = size
+        self.ttl = ttl
+        self.entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: str) -> Any | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float | None = None):
+        """Add entry expiring after `ttl` seconds, but not later than
+        after cache's `ttl`."""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def delete(self, keys: list[str]):
+        """Delete entries by cache keys and tags (see `ResponseCacher`)."""
+        tags = [key for key in keys if key.startswith("tag:")]
+        for key in keys:
+            self.entries.pop(key, None)
+        if tags:
+            for key in [key for key in self.entries
+                        if any(key_matches(key, tag) for tag in tags)]:
+                del self.entries[key]
+
+    def clear(self):
+        self.entries.clear()
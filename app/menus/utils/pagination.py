@@ -0,0 +1,152 @@
+import base64
+import math
+from operator import attrgetter
+from uuid import UUID
+
+from sqlalchemy import and_, tuple_
+from starlette import status
+from starlette.responses import JSONResponse
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Page(list):
+    """List of response items with the cursor of the next page.
+    `next_cursor` is None on the last page."""
+
+    def __init__(self, items=(), next_cursor: str | None = None):
+        super().__init__(items)
+        self.next_cursor = next_cursor
+
+
+class RawPage(Page):
+    """Page of items as dicts of response model fields, which are rendered
+    by `render_response` as is, without validating them by the model."""
+
+
+class MissingPage(Page):
+    """Empty page of items of a missing parent. It is rendered as an empty
+    list with status code 200 (postman tests expect it instead of 404), but
+    cached like error responses."""
+
+
+def encode_cursor(key: UUID, sort_value: str | None = None) -> str:
+    """Cursor of the row with `key`, and `sort_value` if rows are sorted
+    by another column first."""
+    data = key.bytes
+    if sort_value is not None:
+        data += sort_value.encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor_data(cursor: str) -> tuple[UUID, str | None]:
+    """Raise ValueError if cursor is not produced by `encode_cursor`."""
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return (UUID(bytes=data[:16]),
+                data[16:].decode() if len(data) > 16 else None)
+    except (ValueError, TypeError) as error:
+        raise ValueError(f"Incorrect cursor {cursor!r}") from error
+
+
+def decode_cursor(cursor: str) -> UUID:
+    """Raise ValueError if cursor is not produced by `encode_cursor`
+    without sort value."""
+    key, sort_value = decode_cursor_data(cursor)
+    if sort_value is not None:
+        raise ValueError(f"Incorrect cursor {cursor!r}")
+    return key
+
+
+def decode_sort_cursor(cursor: str, sort_type: type) -> tuple:
+    """Return `(sort value, key)` of cursor produced by `encode_cursor`
+    with finite number sort value. Raise ValueError if it is not (e.g. for
+    `NaN` or `Infinity`, which are not produced by `encode_cursor`)."""
+    key, sort_value = decode_cursor_data(cursor)
+    try:
+        value = sort_type(sort_value)
+        if math.isfinite(value):
+            return value, key
+    except (ArithmeticError, TypeError, ValueError) as error:
+        raise ValueError(f"Incorrect cursor {cursor!r}") from error
+    raise ValueError(f"Incorrect cursor {cursor!r}")
+
+
+def get_after_key(after: str | None,
+                  sort_type: type | None = None
+                  ) -> UUID | tuple | None | JSONResponse:
+    """Decode `after` cursor: key, or `(sort value, key)` converted to
+    `sort_type` if rows are sorted by another column first."""
+    if after is None:
+        return None
+    try:
+        if sort_type is None:
+            return decode_cursor(after)
+        return decode_sort_cursor(after, sort_type)
+    except ValueError:
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST,
+                            content={"detail": "cursor incorrect"})
+
+
+def get_order(key_column, sort_column=None) -> tuple:
+    if sort_column is None:
+        return (key_column,)
+    return sort_column, key_column
+
+
+def get_after_clause(key_column, after, sort_column=None):
+    """Condition of rows after `after` key (or `(sort value, key)`)."""
+    if sort_column is None:
+        return key_column > after
+    return tuple_(sort_column, key_column) > tuple_(*after)
+
+
+def paginate(query, key_column, limit: int, after: UUID | None = None):
+    """Return keyset-paginated query.
+    One extra row is selected to find out if the next page exists."""
+    if after is not None:
+        query = query.where(key_column > after)
+    return query.order_by(key_column).limit(limit + 1)
+
+
+def paginate_outerjoin(query, target, onclause, key_column, limit: int,
+                       after: UUID | tuple | None = None, sort_column=None):
+    """Return query outer joined with keyset-paginated `target` rows
+    sorted by `key_column`, or by `sort_column` and `key_column`.
+    Query's own row is selected once with NULL target columns if there are
+    no target rows, so parent's existence is checked by the same query."""
+    if after is not None:
+        onclause = and_(onclause,
+                        get_after_clause(key_column, after, sort_column))
+    return (query.outerjoin(target, onclause)
+            .order_by(*get_order(key_column, sort_column))
+            .limit(limit + 1))
+
+
+def get_page(rows, schema, limit: int,
+             sort_field: str | None = None) -> Page:
+    """Return page of rows validated by schema, `sort_field` is added to
+    the next page's cursor if rows are sorted by it first."""
+    items = [schema.model_validate(row._asdict()) for row in rows]
+    if len(items) <= limit:
+        return Page(items)
+    items = items[:limit]
+    sort_value = None if sort_field is None else str(getattr(items[-1],
+                                                             sort_field))
+    return Page(items, next_cursor=encode_cursor(items[-1].id, sort_value))
+
+
+def get_raw_page(rows, schema, limit: int,
+                 sort_field: str | None = None) -> RawPage:
+    """Return page of rows as dicts of schema fields (see `get_page`).
+    Rows are not validated, so their columns must be of the fields' types
+    (prices may be `Decimal`)."""
+    fields = list(schema.model_fields)
+    get_values = attrgetter(*fields)
+    items = [dict(zip(fields, get_values(row))) for row in rows]
+    if len(items) <= limit:
+        return RawPage(items)
+    items = items[:limit]
+    sort_value = None if sort_field is None else str(items[-1][sort_field])
+    return RawPage(items,
+                   next_cursor=encode_cursor(items[-1]["id"], sort_value))
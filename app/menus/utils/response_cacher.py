@@ -1,124 +1,625 @@
-import json
+import asyncio
 import os
+import uuid
+from collections import Counter, defaultdict
+from contextlib import asynccontextmanager
+from decimal import Decimal
 from functools import wraps
+from typing import Awaitable, Callable
+from urllib.parse import urlencode
 from uuid import UUID
 
+import orjson
 from pydantic import BaseModel
-from redis import StrictRedis
-from starlette.responses import JSONResponse
+from pydantic_core import to_json
+from redis.asyncio import StrictRedis
+from redis.exceptions import RedisError
+from starlette import status
+from starlette.responses import Response
 
-from database import redis_cache
-from menus.schemas import DishReadSchema  # noqa
-from menus.schemas import MenuReadSchema  # noqa
-from menus.schemas import SubmenuReadSchema  # noqa
+from config import DATABASE_PRIMARY_PIN
+from database import REPLICA_DATABASE_URL, read_primary, redis_cache
+from menus.schemas import format_price
+from menus.utils.etag import ETAG_HEADER, get_etag
+from menus.utils.local_cache import LocalCache
+from menus.utils.pagination import (NEXT_CURSOR_HEADER, MissingPage, Page,
+                                    RawPage)
+from metrics import CACHE_HITS, CACHE_INVALIDATIONS, CACHE_MISSES
 
 # RESPONSE_CACHER_DISABLE - environment variable, may be `0` for cache enable
 # or `1` for cache disable
 RESPONSE_CACHER_DISABLE = int(os.getenv("RESPONSE_CACHER_DISABLE", default=0))
 
+# RESPONSE_CACHER_TTL - environment variable, default seconds for which
+# response is cached (may be set for endpoint by `cache_add`)
+# RESPONSE_CACHER_ERROR_TTL - environment variable, default seconds for
+# which error response (status code other than 200, e.g. 404) is cached
+RESPONSE_CACHER_TTL = int(os.getenv("RESPONSE_CACHER_TTL", default=3600))
+RESPONSE_CACHER_ERROR_TTL = int(os.getenv("RESPONSE_CACHER_ERROR_TTL",
+                                          default=10))
+
+# RESPONSE_CACHER_LOCAL_SIZE - environment variable, maximum number of
+# responses in the in-process cache checked before Redis (`0` - disabled)
+# RESPONSE_CACHER_LOCAL_TTL - environment variable, seconds for which the
+# in-process cache may serve a response (bounds staleness if invalidation
+# message is lost)
+RESPONSE_CACHER_LOCAL_SIZE = int(os.getenv("RESPONSE_CACHER_LOCAL_SIZE",
+                                           default=0))
+RESPONSE_CACHER_LOCAL_TTL = float(os.getenv("RESPONSE_CACHER_LOCAL_TTL",
+                                            default=5))
+
+# RESPONSE_CACHER_LOCK_TIMEOUT - environment variable, seconds for which
+# one request recomputes missed response while others wait for it
+# RESPONSE_CACHER_LOCK_POLL - environment variable, seconds between checks
+# of waiting requests
+RESPONSE_CACHER_LOCK_TIMEOUT = float(os.getenv("RESPONSE_CACHER_LOCK_TIMEOUT",
+                                               default=5))
+RESPONSE_CACHER_LOCK_POLL = float(os.getenv("RESPONSE_CACHER_LOCK_POLL",
+                                            default=0.02))
+
+# RESPONSE_CACHER_STALE_TTL - environment variable, seconds for which
+# invalidated response is kept and served to requests waiting for its
+# recompute (`0` - disabled, waiting requests get only fresh response)
+RESPONSE_CACHER_STALE_TTL = float(os.getenv("RESPONSE_CACHER_STALE_TTL",
+                                            default=0))
+
+# Redis pub/sub channel with JSON lists of invalidated keys and tags
+INVALIDATION_CHANNEL = "cache:invalidation"
+# Redis counter of invalidations, see `ResponseCacher.add_many`
+INVALIDATIONS_KEY = "invalidations"
+# Redis key set for `primary_pin` seconds by invalidations (i.e. writes),
+# see `ResponseCacher.get_or_add`
+PRIMARY_PIN_KEY = "primary_pin"
+# prefixes of keys (followed by cache key or tag name) counted by
+# `ResponseCacher.get_memory_report`
+MEMORY_REPORT_KINDS = ("cache", "tag", "stale", "lock")
+
+JSON_MEDIA_TYPE = "application/json"
+# headers which are recalculated by `Response` and not stored in cache
+RENDERED_HEADERS = ("content-length", "content-type")
+
+
+def serialize_raw(value) -> str:
+    """Serialize values of `RawPage` items unsupported by orjson:
+    prices and UUID subclasses (asyncpg returns its own UUID type)."""
+    if isinstance(value, Decimal):
+        return format_price(value)
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError
+
+
+class MissingResponse(Response):
+    """Successful response of missing data (see `MissingPage`), cached for
+    the error TTL and tagged like error responses."""
+
+
+def render_response(response) -> Response:
+    """Serialize endpoint's response data to the final JSON response.
+    Models and lists of models are serialized with status code 200, exactly
+    as FastAPI does for `response_model`, but without validating them again.
+    `RawPage` dicts are serialized by orjson to the same JSON, without
+    building models at all. `MissingPage` is rendered to `MissingResponse`.
+    Already rendered responses (e.g. `JSONResponse`) are used as is.
+    Responses with status code 200 get ETag of their body, so it is cached
+    with them."""
+    if not isinstance(response, (Response, list, BaseModel)):
+        raise ValueError(f"Response class <{type(response).__name__}> "
+                         "is not supported!")
+    if not isinstance(response, Response):
+        headers = dict()
+        if isinstance(response, Page) and response.next_cursor:
+            headers[NEXT_CURSOR_HEADER] = response.next_cursor
+        if isinstance(response, RawPage):
+            content = orjson.dumps(response, default=serialize_raw)
+        else:
+            content = to_json(response)
+        response_class = (MissingResponse if isinstance(response, MissingPage)
+                          else Response)
+        response = response_class(content=content,
+                                  status_code=status.HTTP_200_OK,
+                                  headers=headers,
+                                  media_type=JSON_MEDIA_TYPE)
+    if response.status_code == status.HTTP_200_OK:
+        response.headers[ETAG_HEADER] = get_etag(response.body)
+    return response
+
+
+# Lua function of add scripts: adds KEYS[1] cache key to KEYS[first:] tag
+# sets. Tag sets do not expire, so `volatile-lru` eviction (see redis.conf)
+# drops only cache keys, never the sets invalidating them. Instead members
+# which expired or were evicted are removed by adds: every add checks
+# `TAG_PRUNE_SAMPLE` random members of every tag set of the key. Error
+# responses are added only to the endpoint-wide tag set (see
+# `ResponseCacher.get_add_args`), so responses for random ids (e.g. of
+# a scanner) do not leave per-id tag sets which are never pruned.
+TAG_PRUNE_SAMPLE = 2
+ADD_TO_TAGS = f"""
+local function add_to_tags(first)
+    for i = first, #KEYS do
+        redis.call("SADD", KEYS[i], KEYS[1])
+        redis.call("PERSIST", KEYS[i])
+        local sample = redis.call("SRANDMEMBER", KEYS[i], {TAG_PRUNE_SAMPLE})
+        for _, member in ipairs(sample) do
+            if redis.call("EXISTS", member) == 0 then
+                redis.call("SREM", KEYS[i], member)
+            end
+        end
+    end
+end
+"""
+
+# Unlinks KEYS[2] lock if it is still taken with ARGV[4] token (a request
+# rendering longer than the lock timeout does not release the lock taken
+# by another one), sets KEYS[1] cache key to ARGV[1] expiring after ARGV[2]
+# seconds and adds the key to KEYS[4:] tag sets. If ARGV[3] is not empty,
+# the key is set only if KEYS[3] invalidations counter is still ARGV[3].
+# Returns 1 if the key is set.
+ADD_SCRIPT = ADD_TO_TAGS + """
+if ARGV[4] ~= "" and redis.call("GET", KEYS[2]) == ARGV[4] then
+    redis.call("UNLINK", KEYS[2])
+end
+if ARGV[3] ~= "" and (redis.call("GET", KEYS[3]) or "0") ~= ARGV[3] then
+    return 0
+end
+redis.call("SET", KEYS[1], ARGV[1], "EX", tonumber(ARGV[2]))
+add_to_tags(4)
+return 1
+"""
+
+# Sets KEYS[1] cache key to ARGV[1] expiring after ARGV[2] seconds and adds
+# the key to KEYS[3:] tag sets like `ADD_SCRIPT`, but only if KEYS[2]
+# invalidations counter is still ARGV[3] and the key is not set. Lock of
+# the key is kept. Returns 1 if the key is set.
+ADD_MISSING_SCRIPT = ADD_TO_TAGS + """
+if (redis.call("GET", KEYS[2]) or "0") ~= ARGV[3] then
+    return 0
+end
+if not redis.call("SET", KEYS[1], ARGV[1], "NX", "EX", tonumber(ARGV[2])) then
+    return 0
+end
+add_to_tags(3)
+return 1
+"""
+
+# Returns `["hit", value]` of KEYS[1] cache key or takes KEYS[2] lock with
+# ARGV[2] token for ARGV[1] milliseconds and returns
+# `["locked", pinned, generation]`, so the lock is never taken after
+# the response is added (pinned is 1 if KEYS[4] primary pin key exists,
+# 0 otherwise, generation is KEYS[5] invalidations counter). Otherwise
+# returns `["stale", value]` of KEYS[3] stale key or `["wait"]`.
+GET_OR_LOCK_SCRIPT = """
+local value = redis.call("GET", KEYS[1])
+if value then
+    return {"hit", value}
+end
+if redis.call("SET", KEYS[2], ARGV[2], "NX", "PX", ARGV[1]) then
+    return {"locked", redis.call("EXISTS", KEYS[4]),
+            redis.call("GET", KEYS[5]) or "0"}
+end
+value = redis.call("GET", KEYS[3])
+if value then
+    return {"stale", value}
+end
+return {"wait"}
+"""
+
+# Unlinks KEYS[1] lock if it is still taken with ARGV[1] token.
+UNLOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    redis.call("UNLINK", KEYS[1])
+end
+return 0
+"""
+
+# Unlinks KEYS[3:] cache keys and every cache key listed in KEYS[3:] tag
+# sets, then the tag sets, so a whole subtree is invalidated by one command
+# without transferring its keys to the application. Unlinked keys are
+# removed from all their tag sets, which are derived from the key name.
+# KEYS[3:] are published to ARGV[1] channel for in-process caches of
+# workers and KEYS[1] invalidations counter is incremented. If ARGV[3]
+# (milliseconds) is not 0, KEYS[2] primary pin key is set expiring after it.
+# If ARGV[2] (milliseconds) is not 0, keys are renamed to `stale:<key>`
+# expiring after ARGV[2] instead of unlinking.
+# The script also writes keys not passed in KEYS (members of tag sets,
+# their other tag sets and `stale:` keys), so it is not Redis Cluster safe:
+# all keys must be in one Redis instance.
+INVALIDATE_SCRIPT = """
+local stale_ttl = tonumber(ARGV[2])
+
+local function unlink(key)
+    local tag = "tag"
+    local path = string.gsub(string.sub(key, 7), "%?.*$", "")
+    for part in string.gmatch(path, "[^:]+") do
+        tag = tag .. ":" .. part
+        redis.call("SREM", tag, key)
+    end
+    if stale_ttl > 0 and redis.call("EXISTS", key) == 1 then
+        redis.call("RENAME", key, "stale:" .. key)
+        redis.call("PEXPIRE", "stale:" .. key, stale_ttl)
+    else
+        redis.call("UNLINK", key)
+    end
+end
+
+local keys = {}
+for i = 3, #KEYS do
+    local key = KEYS[i]
+    keys[#keys + 1] = key
+    if string.sub(key, 1, 4) == "tag:" then
+        for _, member in ipairs(redis.call("SMEMBERS", key)) do
+            unlink(member)
+        end
+        redis.call("UNLINK", key)
+    else
+        unlink(key)
+    end
+end
+redis.call("INCR", KEYS[1])
+if tonumber(ARGV[3]) > 0 then
+    redis.call("SET", KEYS[2], "1", "PX", ARGV[3])
+end
+redis.call("PUBLISH", ARGV[1], cjson.encode(keys))
+return 0
+"""
+
 
 class ResponseCacher:
-    def __init__(self, cache: StrictRedis):
+    """Stores rendered responses in Redis, one key per response:
+    `cache:<endpoint_name>:<ids>[?<page parameters>]`.
+    Value is `[status_code, headers]` JSON line followed by the response
+    body bytes, so a cache hit is served without building models.
+    Every key is added to the tag sets `tag:<endpoint_name>[:<ids prefix>]`
+    of all prefixes of its ids, e.g. `get_dish` response is tagged with
+    `tag:get_dish`, `tag:get_dish:<menu_id>` and
+    `tag:get_dish:<menu_id>:<submenu_id>`; paginated responses are also
+    tagged with all their ids, e.g. `tag:get_submenus:<menu_id>`.
+    Keys expire after `ttl` seconds (`error_ttl` for responses with status
+    code other than 200, which are tagged only with `tag:<endpoint_name>`);
+    tag sets do not expire, their members which expired are removed by
+    later adds (see `ADD_TO_TAGS`).
+    If `local` cache is given, it is checked before Redis and invalidated
+    by messages from `INVALIDATION_CHANNEL` (see `listen`).
+    Hits and misses are counted per tier (`local` and `redis`).
+    Missed response is recomputed by one request at a time (see
+    `get_or_add`); if `stale_ttl` is given, invalidated responses are kept
+    as `stale:<key>` for that many seconds and served meanwhile.
+    If `primary_pin` is given, responses missed for that many seconds after
+    any invalidation are recomputed from the primary database."""
+
+    def __init__(self, cache: StrictRedis, local: LocalCache | None = None,
+                 stale_ttl: float = 0, ttl: int = RESPONSE_CACHER_TTL,
+                 error_ttl: int = RESPONSE_CACHER_ERROR_TTL,
+                 primary_pin: float = 0):
         self.cache = cache
+        self.local = local
+        self.stale_ttl = stale_ttl
+        self.primary_pin = primary_pin
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.add_script = cache.register_script(ADD_SCRIPT)
+        self.add_missing = cache.register_script(ADD_MISSING_SCRIPT)
+        self.get_or_lock = cache.register_script(GET_OR_LOCK_SCRIPT)
+        self.unlock = cache.register_script(UNLOCK_SCRIPT)
+        self.invalidate = cache.register_script(INVALIDATE_SCRIPT)
+        self.hits = Counter()
+        self.misses = Counter()
 
     @staticmethod
-    def get_key_str(**kwargs):
-        key_dict = dict()
+    def get_ids_and_params(**kwargs) -> tuple[list[str], dict]:
+        """Split endpoint's arguments to ids (in arguments order)
+        and page and filter parameters."""
+        ids = list()
+        params = dict()
         for key, value in kwargs.items():
             if isinstance(value, UUID):
-                key_dict[key] = str(value)
-        return json.dumps(key_dict)
-
-    def add(self, endpoint_name: str, response, **kwargs):
-        name = endpoint_name
-        key = self.get_key_str(**kwargs)
-        is_list = 0
-        data = None
-        item_class = type(response)
-        if isinstance(response, list):
-            is_list = 1
-            if len(response):
-                item_class = type(response[0])
-            else:
-                item_class = type(None)
-            data = [item.model_dump_json() for item in response]
-        elif issubclass(item_class, BaseModel):
-            data = response.model_dump_json()
-        elif issubclass(item_class, JSONResponse):
-            data = {
-                "status_code": response.status_code,
-                "content": json.loads(response.body)
-            }
+                ids.append(str(value))
+            elif isinstance(value, (int, str, Decimal)):
+                params[key] = value
+        return ids, params
+
+    def get_key_str(self, endpoint_name: str, **kwargs) -> str:
+        ids, params = self.get_ids_and_params(**kwargs)
+        key = ":".join(["cache", endpoint_name, *ids])
+        if params:
+            key += "?" + urlencode(params)
+        return key
+
+    @staticmethod
+    def get_tag_str(endpoint_name: str, ids: list[str]) -> str:
+        return ":".join(["tag", endpoint_name, *ids])
+
+    async def add(self, endpoint_name: str, response: Response,
+                  ttl: int | None = None, error_ttl: int | None = None,
+                  generation: int | None = None, token: str | None = None,
+                  /, **kwargs) -> bool:
+        """Add response expiring after `ttl` seconds or after `error_ttl`
+        if it is not successful (cacher's defaults if not given) and
+        release its lock if it is still taken with `token`. If `generation`
+        is given, the response is rendered from data read after
+        `get_generation` returned it, and it is not added if anything was
+        invalidated since then.
+        Return True if the response is added."""
+        key, tags, entry, ttl = self.get_add_args(endpoint_name, response,
+                                                  ttl, error_ttl, **kwargs)
+        added = await self.add_script(
+            keys=[key, self.get_lock_str(key), INVALIDATIONS_KEY, *tags],
+            args=[self.get_value(entry), ttl,
+                  "" if generation is None else generation, token or ""])
+        if added and self.local is not None:
+            self.local.set(key, entry, ttl)
+        return bool(added)
+
+    async def get_generation(self) -> int:
+        """Return number of invalidations, see `add` and `add_many`."""
+        return int(await self.cache.get(INVALIDATIONS_KEY) or 0)
+
+    async def add_many(self, responses: list[tuple[str, Response, dict]],
+                       generation: int) -> int:
+        """Add responses (endpoint_name, response and endpoint's kwargs)
+        expiring after cacher's default TTLs by one pipeline. Responses must
+        be rendered from data read after `generation` was returned by
+        `get_generation`. Return number of added responses.
+        Nothing is added if anything was invalidated since then (responses
+        may be rendered before the invalidation), cached responses are not
+        replaced and locks of requests rendering them are kept, so they are
+        only added to Redis (not to local cache)."""
+        async with self.cache.pipeline(transaction=False) as pipe:
+            for endpoint_name, response, kwargs in responses:
+                key, tags, entry, ttl = self.get_add_args(
+                    endpoint_name, response, None, None, **kwargs)
+                await self.add_missing(
+                    keys=[key, INVALIDATIONS_KEY, *tags],
+                    args=[self.get_value(entry), ttl, generation],
+                    client=pipe)
+            return sum(await pipe.execute())
+
+    def get_add_args(self, endpoint_name: str, response: Response,
+                     ttl: int | None, error_ttl: int | None,
+                     **kwargs) -> tuple[str, list[str], tuple, int]:
+        """Return key, tag sets, entry (see `get_entry`) and TTL of
+        the response. Error responses (and `MissingResponse`) are tagged only
+        with the endpoint-wide tag: they expire soon and are invalidated by
+        it or by their key."""
+        key = self.get_key_str(endpoint_name, **kwargs)
+        ids, params = self.get_ids_and_params(**kwargs)
+        tags = [self.get_tag_str(endpoint_name, ids[:length])
+                for length in range(len(ids) + bool(params))]
+        if (response.status_code == status.HTTP_200_OK
+                and not isinstance(response, MissingResponse)):
+            ttl = self.ttl if ttl is None else ttl
         else:
-            raise ValueError(f"Response class <{item_class.__name__}> "
-                             "is not supported!")
-        data_dict = {
-            "is_list": is_list,
-            "item_class_name": item_class.__name__,
-            "data": data
-        }
-        self.cache.hset(name=name, key=key, value=json.dumps(data_dict))
-
-    def get(self, endpoint_name: str, **kwargs):
-        name = endpoint_name
-        key = self.get_key_str(**kwargs)
-        data_dict = json.loads(self.cache.hget(name=name, key=key))
-        is_list = data_dict["is_list"]
-        item_class_name = data_dict["item_class_name"]
-        data = data_dict["data"]
-        if item_class_name == "NoneType":
-            return data
-        item_class = eval(item_class_name)
-        if is_list:
-            return (
-                [item_class.model_validate_json(item) for item in data]
-            )
-        if issubclass(item_class, BaseModel):
-            return item_class.model_validate_json(data)
-        if issubclass(item_class, JSONResponse):
-            return JSONResponse(**data)
-        raise ValueError(f"Response class <{item_class.__name__}> "
-                         "is not supported!")
+            ttl = self.error_ttl if error_ttl is None else error_ttl
+            tags = tags[:1]
+        headers = {header: value for header, value in response.headers.items()
+                   if header not in RENDERED_HEADERS}
+        return key, tags, (response.status_code, headers, response.body), ttl
+
+    async def get(self, endpoint_name: str, **kwargs) -> Response | None:
+        """Return cached response or None if it is not in cache."""
+        key = self.get_key_str(endpoint_name, **kwargs)
+        entry = None
+        if self.local is not None:
+            entry = self.local.get(key)
+            self.count(endpoint_name, "local", entry is not None)
+        if entry is None:
+            value = await self.cache.get(key)
+            self.count(endpoint_name, "redis", value is not None)
+            if value is None:
+                return None
+            entry = self.get_entry(value)
+            if self.local is not None:
+                self.local.set(key, entry)
+        return self.get_response(entry)
+
+    @staticmethod
+    def get_entry(value: bytes) -> tuple[int, dict, bytes]:
+        meta, _, body = value.partition(b"\n")
+        return (*orjson.loads(meta), body)
+
+    @staticmethod
+    def get_value(entry: tuple[int, dict, bytes]) -> bytes:
+        status_code, headers, body = entry
+        return orjson.dumps([status_code, headers]) + b"\n" + body
+
+    @staticmethod
+    def get_response(entry: tuple[int, dict, bytes]) -> Response:
+        status_code, headers, body = entry
+        return Response(content=body,
+                        status_code=status_code,
+                        headers=headers,
+                        media_type=JSON_MEDIA_TYPE)
+
+    @staticmethod
+    def get_lock_str(key: str) -> str:
+        return "lock:" + key
+
+    async def get_or_add(self, endpoint_name: str,
+                         render: Callable[[], Awaitable[Response]],
+                         ttl: int | None = None,
+                         error_ttl: int | None = None, /,
+                         **kwargs) -> Response:
+        """Return cached response or add response returned by `render`.
+        Only the request holding `lock:<key>` renders the response (the lock
+        is taken with a token of the request, expires after
+        `RESPONSE_CACHER_LOCK_TIMEOUT` seconds and is released by `add` only
+        if it is still taken with the token), other requests poll the cache
+        until it is added, taking the lock if it is released without
+        response. Meanwhile they are served the stale response if it is
+        kept.
+        While `PRIMARY_PIN_KEY` is set by a recent invalidation, the response
+        is rendered with `read_primary` set, so replica sessions read from
+        the primary database and the lagging replica is not cached until
+        the next invalidation.
+        The lock is taken with the number of invalidations, and the rendered
+        response is not added if anything was invalidated while rendering
+        (it may be rendered from data changed since then)."""
+        cached = await self.get(endpoint_name, **kwargs)
+        if cached is not None:
+            return cached
+        key = self.get_key_str(endpoint_name, **kwargs)
+        lock = self.get_lock_str(key)
+        token = uuid.uuid4().hex
+        while True:
+            state, *value = await self.get_or_lock(
+                keys=[key, lock, "stale:" + key, PRIMARY_PIN_KEY,
+                      INVALIDATIONS_KEY],
+                args=[int(RESPONSE_CACHER_LOCK_TIMEOUT * 1000), token])
+            if state == b"locked":
+                break
+            if state in (b"hit", b"stale"):
+                return self.get_response(self.get_entry(value[0]))
+            await asyncio.sleep(RESPONSE_CACHER_LOCK_POLL)
+        pinned, generation = value
+        primary = read_primary.set(bool(pinned))
+        try:
+            response = await render()
+        except BaseException:
+            await self.unlock(keys=[lock], args=[token])
+            raise
+        finally:
+            read_primary.reset(primary)
+        await self.add(endpoint_name, response, ttl, error_ttl,
+                       int(generation), token, **kwargs)
+        return response
 
-    def exists(self, endpoint_name: str, **kwargs):
-        name = endpoint_name
-        key = self.get_key_str(**kwargs)
-        return self.cache.hexists(name=name, key=key)
+    def get_delete_key_str(self, endpoint_name: str, **kwargs) -> str:
+        """Return key of one response, or tag of all responses of the
+        endpoint with ids starting with given ids if endpoint_name ends
+        with "+" (or if no ids are given)."""
+        ids, _ = self.get_ids_and_params(**kwargs)
+        if ids and not endpoint_name.endswith("+"):
+            return self.get_key_str(endpoint_name, **kwargs)
+        return self.get_tag_str(endpoint_name.rstrip("+"), ids)
 
-    def delete(self, endpoint_name: str, **kwargs):
-        name = endpoint_name
-        if not kwargs:
-            self.cache.delete(name)
+    async def delete(self, endpoint_name: str, **kwargs):
+        await self.delete_many({endpoint_name: kwargs})
+
+    async def delete_many(self, endpoints: dict[str, dict]):
+        """Delete responses of all endpoints (endpoint_name as key and its
+        ids as value, see `get_delete_key_str`) by one script call.
+        Local cache is invalidated at once, other workers' ones - by
+        the message published by the script. Must be called after the write
+        is committed, otherwise the response may be recomputed from the old
+        data meanwhile."""
+        keys = [self.get_delete_key_str(endpoint_name, **kwargs)
+                for endpoint_name, kwargs in endpoints.items()]
+        if self.local is not None:
+            self.local.delete(keys)
+        for endpoint_name in endpoints:
+            CACHE_INVALIDATIONS.labels(endpoint_name.rstrip("+")).inc()
+        await self.invalidate(
+            keys=[INVALIDATIONS_KEY, PRIMARY_PIN_KEY, *keys],
+            args=[INVALIDATION_CHANNEL, int(self.stale_ttl * 1000),
+                  int(self.primary_pin * 1000)])
+
+    @staticmethod
+    def get_endpoint_name(key: str, kind: str) -> str:
+        """Return endpoint name of key (see `MEMORY_REPORT_KINDS`)."""
+        name = key.removeprefix(kind + ":")
+        if kind in ("stale", "lock"):
+            name = name.removeprefix("cache:")
+        return name.split(":")[0].split("?")[0]
+
+    async def get_memory_report(self, batch_size: int = 1000
+                                ) -> dict[str, dict[str, list[int]]]:
+        """Return `[number of keys, memory usage in bytes]` per endpoint
+        name and kind of key (`cache`, `tag`, `stale` or `lock`).
+        Keys are scanned, so it is not intended for request handlers."""
+        report = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+        for kind in MEMORY_REPORT_KINDS:
+            keys = list()
+            async for key in self.cache.scan_iter(match=f"{kind}:*",
+                                                  count=batch_size):
+                keys.append(key.decode())
+            for start in range(0, len(keys), batch_size):
+                batch = keys[start:start + batch_size]
+                async with self.cache.pipeline(transaction=False) as pipe:
+                    for key in batch:
+                        pipe.memory_usage(key, samples=0)
+                    usages = await pipe.execute()
+                for key, usage in zip(batch, usages):
+                    if usage is None:  # expired while scanning
+                        continue
+                    endpoint_name = self.get_endpoint_name(key, kind)
+                    report[endpoint_name][kind][0] += 1
+                    report[endpoint_name][kind][1] += usage
+        return {endpoint_name: dict(kinds)
+                for endpoint_name, kinds in sorted(report.items())}
+
+    def count(self, endpoint_name: str, tier: str, hit: bool):
+        if hit:
+            self.hits[tier] += 1
+            CACHE_HITS.labels(endpoint_name, tier).inc()
+        else:
+            self.misses[tier] += 1
+            CACHE_MISSES.labels(endpoint_name, tier).inc()
+
+    def get_stats(self) -> dict[str, dict[str, int]]:
+        return {tier: {"hits": self.hits[tier], "misses": self.misses[tier]}
+                for tier in ("local", "redis")}
+
+    async def listen(self):
+        """Delete local cache entries invalidated by any worker.
+        Local cache is cleared after reconnection, as messages published
+        while disconnected are lost."""
+        while True:
+            try:
+                async with self.cache.pubsub() as pubsub:
+                    await pubsub.subscribe(INVALIDATION_CHANNEL)
+                    self.local.clear()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.local.delete(orjson.loads(message["data"]))
+            except RedisError:
+                await asyncio.sleep(1)
+
+    @asynccontextmanager
+    async def listening(self):
+        """Run `listen` in background if local cache is enabled."""
+        if self.local is None or RESPONSE_CACHER_DISABLE:
+            yield
             return
-        key = self.get_key_str(**kwargs)
-        if name.endswith("+"):
-            name = name[:-1]
-            for hg_key in self.cache.hgetall(name=name).keys():
-                if hg_key.startswith(key[:-1]):
-                    hg_keys = [hg_key]
-                    self.cache.hdel(name, *hg_keys)
-                    return
-        keys = [key]
-        self.cache.hdel(name, *keys)
+        task = asyncio.create_task(self.listen())
+        try:
+            yield
+        finally:
+            task.cancel()
 
 
-response_cacher = ResponseCacher(redis_cache)
+response_cacher = ResponseCacher(
+    redis_cache,
+    LocalCache(RESPONSE_CACHER_LOCAL_SIZE, RESPONSE_CACHER_LOCAL_TTL)
+    if RESPONSE_CACHER_LOCAL_SIZE else None,
+    RESPONSE_CACHER_STALE_TTL,
+    primary_pin=DATABASE_PRIMARY_PIN if REPLICA_DATABASE_URL else 0)
 
 
-def cache_add(endpoint):
+def cache_add(endpoint=None, /, *, ttl: int | None = None,
+              error_ttl: int | None = None):
     """Decorator for adding endpoint's response data to cache.
-    Used without arguments."""
-    @wraps(endpoint)
-    def wrapper(*args, **kwargs):
-        print(f"RESPONSE_CACHER_DISABLE = {RESPONSE_CACHER_DISABLE}")
-        if not RESPONSE_CACHER_DISABLE:
-            if response_cacher.exists(endpoint.__name__, **kwargs):
-                return response_cacher.get(endpoint.__name__, **kwargs)
-        response = endpoint(*args, **kwargs)
-        if not RESPONSE_CACHER_DISABLE:
-            response_cacher.add(endpoint.__name__, response, **kwargs)
-        return response
-    return wrapper
+    Used without arguments or with seconds for which successful (`ttl`)
+    and error (`error_ttl`) responses are cached, e.g.:
+        @cache_add(ttl=600)
+    (`RESPONSE_CACHER_TTL` and `RESPONSE_CACHER_ERROR_TTL` by default).
+    Endpoint's response is rendered to `Response` by `render_response`,
+    so FastAPI does not validate and serialize it again.
+    Concurrent misses of the same response call endpoint once
+    (see `ResponseCacher.get_or_add`)."""
+    def inner_func(endpoint):
+        @wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            async def render() -> Response:
+                return render_response(await endpoint(*args, **kwargs))
+
+            if RESPONSE_CACHER_DISABLE:
+                return await render()
+            return await response_cacher.get_or_add(
+                endpoint.__name__, render, ttl, error_ttl, **kwargs)
+        return wrapper
+    if endpoint is None:
+        return inner_func
+    return inner_func(endpoint)
 
 
 def cache_delete(endpoints: dict[str, list[str]]):
@@ -130,16 +631,18 @@ def cache_delete(endpoints: dict[str, list[str]]):
     If endpoint_name in key ends with "+" then deleting all items from cache
     which key names begins with items ids from dictionary key's list.
     Example:
-        @cache_delete({"get_dish+": ["menu_id"]})"""
+        @cache_delete({"get_dish+": ["menu_id"]})
+    Responses are deleted after the endpoint returned (and committed its
+    write), and not deleted if it raised."""
     def inner_func(endpoint):
         @wraps(endpoint)
-        def wrapper(*args, **kwargs):
-            if not RESPONSE_CACHER_DISABLE:
-                for endpoint_name, keys in endpoints.items():
-                    key_dict = dict()
-                    for key in keys:
-                        key_dict[key] = kwargs[key]
-                    response_cacher.delete(endpoint_name, **key_dict)
-            return endpoint(*args, **kwargs)
+        async def wrapper(*args, **kwargs):
+            response = await endpoint(*args, **kwargs)
+            if RESPONSE_CACHER_DISABLE:
+                return response
+            await response_cacher.delete_many({
+                endpoint_name: {key: kwargs[key] for key in keys}
+                for endpoint_name, keys in endpoints.items()})
+            return response
         return wrapper
     return inner_func
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from itertools import groupby
+
+from sqlalchemy import func, select
+from starlette.responses import Response
+
+from config import PAGE_LIMIT_DEFAULT
+from database import redis_cache, session_scope
+from menus.models import Dish, Menu, Submenu
+from menus.repositories import (DishRepository, MenuRepository,
+                                SubmenuRepository)
+from menus.utils.pagination import Page, get_raw_page
+from menus.utils.response_cacher import (RESPONSE_CACHER_DISABLE,
+                                         render_response, response_cacher)
+
+# RESPONSE_CACHER_WARMUP - environment variable, may be `1` for warming up
+# the cache in background on server start or `0` for no warm-up
+# RESPONSE_CACHER_WARMUP_BATCH_SIZE - environment variable, menus per batch:
+# their submenus and dishes are selected by one query each and their
+# responses are added by one Redis pipeline
+# RESPONSE_CACHER_WARMUP_CONCURRENCY - environment variable, batches warmed
+# up at once, each of them holds one database connection
+RESPONSE_CACHER_WARMUP = int(os.getenv("RESPONSE_CACHER_WARMUP", default=0))
+RESPONSE_CACHER_WARMUP_BATCH_SIZE = int(os.getenv(
+    "RESPONSE_CACHER_WARMUP_BATCH_SIZE", default=100))
+RESPONSE_CACHER_WARMUP_CONCURRENCY = int(os.getenv(
+    "RESPONSE_CACHER_WARMUP_CONCURRENCY", default=2))
+
+# Redis key taken by the worker warming up the cache on server start,
+# so other workers skip it
+WARMUP_LOCK = "lock:warm_up"
+WARMUP_LOCK_TIMEOUT = 600
+
+logger = logging.getLogger(__name__)
+
+Responses = list[tuple[str, Response, dict]]
+
+
+def get_pages(rows, parent_column: str, schema,
+              limit: int) -> dict:
+    """Group rows ordered by parent id and item id into first pages."""
+    return {parent_id: get_raw_page(list(group)[:limit + 1], schema, limit)
+            for parent_id, group in groupby(
+                rows, key=lambda row: getattr(row, parent_column))}
+
+
+async def get_batch_responses(session, menus: list) -> Responses:
+    """Render `get_menu`, `get_submenus` and `get_dishes` responses
+    (first pages) for menus rows, selecting submenus and dishes of all
+    of them by one query each."""
+    limit = PAGE_LIMIT_DEFAULT
+    menu_ids = [menu.id for menu in menus]
+    menu_repository = MenuRepository(session)
+    submenu_repository = SubmenuRepository(session)
+    submenus = (await session.execute(
+        submenu_repository.query.add_columns(Submenu.menu_id)
+        .where(Submenu.menu_id.in_(menu_ids))
+        .order_by(Submenu.menu_id, Submenu.id))).all()
+    dish_repository = DishRepository(session)
+    ranked = (dish_repository.query
+              .add_columns(Submenu.menu_id, Dish.submenu_id,
+                           func.row_number().over(
+                               partition_by=Dish.submenu_id,
+                               order_by=Dish.id).label("position"))
+              .join(Submenu, Submenu.id == Dish.submenu_id)
+              .where(Submenu.menu_id.in_(menu_ids))
+              .subquery())
+    dishes = (await session.execute(
+        select(ranked)
+        .where(ranked.c.position <= limit + 1)
+        .order_by(ranked.c.submenu_id, ranked.c.id))).all()
+    submenu_pages = get_pages(submenus, "menu_id",
+                              submenu_repository.schema, limit)
+    dish_pages = get_pages(dishes, "submenu_id",
+                           dish_repository.schema, limit)
+    responses = list()
+    for menu in menus:
+        responses.append(("get_menu",
+                          render_response(menu_repository.schema
+                                          .model_validate(menu._asdict())),
+                          {"menu_id": menu.id}))
+        responses.append(("get_submenus",
+                          render_response(submenu_pages.get(menu.id,
+                                                            Page())),
+                          {"menu_id": menu.id, "limit": limit}))
+    for submenu in submenus:
+        responses.append(("get_dishes",
+                          render_response(dish_pages.get(submenu.id,
+                                                         Page())),
+                          {"menu_id": submenu.menu_id,
+                           "submenu_id": submenu.id,
+                           "limit": limit}))
+    return responses
+
+
+async def warm_up_batch(menus: list, generation: int,
+                        semaphore: asyncio.Semaphore, scope) -> int:
+    """Add responses of menus rows selected after `generation` was read."""
+    try:
+        async with scope() as session:
+            responses = await get_batch_responses(session, menus)
+        return await response_cacher.add_many(responses, generation)
+    finally:
+        semaphore.release()
+
+
+async def warm_up(batch_size: int = RESPONSE_CACHER_WARMUP_BATCH_SIZE,
+                  concurrency: int = RESPONSE_CACHER_WARMUP_CONCURRENCY,
+                  scope=session_scope) -> int:
+    """Add first pages of `get_menus`, `get_submenus` and `get_dishes` and
+    all `get_menu` responses to cache. Returns number of added responses.
+    Responses are not added if they are already cached or if anything is
+    invalidated while they are rendered (see `ResponseCacher.add_many`).
+    Menus are read by keyset-paginated batches, no more than `concurrency`
+    batches are rendered and added at once, so warm-up takes only that many
+    database connections from live requests. If any batch fails, the others
+    are cancelled.
+    Sessions are opened by `scope` async context manager factory."""
+    generation = await response_cacher.get_generation()
+    async with scope() as session:
+        menu_repository = MenuRepository(session)
+        responses = [("get_menus",
+                      render_response(await menu_repository.get_all()),
+                      {"limit": PAGE_LIMIT_DEFAULT})]
+    added = await response_cacher.add_many(responses, generation)
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = list()
+    query = menu_repository.query.order_by(Menu.id).limit(batch_size)
+    after = None
+    try:
+        while True:
+            await semaphore.acquire()
+            generation = await response_cacher.get_generation()
+            async with scope() as session:
+                menus = (await session.execute(
+                    query if after is None
+                    else query.where(Menu.id > after))).all()
+            if not menus:
+                semaphore.release()
+                break
+            tasks.append(asyncio.create_task(
+                warm_up_batch(menus, generation, semaphore, scope)))
+            after = menus[-1].id
+        return added + sum(await asyncio.gather(*tasks))
+    finally:
+        # batches still running if reading menus or another batch failed
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def warm_up_once():
+    """Warm up the cache unless another worker is warming it up."""
+    if not await redis_cache.set(WARMUP_LOCK, 1, nx=True,
+                                 ex=WARMUP_LOCK_TIMEOUT):
+        return
+    try:
+        logger.info("Cache warm-up added %d responses.", await warm_up())
+    except Exception:
+        logger.exception("Cache warm-up failed.")
+    finally:
+        await redis_cache.unlink(WARMUP_LOCK)
+
+
+@asynccontextmanager
+async def warming_up():
+    """Run `warm_up_once` in background if `RESPONSE_CACHER_WARMUP` is set,
+    so the server starts serving requests at once."""
+    if not RESPONSE_CACHER_WARMUP or RESPONSE_CACHER_DISABLE:
+        yield
+        return
+    task = asyncio.create_task(warm_up_once())
+    try:
+        yield
+    finally:
+        task.cancel()
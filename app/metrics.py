@@ -0,0 +1,146 @@
+import os
+import time
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+from sqlalchemy import Engine, event
+from sqlalchemy.pool import QueuePool
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# PROMETHEUS_MULTIPROC_DIR - environment variable, existing empty directory
+# for metrics of all uvicorn workers (multiprocess mode), must be emptied
+# before server start; if not set, metrics of the current process only
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency per router endpoint",
+    ["endpoint", "method", "status"])
+CACHE_HITS = Counter(
+    "response_cache_hits_total",
+    "ResponseCacher hits per endpoint and tier (local or redis)",
+    ["endpoint", "tier"])
+CACHE_MISSES = Counter(
+    "response_cache_misses_total",
+    "ResponseCacher misses per endpoint and tier (local or redis)",
+    ["endpoint", "tier"])
+CACHE_INVALIDATIONS = Counter(
+    "response_cache_invalidations_total",
+    "ResponseCacher invalidations per endpoint",
+    ["endpoint"])
+SQL_QUERY_DURATION = Histogram(
+    "sql_query_duration_seconds",
+    "SQL query duration per engine and statement type",
+    ["engine", "operation"])
+POOL_CHECKOUTS = Counter(
+    "db_pool_checkouts_total",
+    "SQLAlchemy pool connection checkouts",
+    ["engine"])
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "SQLAlchemy pool connections in use",
+    ["engine"], multiprocess_mode="livesum")
+POOL_OVERFLOW = Gauge(
+    "db_pool_overflow",
+    "SQLAlchemy pool connections opened over pool_size",
+    ["engine"], multiprocess_mode="livesum")
+POOL_SIZE = Gauge(
+    "db_pool_size",
+    "SQLAlchemy pool_size",
+    ["engine"], multiprocess_mode="livesum")
+
+
+def get_operation(statement: str) -> str:
+    """Return statement type (SELECT, INSERT, ...) for metric label."""
+    words = statement.split(None, 1)
+    return words[0].upper() if words else ""
+
+
+def instrument_engine(engine: Engine, name: str):
+    """Observe SQL queries and pool usage of the (sync) engine."""
+    instrument_queries(engine, name)
+    instrument_pool(engine, name)
+
+
+def instrument_queries(engine: Engine, name: str):
+    def before_cursor_execute(conn, cursor, statement, *args):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, *args):
+        started = conn.info["query_started"].pop()
+        SQL_QUERY_DURATION.labels(name, get_operation(statement)).observe(
+            time.perf_counter() - started)
+
+    def handle_error(context):
+        if context.connection is None:
+            return
+        started = context.connection.info.get("query_started")
+        if started:
+            started.pop()
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+
+
+def instrument_pool(engine: Engine, name: str):
+    def checkout(*args):
+        POOL_CHECKOUTS.labels(name).inc()
+        POOL_CHECKED_OUT.labels(name).inc()
+        observe_overflow()
+
+    def checkin(*args):
+        POOL_CHECKED_OUT.labels(name).dec()
+        observe_overflow()
+
+    def observe_overflow():
+        if isinstance(engine.pool, QueuePool):
+            POOL_OVERFLOW.labels(name).set(max(engine.pool.overflow(), 0))
+
+    event.listen(engine, "checkout", checkout)
+    event.listen(engine, "checkin", checkin)
+    if isinstance(engine.pool, QueuePool):
+        POOL_SIZE.labels(name).set(engine.pool.size())
+
+
+class MetricsMiddleware:
+    """Observe duration of every HTTP request labeled with the name of
+    router endpoint (`unmatched` if no route matched)."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            route = scope.get("route")
+            REQUEST_DURATION.labels(
+                route.name if route is not None else "unmatched",
+                scope["method"], status_code,
+            ).observe(time.perf_counter() - started)
+
+
+def get_metrics(request: Request) -> Response:
+    """Metrics of all workers in multiprocess mode or of this process."""
+    registry = REGISTRY
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(content=generate_latest(registry),
+                    media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,39 @@
+"""numeric dish price
+
+Revision ID: 01482914d880
+Revises: 7db5958720f0
+Create Date: 2026-10-18 15:04:12.811073
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '01482914d880'
+down_revision: Union[str, None] = '7db5958720f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column('dishes', 'price',
+                    existing_type=sa.String(),
+                    type_=sa.Numeric(10, 2),
+                    existing_nullable=False,
+                    postgresql_using='price::numeric(10, 2)')
+    op.create_index('ix_dishes_submenu_id_price', 'dishes',
+                    ['submenu_id', 'price', 'id'], unique=False)
+    op.drop_index('ix_dishes_submenu_id', table_name='dishes')
+
+
+def downgrade() -> None:
+    op.create_index('ix_dishes_submenu_id', 'dishes', ['submenu_id'],
+                    unique=False)
+    op.drop_index('ix_dishes_submenu_id_price', table_name='dishes')
+    op.alter_column('dishes', 'price',
+                    existing_type=sa.Numeric(10, 2),
+                    type_=sa.String(),
+                    existing_nullable=False,
+                    postgresql_using='price::text')
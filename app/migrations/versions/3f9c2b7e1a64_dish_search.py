@@ -0,0 +1,70 @@
+"""dish search
+
+Revision ID: 3f9c2b7e1a64
+Revises: 01482914d880
+Create Date: 2026-10-18 17:20:44.518302
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2b7e1a64'
+down_revision: Union[str, None] = '01482914d880'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.add_column('dishes', sa.Column(
+        'search_vector', postgresql.TSVECTOR(),
+        sa.Computed("setweight(to_tsvector('simple'::regconfig, title), "
+                    "'A') || setweight(to_tsvector('simple'::regconfig, "
+                    "description), 'B')", persisted=True),
+        nullable=True))
+    op.create_index('ix_dishes_search_vector', 'dishes', ['search_vector'],
+                    unique=False, postgresql_using='gin')
+    op.create_table('search_words',
+                    sa.Column('word', sa.String(), nullable=False),
+                    sa.PrimaryKeyConstraint('word'))
+    op.execute("""
+        INSERT INTO search_words (word)
+        SELECT word FROM ts_stat('SELECT search_vector FROM dishes')
+    """)
+    op.create_index('ix_search_words_word_trgm', 'search_words', ['word'],
+                    unique=False, postgresql_using='gin',
+                    postgresql_ops={'word': 'gin_trgm_ops'})
+    op.execute("""
+        CREATE OR REPLACE FUNCTION search_words() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO search_words (word)
+            SELECT DISTINCT unnest(tsvector_to_array(search_vector)) AS word
+            FROM new_dishes
+            ORDER BY word
+            ON CONFLICT DO NOTHING;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER search_words_insert AFTER INSERT ON dishes
+        REFERENCING NEW TABLE AS new_dishes
+        FOR EACH STATEMENT EXECUTE FUNCTION search_words();
+        CREATE TRIGGER search_words_update AFTER UPDATE ON dishes
+        REFERENCING NEW TABLE AS new_dishes
+        FOR EACH STATEMENT EXECUTE FUNCTION search_words();
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS search_words_update ON dishes")
+    op.execute("DROP TRIGGER IF EXISTS search_words_insert ON dishes")
+    op.execute("DROP FUNCTION IF EXISTS search_words()")
+    op.drop_index('ix_search_words_word_trgm', table_name='search_words')
+    op.drop_table('search_words')
+    op.drop_index('ix_dishes_search_vector', table_name='dishes')
+    op.drop_column('dishes', 'search_vector')
+    # pg_trgm is left installed: it may have been installed before
+    # and may be used by other objects of the database
@@ -0,0 +1,94 @@
+"""counters
+
+Revision ID: 5b0e4d3c2a1f
+Revises: c813986a92f5
+Create Date: 2026-10-18 10:12:31.118207
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '5b0e4d3c2a1f'
+down_revision: Union[str, None] = 'c813986a92f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('menus', sa.Column('submenus_count', sa.Integer(),
+                                     server_default='0', nullable=False))
+    op.add_column('menus', sa.Column('dishes_count', sa.Integer(),
+                                     server_default='0', nullable=False))
+    op.add_column('submenus', sa.Column('dishes_count', sa.Integer(),
+                                        server_default='0', nullable=False))
+    op.execute("""
+        UPDATE submenus SET dishes_count = actual.dishes_count
+        FROM (SELECT submenu_id, count(*) AS dishes_count
+              FROM dishes GROUP BY submenu_id) AS actual
+        WHERE submenus.id = actual.submenu_id
+    """)
+    op.execute("""
+        UPDATE menus SET submenus_count = actual.submenus_count,
+                         dishes_count = actual.dishes_count
+        FROM (SELECT menu_id, count(*) AS submenus_count,
+                     sum(dishes_count) AS dishes_count
+              FROM submenus GROUP BY menu_id) AS actual
+        WHERE menus.id = actual.menu_id
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION submenus_counters() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE menus
+                SET submenus_count = submenus_count + 1,
+                    dishes_count = dishes_count + NEW.dishes_count
+                WHERE id = NEW.menu_id;
+                RETURN NEW;
+            END IF;
+            UPDATE menus
+            SET submenus_count = submenus_count - 1,
+                dishes_count = dishes_count - OLD.dishes_count
+            WHERE id = OLD.menu_id;
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER submenus_counters AFTER INSERT OR DELETE ON submenus
+        FOR EACH ROW EXECUTE FUNCTION submenus_counters();
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION dishes_counters() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE submenus SET dishes_count = dishes_count + 1
+                WHERE id = NEW.submenu_id;
+                UPDATE menus SET dishes_count = menus.dishes_count + 1
+                FROM submenus
+                WHERE submenus.id = NEW.submenu_id
+                  AND menus.id = submenus.menu_id;
+                RETURN NEW;
+            END IF;
+            UPDATE submenus SET dishes_count = dishes_count - 1
+            WHERE id = OLD.submenu_id;
+            UPDATE menus SET dishes_count = menus.dishes_count - 1
+            FROM submenus
+            WHERE submenus.id = OLD.submenu_id
+              AND menus.id = submenus.menu_id;
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER dishes_counters AFTER INSERT OR DELETE ON dishes
+        FOR EACH ROW EXECUTE FUNCTION dishes_counters();
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS dishes_counters ON dishes")
+    op.execute("DROP TRIGGER IF EXISTS submenus_counters ON submenus")
+    op.execute("DROP FUNCTION IF EXISTS dishes_counters()")
+    op.execute("DROP FUNCTION IF EXISTS submenus_counters()")
+    op.drop_column('submenus', 'dishes_count')
+    op.drop_column('menus', 'dishes_count')
+    op.drop_column('menus', 'submenus_count')
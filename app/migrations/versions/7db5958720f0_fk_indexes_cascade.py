@@ -0,0 +1,44 @@
+"""fk indexes and on delete cascade
+
+Revision ID: 7db5958720f0
+Revises: 8e2f6a1d4c7b
+Create Date: 2026-10-18 14:52:31.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '7db5958720f0'
+down_revision: Union[str, None] = '8e2f6a1d4c7b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_submenus_menu_id'), 'submenus', ['menu_id'],
+                    unique=False)
+    op.create_index(op.f('ix_dishes_submenu_id'), 'dishes', ['submenu_id'],
+                    unique=False)
+    op.drop_constraint('submenus_menu_id_fkey', 'submenus',
+                       type_='foreignkey')
+    op.create_foreign_key('submenus_menu_id_fkey', 'submenus', 'menus',
+                          ['menu_id'], ['id'], ondelete='CASCADE')
+    op.drop_constraint('dishes_submenu_id_fkey', 'dishes',
+                       type_='foreignkey')
+    op.create_foreign_key('dishes_submenu_id_fkey', 'dishes', 'submenus',
+                          ['submenu_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    op.drop_constraint('dishes_submenu_id_fkey', 'dishes',
+                       type_='foreignkey')
+    op.create_foreign_key('dishes_submenu_id_fkey', 'dishes', 'submenus',
+                          ['submenu_id'], ['id'])
+    op.drop_constraint('submenus_menu_id_fkey', 'submenus',
+                       type_='foreignkey')
+    op.create_foreign_key('submenus_menu_id_fkey', 'submenus', 'menus',
+                          ['menu_id'], ['id'])
+    op.drop_index(op.f('ix_dishes_submenu_id'), table_name='dishes')
+    op.drop_index(op.f('ix_submenus_menu_id'), table_name='submenus')
@@ -0,0 +1,145 @@
+"""statement counters
+
+Revision ID: 8e2f6a1d4c7b
+Revises: 5b0e4d3c2a1f
+Create Date: 2026-10-18 12:47:05.630914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '8e2f6a1d4c7b'
+down_revision: Union[str, None] = '5b0e4d3c2a1f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS dishes_counters ON dishes")
+    op.execute("DROP TRIGGER IF EXISTS submenus_counters ON submenus")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION submenus_counters() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE menus
+                SET submenus_count =
+                        menus.submenus_count + changed.submenus_count,
+                    dishes_count = menus.dishes_count + changed.dishes_count
+                FROM (SELECT menu_id, count(*) AS submenus_count,
+                             sum(dishes_count) AS dishes_count
+                      FROM new_submenus GROUP BY menu_id) AS changed
+                WHERE menus.id = changed.menu_id;
+            ELSE
+                UPDATE menus
+                SET submenus_count =
+                        menus.submenus_count - changed.submenus_count,
+                    dishes_count = menus.dishes_count - changed.dishes_count
+                FROM (SELECT menu_id, count(*) AS submenus_count,
+                             sum(dishes_count) AS dishes_count
+                      FROM old_submenus GROUP BY menu_id) AS changed
+                WHERE menus.id = changed.menu_id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER submenus_counters_insert AFTER INSERT ON submenus
+        REFERENCING NEW TABLE AS new_submenus
+        FOR EACH STATEMENT EXECUTE FUNCTION submenus_counters();
+        CREATE TRIGGER submenus_counters_delete AFTER DELETE ON submenus
+        REFERENCING OLD TABLE AS old_submenus
+        FOR EACH STATEMENT EXECUTE FUNCTION submenus_counters();
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION dishes_counters() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE submenus
+                SET dishes_count = submenus.dishes_count + changed.dishes_count
+                FROM (SELECT submenu_id, count(*) AS dishes_count
+                      FROM new_dishes GROUP BY submenu_id) AS changed
+                WHERE submenus.id = changed.submenu_id;
+                UPDATE menus
+                SET dishes_count = menus.dishes_count + changed.dishes_count
+                FROM (SELECT submenus.menu_id, count(*) AS dishes_count
+                      FROM new_dishes
+                      JOIN submenus ON submenus.id = new_dishes.submenu_id
+                      GROUP BY submenus.menu_id) AS changed
+                WHERE menus.id = changed.menu_id;
+            ELSE
+                UPDATE submenus
+                SET dishes_count = submenus.dishes_count - changed.dishes_count
+                FROM (SELECT submenu_id, count(*) AS dishes_count
+                      FROM old_dishes GROUP BY submenu_id) AS changed
+                WHERE submenus.id = changed.submenu_id;
+                UPDATE menus
+                SET dishes_count = menus.dishes_count - changed.dishes_count
+                FROM (SELECT submenus.menu_id, count(*) AS dishes_count
+                      FROM old_dishes
+                      JOIN submenus ON submenus.id = old_dishes.submenu_id
+                      GROUP BY submenus.menu_id) AS changed
+                WHERE menus.id = changed.menu_id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER dishes_counters_insert AFTER INSERT ON dishes
+        REFERENCING NEW TABLE AS new_dishes
+        FOR EACH STATEMENT EXECUTE FUNCTION dishes_counters();
+        CREATE TRIGGER dishes_counters_delete AFTER DELETE ON dishes
+        REFERENCING OLD TABLE AS old_dishes
+        FOR EACH STATEMENT EXECUTE FUNCTION dishes_counters();
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS dishes_counters_insert ON dishes")
+    op.execute("DROP TRIGGER IF EXISTS dishes_counters_delete ON dishes")
+    op.execute("DROP TRIGGER IF EXISTS submenus_counters_insert ON submenus")
+    op.execute("DROP TRIGGER IF EXISTS submenus_counters_delete ON submenus")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION submenus_counters() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE menus
+                SET submenus_count = submenus_count + 1,
+                    dishes_count = dishes_count + NEW.dishes_count
+                WHERE id = NEW.menu_id;
+                RETURN NEW;
+            END IF;
+            UPDATE menus
+            SET submenus_count = submenus_count - 1,
+                dishes_count = dishes_count - OLD.dishes_count
+            WHERE id = OLD.menu_id;
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER submenus_counters AFTER INSERT OR DELETE ON submenus
+        FOR EACH ROW EXECUTE FUNCTION submenus_counters();
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION dishes_counters() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE submenus SET dishes_count = dishes_count + 1
+                WHERE id = NEW.submenu_id;
+                UPDATE menus SET dishes_count = menus.dishes_count + 1
+                FROM submenus
+                WHERE submenus.id = NEW.submenu_id
+                  AND menus.id = submenus.menu_id;
+                RETURN NEW;
+            END IF;
+            UPDATE submenus SET dishes_count = dishes_count - 1
+            WHERE id = OLD.submenu_id;
+            UPDATE menus SET dishes_count = menus.dishes_count - 1
+            FROM submenus
+            WHERE submenus.id = OLD.submenu_id
+              AND menus.id = submenus.menu_id;
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER dishes_counters AFTER INSERT OR DELETE ON dishes
+        FOR EACH ROW EXECUTE FUNCTION dishes_counters();
+    """)
+
@@ -0,0 +1,57 @@
+import logging
+from contextvars import ContextVar
+
+from sqlalchemy import Engine, event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import QUERY_COUNT_WARNING
+
+QUERY_COUNT_HEADER = "X-Query-Count"
+
+logger = logging.getLogger(__name__)
+
+# number of SQL queries of the current request; a mutable list, so queries
+# made in copied contexts (threadpool, SQLAlchemy greenlets) are counted too
+query_count: ContextVar[list[int] | None] = ContextVar("query_count",
+                                                       default=None)
+
+
+def count_queries(engine: Engine):
+    """Count SQL queries of the (sync) engine per request."""
+    def before_cursor_execute(*args):
+        count = query_count.get()
+        if count is not None:
+            count[0] += 1
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+
+
+class QueryCounterMiddleware:
+    """Send number of SQL queries made before the response is started in
+    `X-Query-Count` header and log warning if the number of queries of the
+    whole request is over `QUERY_COUNT_WARNING`."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        count = [0]
+        token = query_count.set(count)
+
+        async def send_count(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[QUERY_COUNT_HEADER] = str(
+                    count[0])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_count)
+        finally:
+            query_count.reset(token)
+            if count[0] > QUERY_COUNT_WARNING:
+                logger.warning("%s %s made %d SQL queries",
+                               scope["method"], scope["path"], count[0])
@@ -1,33 +1,57 @@
+from contextlib import asynccontextmanager
+
 import pytest
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from starlette.testclient import TestClient
 
-from config import (POSTGRES_DB_TEST, POSTGRES_HOST_TEST,
+from config import (DATABASE_ASYNC, POSTGRES_DB_TEST, POSTGRES_HOST_TEST,
                     POSTGRES_PASSWORD_TEST, POSTGRES_PORT_TEST,
                     POSTGRES_USER_TEST)
 from database import Base as Base_menus
-from database import get_session
+from database import (ThreadedSession, get_read_session, get_session,
+                      get_session_scope)
 from main import app
+from metrics import instrument_engine
+from query_counter import count_queries
 
 DATABASE_URL_TEST = (
     f"postgresql://{POSTGRES_USER_TEST}:{POSTGRES_PASSWORD_TEST}"
     f"@{POSTGRES_HOST_TEST}:{POSTGRES_PORT_TEST}/{POSTGRES_DB_TEST}"
 )
+ASYNC_DATABASE_URL_TEST = DATABASE_URL_TEST.replace(
+    "postgresql://", "postgresql+asyncpg://", 1)
 
 engine_test = create_engine(DATABASE_URL_TEST)
 SessionTest = sessionmaker(bind=engine_test, autocommit=False, autoflush=False)
 
+async_engine_test = create_async_engine(ASYNC_DATABASE_URL_TEST)
+instrument_engine(engine_test, "sync")
+instrument_engine(async_engine_test.sync_engine, "async")
+count_queries(engine_test)
+count_queries(async_engine_test.sync_engine)
+AsyncSessionTest = async_sessionmaker(bind=async_engine_test,
+                                      autoflush=False,
+                                      expire_on_commit=False)
 
-def override_get_session():
-    db = SessionTest()
+
+async def override_get_session():
+    if DATABASE_ASYNC:
+        async with AsyncSessionTest() as db:
+            yield db
+        return
+    db = ThreadedSession(SessionTest(expire_on_commit=False))
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
 
 
 app.dependency_overrides[get_session] = override_get_session
+app.dependency_overrides[get_read_session] = override_get_session
+app.dependency_overrides[get_session_scope] = (
+    lambda: asynccontextmanager(override_get_session))
 
 
 @pytest.fixture(scope="function")
@@ -47,3 +71,11 @@ def prepare_database():
 
 
 client = TestClient(app=app, base_url="http://localhost:8000/api/v1")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def client_portal():
+    """Run every request of the session on one event loop, so pooled
+    asyncpg and redis connections are not shared between loops."""
+    with client:
+        yield client
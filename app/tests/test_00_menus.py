@@ -1,13 +1,15 @@
 import uuid
 
 from conftest import client
-from data import (expected_keys_404, expected_keys_422, menu_expected_keys,
-                  menu_expected_values_404, menu_request_body1)
+from data import (dish_request_body1, dish_request_body2, expected_keys_404,
+                  expected_keys_422, menu_expected_keys,
+                  menu_expected_values_404, menu_request_body1,
+                  submenu_request_body1, submenu_request_body2)
 from sqlalchemy.orm import Session
 from starlette import status
 from utils import check_keys, check_values
 
-from menus.models import Menu
+from menus.models import Dish, Menu, Submenu
 import os
 
 os.environ["RESPONSE_CACHER_DISABLE"] = "1"
@@ -86,6 +88,45 @@ def test_get_menu_404():
     check_values(response.json(), expected_values)
 
 
+def test_get_menu_tree(test_session: Session):
+    menu = Menu(**menu_request_body1)
+    submenu1 = Submenu(**submenu_request_body1)
+    submenu2 = Submenu(**submenu_request_body2)
+    dish1 = Dish(**dish_request_body1)
+    dish2 = Dish(**dish_request_body2)
+    submenu1.dishes.extend([dish1, dish2])
+    menu.submenus.extend([submenu1, submenu2])
+    test_session.add(menu)
+    test_session.commit()
+    expected_keys = menu_expected_keys + ["submenus"]
+    expected_values = menu_request_body1 | {"submenus_count": 2,
+                                            "dishes_count": 2,
+                                            "id": str(menu.id)}
+    response = client.get(f"/menus/{str(menu.id)}/tree")
+    assert response.status_code == status.HTTP_200_OK
+    check_keys(response.json(), expected_keys)
+    check_values(response.json(), expected_values)
+    submenus = {submenu["id"]: submenu
+                for submenu in response.json()["submenus"]}
+    assert set(submenus) == {str(submenu1.id), str(submenu2.id)}
+    check_values(submenus[str(submenu1.id)],
+                 submenu_request_body1 | {"dishes_count": 2})
+    assert ({dish["id"] for dish in submenus[str(submenu1.id)]["dishes"]}
+            == {str(dish1.id), str(dish2.id)})
+    assert submenus[str(submenu2.id)]["dishes"] == []
+    test_session.delete(menu)
+    test_session.commit()
+
+
+def test_get_menu_tree_404():
+    expected_keys = expected_keys_404
+    expected_values = menu_expected_values_404
+    response = client.get(f"/menus/{uuid.uuid4()}/tree")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    check_keys(response.json(), expected_keys)
+    check_values(response.json(), expected_values)
+
+
 def test_update_menu(test_session: Session):
     menu = Menu(**menu_request_body1)
     test_session.add(menu)
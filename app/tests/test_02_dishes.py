@@ -1,14 +1,18 @@
+import json
 import uuid
 
 from conftest import client
 from data import (dish_expected_keys, dish_expected_values_404,
-                  dish_request_body1, expected_keys_404, expected_keys_422,
-                  menu_request_body1, submenu_request_body1)
+                  dish_request_body1, dish_request_body2, dish_request_body3,
+                  expected_keys_404, expected_keys_422, menu_request_body1,
+                  submenu_request_body1)
 from sqlalchemy.orm import Session
 from starlette import status
 from utils import check_keys, check_values
 
 from menus.models import Dish, Menu, Submenu
+from menus.schemas import DishReadSchema
+from menus.utils.pagination import NEXT_CURSOR_HEADER, encode_cursor
 
 
 def test_get_dishes_empty(test_session: Session):
@@ -42,7 +46,30 @@ def test_create_dish(test_session: Session):
     dish = (test_session.query(Dish)
             .filter(Dish.id == response.json().get("id")).first())
     assert dish, "Dish object not created!"
-    check_values(dish.as_dict(), dish_request_body1)
+    # price is NUMERIC(10, 2) in the database, a string in the API
+    check_values(DishReadSchema.model_validate(dish.as_dict()).model_dump(),
+                 dish_request_body1)
+    test_session.delete(menu)
+    test_session.commit()
+
+
+def test_create_dish_price_as_stored(test_session: Session):
+    menu = Menu(**menu_request_body1)
+    submenu = Submenu(**submenu_request_body1)
+    menu.submenus.append(submenu)
+    test_session.add(menu)
+    test_session.commit()
+    url = f"/menus/{str(menu.id)}/submenus/{str(submenu.id)}/dishes"
+    request_body = dish_request_body1 | {"price": "007.50"}
+    created = [client.post(url, json=request_body).json(),
+               *client.post(url + "/bulk", json=[request_body]).json()]
+    for dish_json in created:
+        assert dish_json["price"] == "7.50"
+        assert client.get(f"{url}/{dish_json['id']}").json() == dish_json
+    updated = client.patch(f"{url}/{created[0]['id']}",
+                           json=request_body | {"price": "012.00"}).json()
+    assert updated["price"] == "12.00"
+    assert client.get(f"{url}/{updated['id']}").json() == updated
     test_session.delete(menu)
     test_session.commit()
 
@@ -234,3 +261,202 @@ def test_delete_dish_404(test_session: Session):
     check_values(response.json(), expected_values)
     test_session.delete(menu)
     test_session.commit()
+
+
+def test_get_dishes_not_modified(test_session: Session):
+    menu = Menu(**menu_request_body1)
+    submenu = Submenu(**submenu_request_body1)
+    menu.submenus.append(submenu)
+    dish = Dish(**dish_request_body1)
+    submenu.dishes.append(dish)
+    test_session.add(menu)
+    test_session.commit()
+    url = f"/menus/{str(menu.id)}/submenus/{str(submenu.id)}/dishes"
+    response = client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["etag"]
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+    response = client.get(url, headers={"If-None-Match": f'"x", W/{etag}'})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    client.patch(f"{url}/{str(dish.id)}", json=dish_request_body2)
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] != etag
+    check_values(response.json()[0], dish_request_body2)
+    test_session.delete(menu)
+    test_session.commit()
+
+
+def test_get_dishes_pages(test_session: Session):
+    menu = Menu(**menu_request_body1)
+    submenu = Submenu(**submenu_request_body1)
+    menu.submenus.append(submenu)
+    dishes = [Dish(**dish_request_body1), Dish(**dish_request_body2),
+              Dish(**dish_request_body3)]
+    submenu.dishes.extend(dishes)
+    test_session.add(menu)
+    test_session.commit()
+    url = f"/menus/{str(menu.id)}/submenus/{str(submenu.id)}/dishes"
+    response = client.get(url, params={"limit": 2})
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()) == 2
+    next_cursor = response.headers.get(NEXT_CURSOR_HEADER)
+    assert next_cursor, "Next page cursor not found!"
+    response_next = client.get(url, params={"limit": 2,
+                                            "after": next_cursor})
+    assert response_next.status_code == status.HTTP_200_OK
+    assert len(response_next.json()) == 1
+    assert NEXT_CURSOR_HEADER not in response_next.headers
+    ids = [dish["id"] for dish in response.json() + response_next.json()]
+    assert ids == sorted(str(dish.id) for dish in dishes)
+    test_session.delete(menu)
+    test_session.commit()
+
+
+def test_get_dishes_incorrect_cursor(test_session: Session):
+    menu = Menu(**menu_request_body1)
+    submenu = Submenu(**submenu_request_body1)
+    menu.submenus.append(submenu)
+    test_session.add(menu)
+    test_session.commit()
+    response = client.get(f"/menus/{str(menu.id)}"
+                          f"/submenus/{str(submenu.id)}/dishes",
+                          params={"after": "incorrect"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json() == {"detail": "cursor incorrect"}
+    test_session.delete(menu)
+    test_session.commit()
+
+
+def test_get_dishes_sorted_by_price(test_session: Session):
+    menu = Menu(**menu_request_body1)
+    submenu = Submenu(**submenu_request_body1)
+    menu.submenus.append(submenu)
+    submenu.dishes.extend([Dish(**dish_request_body3),
+                           Dish(**dish_request_body1),
+                           Dish(**dish_request_body2)])
+    test_session.add(menu)
+    test_session.commit()
+    url = f"/menus/{str(menu.id)}/submenus/{str(submenu.id)}/dishes"
+    response = client.get(url, params={"limit": 2, "order_by": "price"})
+    assert response.status_code == status.HTTP_200_OK
+    next_cursor = response.headers.get(NEXT_CURSOR_HEADER)
+    assert next_cursor, "Next page cursor not found!"
+    response_next = client.get(url, params={"limit": 2, "order_by": "price",
+                                            "after": next_cursor})
+    assert response_next.status_code == status.HTTP_200_OK
+    assert NEXT_CURSOR_HEADER not in response_next.headers
+    prices = [dish["price"]
+              for dish in response.json() + response_next.json()]
+    assert prices == ["1.50", "2.25", "3.00"]
+    # cursor of rows sorted by id only
+    response = client.get(url, params={"order_by": "price",
+                                       "after": encode_cursor(submenu.id)})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    for price in ("NaN", "sNaN", "Infinity", "-Infinity"):
+        response = client.get(url, params={
+            "order_by": "price", "after": encode_cursor(submenu.id, price)})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST, price
+        assert response.json() == {"detail": "cursor incorrect"}
+    test_session.delete(menu)
+    test_session.commit()
+
+
+def test_get_dishes_price_range(test_session: Session):
+    menu = Menu(**menu_request_body1)
+    submenu = Submenu(**submenu_request_body1)
+    menu.submenus.append(submenu)
+    submenu.dishes.extend([Dish(**dish_request_body1),
+                           Dish(**dish_request_body2),
+                           Dish(**dish_request_body3)])
+    test_session.add(menu)
+    test_session.commit()
+    url = f"/menus/{str(menu.id)}/submenus/{str(submenu.id)}/dishes"
+    for params, prices in (({"min_price": "2"}, {"2.25", "3.00"}),
+                           ({"max_price": "2.25"}, {"1.50", "2.25"}),
+                           ({"min_price": "2", "max_price": "2.5"},
+                            {"2.25"}),
+                           ({}, {"1.50", "2.25", "3.00"})):
+        response = client.get(url, params=params)
+        assert response.status_code == status.HTTP_200_OK
+        assert {dish["price"] for dish in response.json()} == prices, params
+    response = client.get(url, params={"min_price": "-1"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    test_session.delete(menu)
+    test_session.commit()
+
+
+def test_create_dishes_bulk(test_session: Session):
+    menu = Menu(**menu_request_body1)
+    submenu = Submenu(**submenu_request_body1)
+    menu.submenus.append(submenu)
+    test_session.add(menu)
+    test_session.commit()
+    url = f"/menus/{str(menu.id)}/submenus/{str(submenu.id)}/dishes/bulk"
+    response = client.post(url, json=[dish_request_body1,
+                                      dish_request_body2])
+    assert response.status_code == status.HTTP_201_CREATED
+    assert len(response.json()) == 2
+    for dish_json, request_body in zip(response.json(),
+                                       [dish_request_body1,
+                                        dish_request_body2]):
+        check_keys(dish_json, dish_expected_keys)
+        check_values(dish_json, request_body)
+    response = client.post(
+        url, content=json.dumps(dish_request_body3) + "\n",
+        headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == status.HTTP_201_CREATED
+    check_values(response.json()[0], dish_request_body3)
+    dishes_count = (test_session.query(Dish)
+                    .filter(Dish.submenu_id == submenu.id).count())
+    assert dishes_count == 3
+    response = client.get(f"/menus/{str(menu.id)}")
+    assert response.json()["dishes_count"] == 3
+    test_session.delete(menu)
+    test_session.commit()
+
+
+def test_create_dishes_bulk_incorrect_body(test_session: Session):
+    menu = Menu(**menu_request_body1)
+    submenu = Submenu(**submenu_request_body1)
+    menu.submenus.append(submenu)
+    test_session.add(menu)
+    test_session.commit()
+    url = f"/menus/{str(menu.id)}/submenus/{str(submenu.id)}/dishes/bulk"
+    response = client.post(url, json=[dish_request_body1,
+                                      {"incorrect_key1": 1}])
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    check_keys(response.json(), expected_keys_422)
+    assert response.json()["detail"][0]["loc"][:2] == ["body", 1]
+    response = client.post(
+        url, content="{\n", headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    # not UTF-8
+    not_utf8 = b'{"title": "\xff", "description": "", "price": "1.00"}'
+    response = client.post(url, content=b"[" + not_utf8 + b"]",
+                           headers={"Content-Type": "application/json"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()["detail"][0]["type"] == "json_invalid"
+    response = client.post(url, content=not_utf8,
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()["detail"][0]["loc"] == ["body", 1]
+    dishes_count = (test_session.query(Dish)
+                    .filter(Dish.submenu_id == submenu.id).count())
+    assert dishes_count == 0
+    test_session.delete(menu)
+    test_session.commit()
+
+
+def test_create_dishes_bulk_openapi():
+    openapi = client.get("http://localhost:8000/api/openapi.json").json()
+    request_body = (openapi["paths"]["/api/v1/menus/{menu_id}/submenus"
+                                     "/{submenu_id}/dishes/bulk"]
+                    ["post"]["requestBody"])
+    items = request_body["content"]["application/json"]["schema"]["items"]
+    assert items["$ref"] == "#/components/schemas/DishWriteSchema"
+    assert "DishWriteSchema" in openapi["components"]["schemas"]
+    assert "application/x-ndjson" in request_body["content"]
@@ -3,9 +3,11 @@ from data import (dish_request_body1, dish_request_body2, dish_request_body3,
                   menu_request_body1, menu_request_body2, menu_request_body3,
                   submenu_request_body1, submenu_request_body2,
                   submenu_request_body3)
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 
 from menus.models import Dish, Menu, Submenu
+from menus.utils.counters import check_counters
 
 
 def test_menu_submenus_count_zero(test_session: Session):
@@ -168,3 +170,24 @@ def test_menu_dishes_count_after_submenu_delete(test_session: Session):
     assert response.json()["dishes_count"] == 1
     test_session.delete(menu1)
     test_session.commit()
+
+
+def test_check_counters_drift(test_session: Session):
+    menu1 = Menu(**menu_request_body1)
+    submenu1 = Submenu(**submenu_request_body1)
+    submenu1.dishes.append(Dish(**dish_request_body1))
+    menu1.submenus.append(submenu1)
+    test_session.add(menu1)
+    test_session.commit()
+    assert check_counters(test_session) == {"menus": [], "submenus": []}
+    test_session.execute(update(Menu).where(Menu.id == menu1.id)
+                         .values(dishes_count=5))
+    test_session.commit()
+    drift = check_counters(test_session, fix=True)
+    assert [row["id"] for row in drift["menus"]] == [menu1.id]
+    assert drift["menus"][0]["actual_dishes_count"] == 1
+    assert check_counters(test_session) == {"menus": [], "submenus": []}
+    response = client.get(f"/menus/{menu1.id}")
+    assert response.json()["dishes_count"] == 1
+    test_session.delete(menu1)
+    test_session.commit()
@@ -0,0 +1,66 @@
+import json
+from contextlib import asynccontextmanager
+
+from conftest import client, override_get_session
+from data import dish_request_body1, menu_request_body1, submenu_request_body1
+from sqlalchemy.orm import Session
+from starlette import status
+
+from menus.models import Dish, Menu, Submenu
+from menus.utils.export import export_catalog
+
+
+def test_export(test_session: Session):
+    menu = Menu(**menu_request_body1)
+    submenu = Submenu(**submenu_request_body1)
+    dish = Dish(**dish_request_body1)
+    submenu.dishes.append(dish)
+    menu.submenus.append(submenu)
+    test_session.add(menu)
+    test_session.commit()
+    response = client.get("/export")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    ids = {str(menu.id), str(submenu.id), str(dish.id)}
+    lines = [line for line in map(json.loads, response.text.splitlines())
+             if line["id"] in ids]
+    assert [line["type"] for line in lines] == ["menu", "submenu", "dish"]
+    assert lines[0] == menu_request_body1 | {"type": "menu",
+                                             "id": str(menu.id),
+                                             "submenus_count": 1,
+                                             "dishes_count": 1}
+    assert lines[1]["menu_id"] == str(menu.id)
+    assert lines[2] == dish_request_body1 | {"type": "dish",
+                                             "id": str(dish.id),
+                                             "submenu_id": str(submenu.id)}
+    test_session.delete(menu)
+    test_session.commit()
+    response = client.get("/export")
+    assert not ids & {json.loads(line)["id"]
+                      for line in response.text.splitlines()}
+
+
+def test_export_snapshot(test_session: Session):
+    menu = Menu(**menu_request_body1)
+    test_session.add(menu)
+    test_session.commit()
+
+    async def export_while_writing() -> list[dict]:
+        lines = list()
+        async with asynccontextmanager(override_get_session)() as session:
+            async for chunk in export_catalog(session):
+                if not lines:
+                    # submenu is added after its menu is exported
+                    test_session.add(Submenu(**submenu_request_body1,
+                                             menu_id=menu.id))
+                    test_session.commit()
+                lines.extend(map(json.loads, chunk.splitlines()))
+        return lines
+
+    lines = client.portal.call(export_while_writing)
+    assert str(menu.id) in {line["id"] for line in lines
+                            if line["type"] == "menu"}
+    assert str(menu.id) not in {line["menu_id"] for line in lines
+                                if line["type"] == "submenu"}
+    test_session.delete(menu)
+    test_session.commit()
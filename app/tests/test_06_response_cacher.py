@@ -0,0 +1,563 @@
+import asyncio
+import time
+import uuid
+from collections import namedtuple
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from functools import partial
+
+import pytest
+from conftest import client, override_get_session
+from data import dish_request_body1, menu_request_body1, submenu_request_body1
+from starlette import status
+from starlette.responses import JSONResponse
+
+from database import read_primary, redis_cache
+from menus.schemas import DishReadSchema
+from menus.utils import response_cacher as response_cacher_module
+from menus.utils.local_cache import LocalCache
+from menus.utils.pagination import (NEXT_CURSOR_HEADER, Page, get_page,
+                                    get_raw_page)
+from menus.utils.response_cacher import (INVALIDATION_CHANNEL, PRIMARY_PIN_KEY,
+                                         RESPONSE_CACHER_DISABLE,
+                                         ResponseCacher, cache_delete,
+                                         render_response, response_cacher)
+from menus.utils.warmup import warm_up
+from query_counter import QUERY_COUNT_HEADER
+
+
+def run(coroutine_function, *args, **kwargs):
+    """Run cacher's coroutine in the test client's event loop."""
+    return client.portal.call(partial(coroutine_function, *args, **kwargs))
+
+
+def test_cache_page_round_trip():
+    menu_id = uuid.uuid4()
+    dish = DishReadSchema(id=uuid.uuid4(), **dish_request_body1)
+    response = render_response(Page([dish], next_cursor="cursor"))
+    run(response_cacher.add, "test_endpoint", response, menu_id=menu_id)
+    cached = run(response_cacher.get, "test_endpoint", menu_id=menu_id)
+    assert cached.status_code == status.HTTP_200_OK
+    assert cached.body == response.body
+    assert cached.headers[NEXT_CURSOR_HEADER] == "cursor"
+    assert cached.headers["etag"] == response.headers["etag"]
+    assert cached.headers["content-type"] == "application/json"
+    run(response_cacher.delete, "test_endpoint")
+
+
+def test_cache_json_response_round_trip():
+    menu_id = uuid.uuid4()
+    response = render_response(JSONResponse(
+        status_code=status.HTTP_404_NOT_FOUND,
+        content={"detail": "menu not found"}))
+    run(response_cacher.add, "test_endpoint", response, menu_id=menu_id)
+    cached = run(response_cacher.get, "test_endpoint", menu_id=menu_id)
+    assert cached.status_code == status.HTTP_404_NOT_FOUND
+    assert cached.body == response.body
+    run(response_cacher.delete, "test_endpoint")
+
+
+def test_render_raw_page():
+    row = namedtuple("Row", ["menu_id", "id", "title", "description",
+                             "price"])
+    rows = [row(uuid.uuid4(), uuid.uuid4(), "Борщ", "Свекла",
+                Decimal("12.50")) for _ in range(3)]
+    raw = render_response(get_raw_page(rows, DishReadSchema, 2, "price"))
+    validated = render_response(get_page(rows, DishReadSchema, 2, "price"))
+    assert raw.body == validated.body
+    assert raw.headers == validated.headers
+    raw = render_response(get_raw_page(rows, DishReadSchema, 3))
+    assert raw.body == render_response(get_page(rows, DishReadSchema,
+                                                3)).body
+    assert NEXT_CURSOR_HEADER not in raw.headers
+
+
+def test_cache_get_miss():
+    assert run(response_cacher.get, "test_endpoint",
+               menu_id=uuid.uuid4()) is None
+
+
+def test_cache_delete_subtree():
+    menu_id, submenu_id = uuid.uuid4(), uuid.uuid4()
+    dish_ids = [uuid.uuid4() for _ in range(3)]
+    other_menu_id = uuid.uuid4()
+    response = render_response(JSONResponse(content={"status": True}))
+    for dish_id in dish_ids:
+        run(response_cacher.add, "test_dish", response, menu_id=menu_id,
+            submenu_id=submenu_id, dish_id=dish_id)
+    run(response_cacher.add, "test_dish", response, menu_id=other_menu_id,
+        submenu_id=submenu_id, dish_id=dish_ids[0])
+    run(response_cacher.delete, "test_dish", menu_id=menu_id,
+        submenu_id=submenu_id, dish_id=dish_ids[0])
+    assert run(response_cacher.get, "test_dish", menu_id=menu_id,
+               submenu_id=submenu_id, dish_id=dish_ids[0]) is None
+    assert run(response_cacher.get, "test_dish", menu_id=menu_id,
+               submenu_id=submenu_id, dish_id=dish_ids[1])
+    run(response_cacher.delete, "test_dish+", menu_id=menu_id)
+    for dish_id in dish_ids:
+        assert run(response_cacher.get, "test_dish", menu_id=menu_id,
+                   submenu_id=submenu_id, dish_id=dish_id) is None
+    assert run(response_cacher.get, "test_dish", menu_id=other_menu_id,
+               submenu_id=submenu_id, dish_id=dish_ids[0])
+    run(response_cacher.delete, "test_dish")
+    assert run(response_cacher.get, "test_dish", menu_id=other_menu_id,
+               submenu_id=submenu_id, dish_id=dish_ids[0]) is None
+
+
+def test_cache_delete_pages():
+    menu_id = uuid.uuid4()
+    response = render_response(Page())
+    for limit in (1, 2):
+        run(response_cacher.add, "test_submenus", response,
+            menu_id=menu_id, limit=limit)
+    run(response_cacher.delete, "test_submenus+", menu_id=menu_id)
+    for limit in (1, 2):
+        assert run(response_cacher.get, "test_submenus",
+                   menu_id=menu_id, limit=limit) is None
+
+
+def test_cache_delete_many():
+    menu_id, submenu_id = uuid.uuid4(), uuid.uuid4()
+    response = render_response(JSONResponse(content={"status": True}))
+    run(response_cacher.add, "test_menu", response, menu_id=menu_id)
+    run(response_cacher.add, "test_submenus", response,
+        menu_id=menu_id, limit=1)
+    run(response_cacher.add, "test_submenu", response,
+        menu_id=menu_id, submenu_id=submenu_id)
+    run(response_cacher.delete_many, {
+        "test_menu": {"menu_id": menu_id},
+        "test_submenus+": {"menu_id": menu_id},
+        "test_submenu+": {"menu_id": menu_id}})
+    assert run(response_cacher.get, "test_menu", menu_id=menu_id) is None
+    assert run(response_cacher.get, "test_submenus",
+               menu_id=menu_id, limit=1) is None
+    assert run(response_cacher.get, "test_submenu",
+               menu_id=menu_id, submenu_id=submenu_id) is None
+
+
+def test_local_cache_lru_and_ttl():
+    local = LocalCache(size=2, ttl=0.1)
+    local.set("cache:a", 1)
+    local.set("cache:b", 2)
+    assert local.get("cache:a") == 1
+    local.set("cache:c", 3)
+    assert local.get("cache:b") is None
+    assert local.get("cache:a") == 1
+    time.sleep(0.1)
+    assert local.get("cache:a") is None
+
+
+def test_local_cache_delete_tags():
+    local = LocalCache(size=10, ttl=60)
+    for key in ("cache:test_dish:m1:s1:d1", "cache:test_dish:m1:s2:d1",
+                "cache:test_dish:m2:s1:d1", "cache:test_dishes:m1:s1?limit=1",
+                "cache:test_dish_tree:m1"):
+        local.set(key, key)
+    local.delete(["tag:test_dish:m1", "tag:test_dishes:m1:s1"])
+    assert list(local.entries) == ["cache:test_dish:m2:s1:d1",
+                                   "cache:test_dish_tree:m1"]
+
+
+def test_local_cache_tier():
+    cacher = ResponseCacher(redis_cache, LocalCache(size=10, ttl=60))
+    menu_id = uuid.uuid4()
+    response = render_response(JSONResponse(content={"status": True}))
+    run(cacher.add, "test_menu", response, menu_id=menu_id)
+    cacher.local.clear()
+    for _ in range(2):
+        cached = run(cacher.get, "test_menu", menu_id=menu_id)
+        assert cached.body == response.body
+    assert cacher.get_stats() == {"local": {"hits": 1, "misses": 1},
+                                  "redis": {"hits": 1, "misses": 0}}
+    run(cacher.delete, "test_menu", menu_id=menu_id)
+    assert run(cacher.get, "test_menu", menu_id=menu_id) is None
+
+
+async def invalidate_other_worker(key: str, menu_id: uuid.UUID) -> bool:
+    writer = ResponseCacher(redis_cache)
+    reader = ResponseCacher(redis_cache, LocalCache(size=10, ttl=60))
+    task = asyncio.create_task(reader.listen())
+    try:
+        while not (await redis_cache.pubsub_numsub(INVALIDATION_CHANNEL)
+                   )[0][1]:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        reader.local.set(key, (200, {}, b"{}"))
+        await writer.delete("test_menu", menu_id=menu_id)
+        for _ in range(100):
+            if reader.local.get(key) is None:
+                return True
+            await asyncio.sleep(0.01)
+        return False
+    finally:
+        task.cancel()
+
+
+def test_local_cache_pubsub_invalidation():
+    menu_id = uuid.uuid4()
+    key = response_cacher.get_key_str("test_menu", menu_id=menu_id)
+    assert run(invalidate_other_worker, key, menu_id)
+
+
+def test_cache_stats():
+    response = client.get("/cache/stats")
+    assert response.status_code == status.HTTP_200_OK
+    assert set(response.json()) == {"local", "redis"}
+
+
+async def get_or_add_concurrently(cacher: ResponseCacher, menu_id: uuid.UUID,
+                                  requests: int) -> tuple[int, set[bytes]]:
+    calls = 0
+
+    async def render():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return render_response(JSONResponse(content={"calls": calls}))
+
+    responses = await asyncio.gather(*[
+        cacher.get_or_add("test_menu", render, menu_id=menu_id)
+        for _ in range(requests)])
+    return calls, {response.body for response in responses}
+
+
+def test_single_flight():
+    menu_id = uuid.uuid4()
+    calls, bodies = run(get_or_add_concurrently, response_cacher, menu_id,
+                        20)
+    assert calls == 1
+    assert bodies == {b'{"calls":1}'}
+    run(response_cacher.delete, "test_menu", menu_id=menu_id)
+    calls, bodies = run(get_or_add_concurrently, response_cacher, menu_id,
+                        20)
+    assert calls == 1
+    run(response_cacher.delete, "test_menu", menu_id=menu_id)
+
+
+def test_single_flight_render_error():
+    menu_id = uuid.uuid4()
+
+    async def render():
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        run(response_cacher.get_or_add, "test_menu", render, menu_id=menu_id)
+    calls, _ = run(get_or_add_concurrently, response_cacher, menu_id, 2)
+    assert calls == 1
+    run(response_cacher.delete, "test_menu", menu_id=menu_id)
+
+
+def test_single_flight_invalidated_while_rendering():
+    menu_id = uuid.uuid4()
+    key = response_cacher.get_key_str("test_menu", menu_id=menu_id)
+
+    async def render():
+        await asyncio.sleep(0.05)
+        # a write is committed and invalidated while rendering
+        await response_cacher.delete("test_menu", menu_id=menu_id)
+        return render_response(JSONResponse(content={"status": False}))
+
+    response = run(response_cacher.get_or_add, "test_menu", render,
+                   menu_id=menu_id)
+    assert response.body == b'{"status":false}'
+    assert run(response_cacher.get, "test_menu", menu_id=menu_id) is None
+    assert not run(redis_cache.exists, response_cacher.get_lock_str(key))
+    calls, _ = run(get_or_add_concurrently, response_cacher, menu_id, 2)
+    assert calls == 1
+    run(response_cacher.delete, "test_menu", menu_id=menu_id)
+
+
+def test_single_flight_lock_taken_by_other_request():
+    menu_id = uuid.uuid4()
+    key = response_cacher.get_key_str("test_menu", menu_id=menu_id)
+    lock = response_cacher.get_lock_str(key)
+
+    async def render():
+        # the lock expires while rendering and another request takes it
+        await redis_cache.set(lock, b"other")
+        return render_response(JSONResponse(content={"status": True}))
+
+    run(response_cacher.get_or_add, "test_menu", render, menu_id=menu_id)
+    assert run(redis_cache.get, lock) == b"other"
+    run(redis_cache.unlink, lock)
+    run(response_cacher.delete, "test_menu", menu_id=menu_id)
+
+
+def test_serve_stale():
+    cacher = ResponseCacher(redis_cache, stale_ttl=1)
+    menu_id = uuid.uuid4()
+    key = cacher.get_key_str("test_menu", menu_id=menu_id)
+    response = render_response(JSONResponse(content={"status": True}))
+    run(cacher.add, "test_menu", response, menu_id=menu_id)
+    run(cacher.delete, "test_menu", menu_id=menu_id)
+    run(redis_cache.set, cacher.get_lock_str(key), b"1")
+
+    async def render():
+        raise AssertionError("stale response is not served")
+
+    stale = run(cacher.get_or_add, "test_menu", render, menu_id=menu_id)
+    assert stale.body == response.body
+    run(redis_cache.unlink, cacher.get_lock_str(key), "stale:" + key)
+
+
+def test_primary_pin():
+    cacher = ResponseCacher(redis_cache, primary_pin=1)
+    menu_id = uuid.uuid4()
+
+    async def render():
+        return render_response(JSONResponse(content=read_primary.get()))
+
+    # recomputed from the primary database after a write
+    run(cacher.delete, "test_menu", menu_id=menu_id)
+    assert 0 < run(redis_cache.pttl, PRIMARY_PIN_KEY) <= 1000
+    assert run(cacher.get_or_add, "test_menu", render,
+               menu_id=menu_id).body == b"true"
+    run(redis_cache.unlink, PRIMARY_PIN_KEY)
+    run(cacher.delete, "test_menu", menu_id=menu_id)
+    run(redis_cache.unlink, PRIMARY_PIN_KEY)
+    assert run(cacher.get_or_add, "test_menu", render,
+               menu_id=menu_id).body == b"false"
+    run(cacher.delete, "test_menu", menu_id=menu_id)
+    run(redis_cache.unlink, PRIMARY_PIN_KEY)
+
+
+def test_cache_delete_after_endpoint(monkeypatch):
+    monkeypatch.setattr(response_cacher_module, "RESPONSE_CACHER_DISABLE", 0)
+    menu_id = uuid.uuid4()
+    response = render_response(JSONResponse(content={"status": True}))
+
+    @cache_delete({"test_menu": ["menu_id"]})
+    async def update_menu(menu_id: uuid.UUID, fail: bool = False):
+        # response is still cached before the write is committed
+        assert await response_cacher.get("test_menu", menu_id=menu_id)
+        if fail:
+            raise ValueError
+        return response
+
+    run(response_cacher.add, "test_menu", response, menu_id=menu_id)
+    with pytest.raises(ValueError):
+        run(update_menu, menu_id=menu_id, fail=True)
+    assert run(update_menu, menu_id=menu_id) is response
+    assert run(response_cacher.get, "test_menu", menu_id=menu_id) is None
+
+
+def test_cache_ttl():
+    menu_id, submenu_id = uuid.uuid4(), uuid.uuid4()
+    key = response_cacher.get_key_str("test_submenu", menu_id=menu_id,
+                                      submenu_id=submenu_id)
+    tag = response_cacher.get_tag_str("test_submenu", [str(menu_id)])
+    response = render_response(JSONResponse(content={"status": True}))
+    run(response_cacher.add, "test_submenu", response, 600, menu_id=menu_id,
+        submenu_id=submenu_id)
+    assert 0 < run(redis_cache.ttl, key) <= 600
+    # tag sets do not expire, so they are not evicted
+    assert run(redis_cache.ttl, tag) == -1
+    error = render_response(JSONResponse(
+        status_code=status.HTTP_404_NOT_FOUND,
+        content={"detail": "submenu not found"}))
+    run(response_cacher.add, "test_submenu", error, 600, 5, menu_id=menu_id,
+        submenu_id=uuid.uuid4())
+    run(response_cacher.add, "test_submenu", error, menu_id=menu_id,
+        submenu_id=submenu_id)
+    assert (0 < run(redis_cache.ttl, key)
+            <= response_cacher.error_ttl)
+    run(response_cacher.delete, "test_submenu")
+
+
+def test_error_response_tags():
+    """Error responses for random ids do not leave per-id tag sets, which
+    do not expire and are not evicted."""
+    menu_id, submenu_id = uuid.uuid4(), uuid.uuid4()
+    key = response_cacher.get_key_str("test_dishes", menu_id=menu_id,
+                                      submenu_id=submenu_id)
+    error = render_response(JSONResponse(
+        status_code=status.HTTP_404_NOT_FOUND,
+        content={"detail": "submenu not found"}))
+    run(response_cacher.add, "test_dishes", error, None, 1, menu_id=menu_id,
+        submenu_id=submenu_id)
+    time.sleep(1.1)
+    assert not run(redis_cache.exists, key)
+    assert not run(redis_cache.exists,
+                   response_cacher.get_tag_str("test_dishes", [str(menu_id)]),
+                   response_cacher.get_tag_str("test_dishes",
+                                               [str(menu_id),
+                                                str(submenu_id)]))
+    run(response_cacher.delete, "test_dishes")
+
+
+def test_missing_parent_dishes_ttl(monkeypatch):
+    """Empty dishes page of a missing submenu is cached like errors."""
+    monkeypatch.setattr(response_cacher_module, "RESPONSE_CACHER_DISABLE", 0)
+    menu_id, submenu_id = uuid.uuid4(), uuid.uuid4()
+    response = client.get(f"/menus/{menu_id}/submenus/{submenu_id}/dishes")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == []
+    key = response_cacher.get_key_str("get_dishes", menu_id=menu_id,
+                                      submenu_id=submenu_id, limit=100)
+    assert 0 < run(redis_cache.ttl, key) <= response_cacher.error_ttl
+    assert not run(redis_cache.exists,
+                   response_cacher.get_tag_str("get_dishes", [str(menu_id)]))
+    run(response_cacher.delete, "get_dishes", menu_id=menu_id,
+        submenu_id=submenu_id, limit=100)
+
+
+def test_tag_set_prune():
+    menu_id = uuid.uuid4()
+    tag = response_cacher.get_tag_str("test_prune", [str(menu_id)])
+    response = render_response(JSONResponse(content={"status": True}))
+    for page in range(10):
+        run(response_cacher.add, "test_prune", response, menu_id=menu_id,
+            page=page)
+    run(redis_cache.unlink, *run(redis_cache.smembers, tag))
+    for _ in range(20):
+        run(response_cacher.add, "test_prune", response, menu_id=menu_id,
+            page=0)
+    assert run(redis_cache.smembers, tag) == {
+        response_cacher.get_key_str("test_prune", menu_id=menu_id,
+                                    page=0).encode()}
+    run(response_cacher.delete, "test_prune")
+
+
+def test_invalidate_after_eviction():
+    """Under `volatile-lru` (see redis.conf) entries are evicted, but not
+    their tag sets, so the remaining entries are still invalidated."""
+    menu_id = uuid.uuid4()
+    response = render_response(JSONResponse(content="x" * 20_000))
+    tags = [response_cacher.get_tag_str("test_evicted", ids)
+            for ids in ([], [str(menu_id)])]
+    config = run(redis_cache.config_get, "maxmemory*")
+    used_memory = run(redis_cache.info, "memory")["used_memory"]
+    try:
+        run(redis_cache.config_set, "maxmemory-policy", "volatile-lru")
+        run(redis_cache.config_set, "maxmemory", used_memory + 1_000_000)
+        for page in range(200):
+            run(response_cacher.add, "test_evicted", response,
+                menu_id=menu_id, page=page)
+    finally:
+        run(redis_cache.config_set, "maxmemory", config["maxmemory"])
+        run(redis_cache.config_set, "maxmemory-policy",
+            config["maxmemory-policy"])
+    keys = run(redis_cache.keys, "cache:test_evicted:*")
+    assert 0 < len(keys) < 200, "entries are not evicted"
+    assert run(redis_cache.exists, *tags) == len(tags)
+    run(response_cacher.delete, "test_evicted+", menu_id=menu_id)
+    assert not run(redis_cache.keys, "cache:test_evicted:*")
+
+
+def test_cache_memory_report():
+    menu_id = uuid.uuid4()
+    response = render_response(JSONResponse(content={"status": True}))
+    run(response_cacher.add, "test_report", response, menu_id=menu_id)
+    report = run(response_cacher.get_memory_report)
+    keys, usage = report["test_report"]["cache"]
+    assert keys == 1 and usage > 0
+    assert report["test_report"]["tag"][0] == 1
+    run(response_cacher.delete, "test_report")
+    assert "test_report" not in run(response_cacher.get_memory_report)
+
+
+def test_cache_metrics():
+    menu_id = uuid.uuid4()
+    response = render_response(JSONResponse(content={"status": True}))
+    run(response_cacher.add, "test_metrics", response, menu_id=menu_id)
+    run(response_cacher.get, "test_metrics", menu_id=menu_id)
+    run(response_cacher.delete, "test_metrics", menu_id=menu_id)
+    run(response_cacher.get, "test_metrics", menu_id=menu_id)
+    metrics = client.get("http://localhost:8000/metrics").text
+    for line in (
+            'response_cache_hits_total{endpoint="test_metrics",'
+            'tier="redis"} 1.0',
+            'response_cache_misses_total{endpoint="test_metrics",'
+            'tier="redis"} 1.0',
+            'response_cache_invalidations_total{endpoint="test_metrics"} 1.0'):
+        assert line in metrics, f"{line} not found in metrics"
+
+
+def test_add_many():
+    menu_id = uuid.uuid4()
+    added = [("test_endpoint",
+              render_response(JSONResponse(content={"status": True})),
+              {"menu_id": menu_id})]
+    lock = response_cacher.get_lock_str(
+        response_cacher.get_key_str("test_endpoint", menu_id=menu_id))
+    # rendered before an invalidation
+    generation = run(response_cacher.get_generation)
+    run(response_cacher.delete, "test_other_endpoint")
+    assert run(response_cacher.add_many, added, generation) == 0
+    assert run(response_cacher.get, "test_endpoint", menu_id=menu_id) is None
+    # lock of a request rendering the response is kept
+    run(redis_cache.set, lock, 1)
+    generation = run(response_cacher.get_generation)
+    assert run(response_cacher.add_many, added, generation) == 1
+    assert run(redis_cache.exists, lock)
+    # newer response is not replaced
+    newer = render_response(JSONResponse(content={"status": False}))
+    run(response_cacher.add, "test_endpoint", newer, menu_id=menu_id)
+    assert run(response_cacher.add_many, added, generation) == 0
+    assert run(response_cacher.get, "test_endpoint",
+               menu_id=menu_id).body == newer.body
+    run(response_cacher.delete, "test_endpoint")
+
+
+def test_warm_up():
+    menu_urls = list()
+    responses = {"/menus": ("get_menus", {"limit": 100})}
+    for _ in range(2):
+        menu_id = client.post("/menus", json=menu_request_body1).json()["id"]
+        menu_url = f"/menus/{menu_id}"
+        submenu_id = client.post(f"{menu_url}/submenus",
+                                 json=submenu_request_body1).json()["id"]
+        submenu_url = f"{menu_url}/submenus/{submenu_id}"
+        client.post(f"{submenu_url}/dishes", json=dish_request_body1)
+        menu_urls.append(menu_url)
+        menu_id, submenu_id = uuid.UUID(menu_id), uuid.UUID(submenu_id)
+        responses[menu_url] = ("get_menu", {"menu_id": menu_id})
+        responses[f"{menu_url}/submenus"] = (
+            "get_submenus", {"menu_id": menu_id, "limit": 100})
+        responses[f"{submenu_url}/dishes"] = (
+            "get_dishes", {"menu_id": menu_id, "submenu_id": submenu_id,
+                           "limit": 100})
+    bodies = {url: client.get(url).content for url in responses}
+    run(response_cacher.delete_many,
+        {endpoint_name: {} for endpoint_name, _ in responses.values()})
+    added = run(warm_up, 1, 1, asynccontextmanager(override_get_session))
+    assert added >= len(responses)
+    for url, (endpoint_name, kwargs) in responses.items():
+        cached = run(response_cacher.get, endpoint_name, **kwargs)
+        assert cached.body == bodies[url], url
+        if not RESPONSE_CACHER_DISABLE:
+            response = client.get(url)
+            assert response.content == bodies[url], url
+            assert response.headers[QUERY_COUNT_HEADER] == "0", url
+    for menu_url in menu_urls:
+        client.delete(menu_url)
+
+
+async def warm_up_failing(failing_call: int) -> set[asyncio.Task]:
+    """Warm up with sessions failing from `failing_call`-th one, return
+    warm-up tasks left running."""
+    calls = 0
+
+    @asynccontextmanager
+    async def scope():
+        nonlocal calls
+        calls += 1
+        if calls >= failing_call:
+            raise RuntimeError
+        async with asynccontextmanager(override_get_session)() as session:
+            yield session
+
+    with pytest.raises(RuntimeError):
+        await warm_up(1, 2, scope)
+    return {task for task in asyncio.all_tasks()
+            if task.get_coro().__name__ == "warm_up_batch"}
+
+
+def test_warm_up_failed_batch():
+    menu_urls = list()
+    for _ in range(3):
+        menu_id = client.post("/menus", json=menu_request_body1).json()["id"]
+        menu_urls.append(f"/menus/{menu_id}")
+    assert run(warm_up_failing, 3) == set()
+    for menu_url in menu_urls:
+        client.delete(menu_url)
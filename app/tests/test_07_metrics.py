@@ -0,0 +1,33 @@
+from conftest import client
+from data import menu_request_body1
+from starlette import status
+
+
+def get_metrics() -> str:
+    response = client.get("http://localhost:8000/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    return response.text
+
+
+def test_metrics():
+    response = client.post("/menus", json=menu_request_body1)
+    menu_id = response.json()["id"]
+    client.get(f"/menus/{menu_id}")
+    client.get(f"/menus/{menu_id}")
+    client.delete(f"/menus/{menu_id}")
+    metrics = get_metrics()
+    for line in (
+            'http_request_duration_seconds_count{endpoint="get_menu",'
+            'method="GET",status="200"}',
+            'http_request_duration_seconds_count{endpoint="create_menu",'
+            'method="POST",status="201"}',
+            'sql_query_duration_seconds_count{engine=',
+            'db_pool_checkouts_total{engine=',
+            'db_pool_checked_out{engine='):
+        assert line in metrics, f"{line} not found in metrics"
+
+
+def test_metrics_unmatched_route():
+    client.get("/unknown")
+    assert ('http_request_duration_seconds_count{endpoint="unmatched",'
+            'method="GET",status="404"}') in get_metrics()
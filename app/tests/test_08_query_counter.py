@@ -0,0 +1,76 @@
+import logging
+
+import pytest
+from conftest import client
+from data import (dish_request_body1, dish_request_body2, menu_request_body1,
+                  menu_request_body2, submenu_request_body1,
+                  submenu_request_body2)
+from starlette import status
+
+import query_counter
+from query_counter import QUERY_COUNT_HEADER
+
+
+def check_query_count(response, expected_count: int):
+    assert int(response.headers[QUERY_COUNT_HEADER]) == expected_count, (
+        f"Expected {expected_count} SQL queries "
+        f"but got {response.headers[QUERY_COUNT_HEADER]}."
+    )
+
+
+@pytest.fixture
+def menu_tree():
+    response = client.post("/menus", json=menu_request_body1)
+    check_query_count(response, 1)
+    menu_url = f"/menus/{response.json()['id']}"
+    response = client.post(f"{menu_url}/submenus",
+                           json=submenu_request_body1)
+    check_query_count(response, 2)
+    submenu_url = f"{menu_url}/submenus/{response.json()['id']}"
+    response = client.post(f"{submenu_url}/dishes", json=dish_request_body1)
+    check_query_count(response, 2)
+    dish_url = f"{submenu_url}/dishes/{response.json()['id']}"
+    yield menu_url, submenu_url, dish_url
+    client.delete(menu_url)
+
+
+def test_get_query_budget(menu_tree):
+    menu_url, submenu_url, dish_url = menu_tree
+    for url, expected_count in ((menu_url, 1),
+                                (f"{menu_url}/tree", 1),
+                                (f"{menu_url}/submenus", 1),
+                                (submenu_url, 1),
+                                (f"{submenu_url}/dishes", 1),
+                                (dish_url, 1)):
+        response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        check_query_count(response, expected_count)
+
+
+def test_update_query_budget(menu_tree):
+    menu_url, submenu_url, dish_url = menu_tree
+    for url, request_body, expected_count in (
+            (menu_url, menu_request_body2, 1),
+            (submenu_url, submenu_request_body2, 1),
+            (dish_url, dish_request_body2, 1)):
+        response = client.patch(url, json=request_body)
+        assert response.status_code == status.HTTP_200_OK
+        check_query_count(response, expected_count)
+
+
+def test_delete_query_budget(menu_tree):
+    menu_url, submenu_url, dish_url = menu_tree
+    for url, expected_count in ((dish_url, 1),
+                                (submenu_url, 1),
+                                (menu_url, 1)):
+        response = client.delete(url)
+        assert response.status_code == status.HTTP_200_OK
+        check_query_count(response, expected_count)
+
+
+def test_query_count_warning(menu_tree, monkeypatch, caplog):
+    menu_url, _, _ = menu_tree
+    monkeypatch.setattr(query_counter, "QUERY_COUNT_WARNING", 0)
+    with caplog.at_level(logging.WARNING, logger=query_counter.__name__):
+        client.get(f"{menu_url}/tree")
+    assert f"GET /api/v1{menu_url}/tree made 1 SQL queries" in caplog.text
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+
+from sqlalchemy.pool import NullPool
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import database
+from database import (PRIMARY_PIN_COOKIE, PrimaryPinMiddleware,
+                      check_pool_size, get_async_connect_args,
+                      get_pool_options, get_read_session)
+
+
+def test_check_pool_size(monkeypatch, caplog):
+    monkeypatch.setattr(database, "DATABASE_POOL_SIZE", 5)
+    monkeypatch.setattr(database, "DATABASE_MAX_OVERFLOW", 10)
+    with caplog.at_level(logging.WARNING, logger=database.__name__):
+        check_pool_size(15)
+        assert not caplog.records
+        check_pool_size(40)
+    assert "up to 40 database calls" in caplog.text
+    assert "up to 15 connections" in caplog.text
+
+
+def test_check_null_pool_size(monkeypatch, caplog):
+    monkeypatch.setattr(database, "DATABASE_NULL_POOL", 1)
+    with caplog.at_level(logging.WARNING, logger=database.__name__):
+        check_pool_size(40)
+    assert not caplog.records
+
+
+def test_pgbouncer_options(monkeypatch):
+    monkeypatch.setattr(database, "DATABASE_NULL_POOL", 1)
+    monkeypatch.setattr(database, "DATABASE_PGBOUNCER", 1)
+    options = get_pool_options()
+    assert options["poolclass"] is NullPool
+    assert "pool_size" not in options
+    connect_args = get_async_connect_args()
+    assert connect_args["statement_cache_size"] == 0
+    assert connect_args["prepared_statement_cache_size"] == 0
+    name_func = connect_args["prepared_statement_name_func"]
+    assert name_func() != name_func()
+
+
+def test_primary_pin_cookie():
+    async def endpoint(request: Request) -> JSONResponse:
+        return JSONResponse({}, status_code=int(request.query_params["code"]))
+
+    app = Starlette(routes=[Route("/", endpoint, methods=["GET", "POST"])])
+    app.add_middleware(PrimaryPinMiddleware)
+    client = TestClient(app)
+    assert PRIMARY_PIN_COOKIE not in client.get("/?code=200").cookies
+    assert PRIMARY_PIN_COOKIE not in client.post("/?code=404").cookies
+    assert PRIMARY_PIN_COOKIE in client.post("/?code=201").cookies
+
+
+def test_read_session_pinned_to_primary(monkeypatch):
+    async def open_session(async_session_factory, session_factory):
+        yield async_session_factory
+
+    async def get_factory(cookie: str) -> type:
+        request = Request({"type": "http",
+                           "headers": [(b"cookie", cookie.encode())]})
+        return await anext(get_read_session(request))
+
+    monkeypatch.setattr(database, "open_session", open_session)
+    monkeypatch.setattr(database, "AsyncReplicaSession", object)
+    assert asyncio.run(get_factory("")) is object
+    assert (asyncio.run(get_factory(f"{PRIMARY_PIN_COOKIE}=1"))
+            is database.AsyncSession)
+
+
+def test_replica_session_reads_primary():
+    session = database.ReplicaRoutingSession(
+        bind=database.replica_engine, info={"primary": database.engine})
+    token = database.read_primary.set(True)
+    try:
+        assert session.get_bind() is database.engine
+    finally:
+        database.read_primary.reset(token)
+    assert session.get_bind() is database.replica_engine
+    session.close()
@@ -0,0 +1,130 @@
+from conftest import client
+from data import menu_request_body1, submenu_request_body1
+from sqlalchemy.orm import Session
+from starlette import status
+
+from menus.models import Dish, Menu, Submenu
+from menus.utils.pagination import NEXT_CURSOR_HEADER, encode_cursor
+
+search_dishes = [
+    {"title": "Борщ с пампушками", "description": "Свекла и сметана",
+     "price": "5.00"},
+    {"title": "Tomato soup", "description": "Fresh tomatoes and basil",
+     "price": "4.50"},
+    {"title": "Chicken soup", "description": "Chicken and noodles",
+     "price": "4.00"},
+    {"title": "Pancakes", "description": "With tomato jam",
+     "price": "3.00"},
+]
+
+
+def test_search_dishes(test_session: Session):
+    menu = Menu(**menu_request_body1)
+    submenu = Submenu(**submenu_request_body1)
+    menu.submenus.append(submenu)
+    submenu.dishes.extend([Dish(**dish) for dish in search_dishes])
+    test_session.add(menu)
+    test_session.commit()
+    response = client.get("/search/dishes", params={"q": "soup"})
+    assert response.status_code == status.HTTP_200_OK
+    assert ({dish["title"] for dish in response.json()}
+            == {"Tomato soup", "Chicken soup"})
+    dish = response.json()[0]
+    assert dish["menu_id"] == str(menu.id)
+    assert dish["submenu_id"] == str(submenu.id)
+    assert dish["price"] in ("4.50", "4.00")
+    # words of title or description, title first by rank
+    response = client.get("/search/dishes", params={"q": "tomato"})
+    assert [dish["title"] for dish in response.json()] == ["Tomato soup",
+                                                           "Pancakes"]
+    response = client.get("/search/dishes", params={"q": "soup -chicken"})
+    assert [dish["title"] for dish in response.json()] == ["Tomato soup"]
+    # any language, misspelled title
+    response = client.get("/search/dishes", params={"q": "борщ"})
+    assert [dish["title"] for dish in response.json()] == [
+        "Борщ с пампушками"]
+    response = client.get("/search/dishes", params={"q": "Pancake"})
+    assert [dish["title"] for dish in response.json()] == ["Pancakes"]
+    response = client.get("/search/dishes", params={"q": "chiken soup"})
+    assert [dish["title"] for dish in response.json()] == ["Chicken soup"]
+    response = client.get("/search/dishes", params={"q": "lasagna"})
+    assert response.json() == []
+    test_session.delete(menu)
+    test_session.commit()
+
+
+def test_search_dishes_pages(test_session: Session):
+    menu = Menu(**menu_request_body1)
+    submenu = Submenu(**submenu_request_body1)
+    menu.submenus.append(submenu)
+    submenu.dishes.extend([Dish(**dish) for dish in search_dishes])
+    test_session.add(menu)
+    test_session.commit()
+    expected = client.get("/search/dishes", params={"q": "soup or tomato"})
+    assert len(expected.json()) == 3
+    titles = list()
+    params = {"q": "soup or tomato", "limit": 2}
+    while True:
+        response = client.get("/search/dishes", params=params)
+        assert response.status_code == status.HTTP_200_OK
+        titles.extend(dish["title"] for dish in response.json())
+        if NEXT_CURSOR_HEADER not in response.headers:
+            break
+        params["after"] = response.headers[NEXT_CURSOR_HEADER]
+    assert titles == [dish["title"] for dish in expected.json()]
+    response = client.get("/search/dishes",
+                          params={"q": "soup", "after": encode_cursor(
+                              submenu.id)})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    response = client.get("/search/dishes",
+                          params={"q": "soup", "after": encode_cursor(
+                              submenu.id, "nan")})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    response = client.get("/search/dishes", params={"q": ""})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    test_session.delete(menu)
+    test_session.commit()
+
+
+def test_search_dishes_after_update(test_session: Session):
+    menu = Menu(**menu_request_body1)
+    submenu = Submenu(**submenu_request_body1)
+    menu.submenus.append(submenu)
+    dish = Dish(**search_dishes[1])
+    submenu.dishes.append(dish)
+    test_session.add(menu)
+    test_session.commit()
+    response = client.get("/search/dishes", params={"q": "gazpacho"})
+    assert response.json() == []
+    response = client.patch(f"/menus/{str(menu.id)}"
+                            f"/submenus/{str(submenu.id)}"
+                            f"/dishes/{str(dish.id)}",
+                            json=search_dishes[1] | {"title": "Gazpacho"})
+    assert response.status_code == status.HTTP_200_OK
+    # new words are found by similar words as well
+    for q in ("gazpacho", "gaspacho"):
+        response = client.get("/search/dishes", params={"q": q})
+        assert [dish["title"] for dish in response.json()] == ["Gazpacho"]
+    test_session.delete(menu)
+    test_session.commit()
+
+
+def test_search_dishes_after_delete(test_session: Session):
+    menu = Menu(**menu_request_body1)
+    submenu = Submenu(**submenu_request_body1)
+    menu.submenus.append(submenu)
+    submenu.dishes.extend([Dish(**dish) for dish in search_dishes])
+    test_session.add(menu)
+    test_session.commit()
+    response = client.get("/search/dishes", params={"q": "pancakes"})
+    assert len(response.json()) == 1
+    dish_id = response.json()[0]["id"]
+    response = client.delete(f"/menus/{str(menu.id)}"
+                             f"/submenus/{str(submenu.id)}/dishes/{dish_id}")
+    assert response.status_code == status.HTTP_200_OK
+    response = client.get("/search/dishes", params={"q": "pancakes"})
+    assert response.json() == []
+    response = client.delete(f"/menus/{str(menu.id)}")
+    assert response.status_code == status.HTTP_200_OK
+    response = client.get("/search/dishes", params={"q": "soup"})
+    assert response.json() == []